@@ -4,6 +4,7 @@ Main entry point for the application
 """
 
 import sys
+import atexit
 import argparse
 import logging
 import signal
@@ -11,21 +12,19 @@ from pathlib import Path
 
 from src.agent import FlowAgent
 from src.config import load_config
+from src.log_pipeline import start_logging
 
 
-def setup_logging(log_level: str, log_dir: Path):
+def setup_logging(log_level: str, log_dir: Path, max_mb: float = 10, backups: int = 5):
     """Configure logging for the application"""
-    log_dir.mkdir(parents=True, exist_ok=True)
-    log_file = log_dir / "agent.log"
-    
-    logging.basicConfig(
-        level=getattr(logging, log_level.upper()),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler(sys.stdout)
-        ]
+    listener = start_logging(
+        getattr(logging, log_level.upper()),
+        log_dir / "agent.log",
+        max_bytes=int(max_mb * 1024 * 1024),
+        backup_count=backups
     )
+    # Drain queued records before logging shuts its handlers down
+    atexit.register(listener.stop)
 
 
 def signal_handler(signum, frame):
@@ -55,12 +54,14 @@ def main():
     # Setup logging
     log_level = 'DEBUG' if args.debug else config['agent']['log_level']
     log_dir = Path.home() / 'Library' / 'Application Support' / 'FlowFacilitator' / 'logs'
-    setup_logging(log_level, log_dir)
+    setup_logging(log_level, log_dir,
+                  max_mb=config['agent'].get('log_max_mb', 10),
+                  backups=config['agent'].get('log_backups', 5))
     
     logger = logging.getLogger(__name__)
     logger.info("Starting FlowFacilitator Agent...")
-    logger.info(f"Development mode: {args.dev}")
-    logger.info(f"Debug mode: {args.debug}")
+    logger.info("Development mode: %s", args.dev)
+    logger.info("Debug mode: %s", args.debug)
     
     # Setup signal handlers
     signal.signal(signal.SIGINT, signal_handler)
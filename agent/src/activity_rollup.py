@@ -0,0 +1,140 @@
+"""
+Activity Rollup - Per-minute activity summaries uploaded in batches
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from .flow_engine import FlowState
+
+
+class _Minute:
+    """Running totals for one minute"""
+    
+    def __init__(self, start: int):
+        self.start = start
+        self.samples = 0
+        self.typing_total = 0.0
+        self.app_switches = 0
+        self.max_idle_gap = 0.0
+        self.states: Counter = Counter()
+        self.apps: Counter = Counter()
+        self.session_id: Optional[str] = None
+    
+    def as_row(self) -> Dict:
+        samples = self.samples or 1
+        return {
+            'minute': datetime.fromtimestamp(self.start, tz=timezone.utc).isoformat(),
+            'session_id': self.session_id,
+            'typing_rate': round(self.typing_total / samples, 2),
+            'app_switches': self.app_switches,
+            'max_idle_gap': round(self.max_idle_gap, 2),
+            'flow_state': self.states.most_common(1)[0][0] if self.states else FlowState.IDLE.value,
+            'flow_seconds': round(60 * self.states[FlowState.IN_FLOW.value] / samples),
+            'top_app': self.apps.most_common(1)[0][0] if self.apps else None,
+            'samples': self.samples
+        }
+
+
+class ActivityRollup:
+    """
+    Folds monitor ticks into one summary row per minute
+    
+    record() is called every tick with the current metrics, flow state and
+    foreground app; app switches are counted as they happen. When time
+    moves into a new minute the previous one is closed and queued. flush()
+    sends queued rows through the upload callback in batches and keeps
+    them for the next attempt if it fails; past max_pending rows the
+    oldest are dropped.
+    """
+    
+    def __init__(self, upload: Callable[[List[Dict]], bool], batch_size: int = 500,
+                 max_pending: int = 1440):
+        self.logger = logging.getLogger(__name__)
+        self.upload = upload
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._minute: Optional[_Minute] = None
+        self._pending: List[Dict] = []
+        self.dropped = 0
+    
+    def record(self, metrics: Dict, flow_state: str, app: Optional[str] = None,
+               session_id: Optional[str] = None, timestamp: Optional[float] = None):
+        """Fold one monitor tick into its minute"""
+        with self._lock:
+            minute = self._minute_for(time.time() if timestamp is None else timestamp)
+            minute.samples += 1
+            minute.typing_total += metrics.get('typing_rate', 0.0)
+            minute.max_idle_gap = max(minute.max_idle_gap, metrics.get('current_idle', 0.0))
+            minute.states[flow_state] += 1
+            if app:
+                minute.apps[app] += 1
+            if session_id:
+                minute.session_id = session_id
+    
+    def add_app_switch(self, timestamp: Optional[float] = None):
+        """Count an app switch in its minute"""
+        with self._lock:
+            self._minute_for(time.time() if timestamp is None else timestamp).app_switches += 1
+    
+    def pending(self) -> int:
+        """Closed minutes waiting to be uploaded"""
+        with self._lock:
+            return len(self._pending)
+    
+    def flush(self) -> bool:
+        """
+        Upload closed minutes in batches
+        
+        Returns:
+            False if some rows could not be sent (they stay queued)
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            
+            for offset in range(0, len(rows), self.batch_size):
+                batch = rows[offset:offset + self.batch_size]
+                if not self.upload(batch):
+                    with self._lock:
+                        self._pending = rows[offset:] + self._pending
+                        self._trim()
+                    return False
+                self.logger.debug(f"Uploaded {len(batch)} activity minutes")
+            return True
+    
+    def close(self) -> bool:
+        """Close the open minute and try one last upload"""
+        with self._lock:
+            if self._minute is not None and self._minute.samples:
+                self._pending.append(self._minute.as_row())
+                self._trim()
+            self._minute = None
+        return self.flush()
+    
+    def _minute_for(self, timestamp: float) -> _Minute:
+        """The open minute, closing the previous one if timestamp is past it (lock held)"""
+        start = int(timestamp // 60) * 60
+        if self._minute is None:
+            self._minute = _Minute(start)
+        elif start > self._minute.start:
+            if self._minute.samples:
+                self._pending.append(self._minute.as_row())
+                self._trim()
+            self._minute = _Minute(start)
+        # A tick older than the open minute (clock change) is counted in it
+        return self._minute
+    
+    def _trim(self):
+        excess = len(self._pending) - self.max_pending
+        if excess > 0:
+            del self._pending[:excess]
+            self.dropped += excess
+            self.logger.warning(f"Dropped {excess} unsent activity minutes")
@@ -5,11 +5,17 @@ FlowAgent - Main agent orchestrator
 import logging
 import time
 import threading
-from typing import Dict, Optional
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 from .input_collector import InputCollector
 from .metrics_engine import RollingMetrics
+from .metrics_store import MetricsStore
+from .activity_rollup import ActivityRollup
+from .log_shipping import LogShippingHandler
+from .session_timeline import SessionTimeline
 from .flow_engine import FlowRuleEngine, FlowState
+from .flow_config import FlowConfigError, FlowConfigWatcher
 from .database import DatabaseClient
 from .auth_service import AuthService
 from .protection import ProtectionController
@@ -18,6 +24,18 @@ from .micro_interventions import MicroIntervention
 from .gamification import GamificationSystem
 from .native_messaging import NativeMessagingHost
 from .api_server import AgentAPIServer
+from .user_settings import UserSettingsManager
+from .timer_wheel import get_timer_wheel
+from .cloud_scheduler import CloudScheduler
+from .startup import StartupGraph, StartupPhase
+from .ui_thread import UIThread
+from .instrumentation import get_registry
+
+_metrics = get_registry()
+TICK_SECONDS = _metrics.histogram('flow_agent_monitor_tick_seconds', 'Monitor loop tick duration, excluding the sleep')
+FLOW_EVAL_SECONDS = _metrics.histogram('flow_agent_flow_evaluation_seconds', 'Flow rule engine evaluation latency')
+INPUT_EVENTS = _metrics.counter('flow_agent_input_events_total', 'Input events received', ['type'])
+QUEUE_DEPTH = _metrics.gauge('flow_agent_queue_depth', 'Items waiting in agent buffers and queues', ['queue'])
 
 
 class FlowAgent:
@@ -52,8 +70,18 @@ class FlowAgent:
             'netflix.com', 'twitch.tv', 'discord.com'
         ]
         
+        # Shared scheduler for all timed actions
+        self.timers = get_timer_wheel()
+        
+        # Periodic cloud work (jittered, with backoff)
+        self.cloud = CloudScheduler(self.timers)
+        
+        # Single UI thread owning every overlay window
+        self.ui = UIThread()
+        
         # Components
         self._auth = None  # Lazy initialization to avoid keyring conflicts
+        self._auth_lock = threading.Lock()
         self.db = DatabaseClient(config)
         self.input_collector = InputCollector(on_event=self._on_event)
         self.metrics = RollingMetrics()
@@ -63,11 +91,12 @@ class FlowAgent:
         self.native_messaging = NativeMessagingHost(on_message=self._on_extension_message)
         
         # Protection controller (needs native messaging)
-        self.protection = ProtectionController(config, native_messaging_host=self.native_messaging)
+        self.protection = ProtectionController(config, native_messaging_host=self.native_messaging,
+                                               timers=self.timers)
         
         # Other components
-        self.overlay_manager = OverlayManager(on_flow_broken=self._on_flow_broken)
-        self.micro_intervention = MicroIntervention()
+        self.overlay_manager = OverlayManager(on_flow_broken=self._on_flow_broken, timers=self.timers, ui=self.ui)
+        self.micro_intervention = MicroIntervention(timers=self.timers, ui=self.ui)
         self.gamification = GamificationSystem()
         
         # API Server
@@ -77,38 +106,101 @@ class FlowAgent:
         self.current_session_id: Optional[str] = None
         self.session_start_app: Optional[str] = None
         self.session_start_time: Optional[float] = None
+        self.session_timeline: Optional[SessionTimeline] = None
+        
+        # Protection pause
+        self._pause_timer = None
+        
+        # Tk windows are built on the first flow session, not at start-up
+        self._ui_prepare_scheduled = False
+        
+        # Settings: local snapshot first, cloud sync attached once signed in
+        app_support = Path.home() / 'Library' / 'Application Support' / 'FlowFacilitator'
+        self.settings_manager = UserSettingsManager(
+            None,
+            None,
+            local_storage_path=app_support / 'settings_cache.json',
+            scheduler=self.cloud,
+            on_change=self._on_settings_changed,
+            on_push=self._write_through_setting
+        )
+        # Seconds after start before auth is created and sync begins
+        self.settings_sync_delay = config.get('agent', {}).get('settings_sync_delay_seconds', 60)
+        self._settings_sync_timer = None
+        
+        # Hand-edited flow config, hot-reloaded when the file changes
+        config_file = config.get('flow_detection', {}).get('config_file')
+        self.flow_config_watcher = FlowConfigWatcher(
+            Path(config_file).expanduser() if config_file else app_support / 'flow_config.json',
+            on_change=self.apply_flow_config,
+            timers=self.timers
+        )
         
         # Metrics history for fatigue detection
         self.metrics_history = []
         
+        # Per-minute activity summaries uploaded in place of raw events;
+        # raw app-switch and flow on/off events are opt-in
+        telemetry = config.get('telemetry', {})
+        self.upload_raw_events = telemetry.get('raw_events', False)
+        self.activity_upload_interval = telemetry.get('rollup_upload_seconds', 300)
+        self.activity = ActivityRollup(upload=self._upload_activity)
+        
+        # Warnings and errors shipped to agent_logs in capped batches
+        remote_logs = telemetry.get('remote_logs', {})
+        self.remote_logs_enabled = remote_logs.get('enabled', True)
+        self.remote_logs_interval = remote_logs.get('upload_seconds', 60)
+        self.log_shipper = LogShippingHandler(
+            send=self._ship_logs,
+            fallback_path=app_support / 'logs' / 'remote_logs_fallback.jsonl',
+            level=getattr(logging, remote_logs.get('level', 'warning').upper(), logging.WARNING),
+            max_rows_per_hour=remote_logs.get('max_rows_per_hour', 120)
+        )
+        
+        # Read when /metrics is scraped
+        QUEUE_DEPTH.set_function(lambda: len(self.db.event_buffer), queue='event_buffer')
+        QUEUE_DEPTH.set_function(self.activity.pending, queue='activity_minutes')
+        QUEUE_DEPTH.set_function(self.log_shipper.pending, queue='remote_logs')
+        
+        # Every tick's metrics on disk, rolled up for local charts
+        retention_hours = config.get('metrics_store', {}).get('retention_hours', {})
+        self.metrics_store = MetricsStore(
+            app_support / 'metrics',
+            retention={tier: hours * 3600 for tier, hours in retention_hours.items()},
+            timers=self.timers
+        )
+        
         # Monitoring thread
         self.monitor_thread: Optional[threading.Thread] = None
+        
+        # Start-up phases and their readiness (reported on /status)
+        self.startup = self._build_startup_graph()
     
     def start(self):
         """Start the agent"""
         self.logger.info("Starting FlowAgent...")
         
-        # Connect to database
-        self.db.connect()
-        
-        # Load settings from database
-        self._load_settings()
-        
-        # Start input collection
-        self.input_collector.start()
-        
-        # Start native messaging
-        self.native_messaging.start()
-        
-        # Start API server
-        self.api_server.start()
-        
-        # Start monitoring loop
         self.running = True
-        self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
-        self.monitor_thread.start()
+        self.startup.run()
         
-        self.logger.info("FlowAgent started successfully")
+        # Local phases never wait on the network; only monitoring is required to go on
+        try:
+            self.startup.wait(['monitoring'])
+        except RuntimeError as e:
+            self.logger.error(f"FlowAgent failed to start: {e}")
+            self.running = False
+            raise
+        monitoring = self.startup.phases['monitoring']
+        if monitoring.state != StartupPhase.READY:
+            raise RuntimeError(f"Monitoring did not start ({monitoring.state})")
+        self.logger.info(f"FlowAgent started successfully (monitoring after {monitoring.finished_at * 1000:.0f} ms)")
+        
+        # Log the full start-up profile once the network phases settle
+        self.timers.call_later(0, self._log_startup_timings, background=True)
+        
+        # Auth is first needed for settings sync; keep it off the start-up path
+        self._settings_sync_timer = self.timers.call_later(self.settings_sync_delay, self._start_settings_sync,
+                                                           background=True)
         
         # Keep main thread alive
         try:
@@ -128,18 +220,82 @@ class FlowAgent:
             self._end_session("agent_stopped")
         
         # Stop components
+        self.timers.cancel(self._pause_timer)
+        self.timers.cancel(self._settings_sync_timer)
+        self.settings_manager.stop_auto_sync()
+        self.flow_config_watcher.stop()
+        self.metrics_store.close()
+        self.activity.close()
+        logging.getLogger().removeHandler(self.log_shipper)
+        self.log_shipper.close()
+        self.cloud.stop()
         self.input_collector.stop()
         self.protection.disable_protection()
         self.db.disconnect()
+        self.micro_intervention.cancel_intervention()
+        self.gamification.close()
+        self.ui.stop()
+        # self.timers is the process-wide wheel; components cancelled their own timers above
         
         self.logger.info("FlowAgent stopped")
     
+    @property
+    def startup_timings(self) -> Dict[str, float]:
+        """Seconds each finished start-up phase took"""
+        return self.startup.timings()
+    
+    def _build_startup_graph(self) -> StartupGraph:
+        """Start-up phases: local ones start at once, network ones run alongside"""
+        graph = StartupGraph()
+        
+        # Local only
+        graph.add('local_settings', self._load_settings)
+        graph.add('input_capture', self.input_collector.start, critical=True)
+        graph.add('monitoring', self._start_monitoring, depends_on=['local_settings', 'input_capture'], critical=True)
+        graph.add('api_server', self.api_server.start)
+        graph.add('native_messaging', self.native_messaging.start)
+        
+        # Network
+        graph.add('database', self._connect_database)
+        graph.add('cloud_settings', self._refresh_settings, depends_on=['database', 'local_settings'])
+        return graph
+    
+    def _start_monitoring(self):
+        """Start the monitoring loop thread"""
+        self.metrics_store.start()
+        self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
+        self.monitor_thread.start()
+    
+    def _prepare_ui(self):
+        """Start the UI thread with overlays pre-built and hidden (imports tkinter)"""
+        self.ui.start()
+        self.overlay_manager.prepare()
+        self.micro_intervention.prepare()
+    
+    def _connect_database(self):
+        """Connect to the database and start flushing buffered events"""
+        self.db.connect()
+        self.cloud.add_job('event_buffer_flush', self.db.flush_buffer, interval=60)
+        self.cloud.add_job('activity_upload', self.activity.flush, interval=self.activity_upload_interval)
+        if self.remote_logs_enabled:
+            logging.getLogger().addHandler(self.log_shipper)
+            self.cloud.add_job('log_shipping', self.log_shipper.ship, interval=self.remote_logs_interval)
+        if not self.db.connected:
+            raise ConnectionError("database unavailable")
+    
+    def _log_startup_timings(self):
+        self.startup.wait(timeout=30)
+        profile = ', '.join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.startup_timings.items())
+        self.logger.info(f"Start-up phases: {profile}")
+    
     def _monitor_loop(self):
         """Main monitoring loop - runs every second"""
         check_interval = self.config.get('flow_detection', {}).get('check_interval_seconds', 1)
         
         while self.running:
             try:
+                tick_start = time.perf_counter()
+                
                 # Update foreground app
                 current_app = self.input_collector.get_foreground_app()
                 
@@ -155,27 +311,25 @@ class FlowAgent:
                 self.metrics_history.append(metrics)
                 if len(self.metrics_history) > 20:  # Keep last 20 samples
                     self.metrics_history.pop(0)
+                self.metrics_store.record(metrics)
+                self.activity.record(metrics, self.flow_engine.get_state().value, current_app,
+                                     self.current_session_id)
                 
                 # Evaluate flow state
-                self.flow_engine.evaluate(metrics)
+                with FLOW_EVAL_SECONDS.time():
+                    self.flow_engine.evaluate(metrics, app=current_app)
                 
                 # Log metrics periodically (every 10 seconds)
                 if int(time.time()) % 10 == 0:
-                    self.logger.debug(f"Metrics: {metrics}, State: {self.flow_engine.get_state().value}")
+                    self.logger.debug("Metrics: %s, State: %s", metrics, self.flow_engine.get_state().value)
                 
-                # DISABLED: Micro-interventions cause threading issues with tkinter on macOS
                 # Check for cognitive fatigue
-                # if self.flow_engine.get_state() == FlowState.IN_FLOW:
-                #     if self.micro_intervention.detect_cognitive_fatigue(metrics, self.metrics_history):
-                #         self.logger.info("Triggering micro-intervention")
-                #         # Run intervention in separate thread
-                #         import threading
-                #         threading.Thread(
-                #             target=self.micro_intervention.trigger_soft_reset,
-                #             args=(30,),
-                #             daemon=True
-                #         ).start()
+                if self.flow_engine.get_state() == FlowState.IN_FLOW and self.micro_intervention.can_intervene():
+                    if self.micro_intervention.detect_cognitive_fatigue(metrics, self.metrics_history):
+                        self.logger.info("Triggering micro-intervention")
+                        self.micro_intervention.trigger_soft_reset(30)
                 
+                TICK_SECONDS.observe(time.perf_counter() - tick_start)
                 time.sleep(check_interval)
                 
             except Exception as e:
@@ -184,11 +338,18 @@ class FlowAgent:
     
     def _on_event(self, event):
         """Handle input events"""
+        INPUT_EVENTS.inc(type=event.type)
+        
         # Update metrics
         self.metrics.update_from_event(event)
-        
-        # Only log events to database if we have an active session
-        if not self.current_session_id:
+        if event.type == 'app_switch':
+            self.activity.add_app_switch(event.timestamp)
+            timeline = self.session_timeline
+            if timeline is not None:
+                timeline.add_switch(getattr(event, 'to_app', None), event.timestamp)
+        
+        # Only log events to database if opted in and we have an active session
+        if not self.upload_raw_events or not self.current_session_id:
             return
         
         # Log certain events to database
@@ -206,10 +367,33 @@ class FlowAgent:
         self.logger.info(f"Flow state changed: {old_state.value} -> {new_state.value}")
 
         if new_state == FlowState.IN_FLOW:
+            if not self._ui_prepare_scheduled:
+                # Overlays and interventions only appear in flow; build them off this thread
+                self._ui_prepare_scheduled = True
+                self.timers.call_later(0, self._prepare_ui, background=True)
             self._start_session()
         elif old_state == FlowState.IN_FLOW and new_state != FlowState.IN_FLOW:
             self._end_session(reason or "unknown")
 
+    def pause_protection(self, duration_minutes: float):
+        """Disable protection and re-enable it when the pause expires"""
+        self.protection.disable_protection()
+        self.overlay_manager.close_overlay()
+        
+        self.timers.cancel(self._pause_timer)
+        self._pause_timer = self.timers.call_later(duration_minutes * 60, self._resume_protection,
+                                                 background=True)
+        self.logger.info(f"Protection paused for {duration_minutes} minutes")
+    
+    def _resume_protection(self):
+        """Re-enable protection after a pause if still in a session"""
+        self._pause_timer = None
+        if self.current_session_id and self.flow_engine.get_state() == FlowState.IN_FLOW:
+            self.protection.enable_protection(self.blocklist)
+            self.logger.info("Protection pause expired, protection re-enabled")
+        else:
+            self.logger.info("Protection pause expired")
+
     def _on_flow_broken(self, app_name: str):
         """Handle flow broken by overlay unlock"""
         self.logger.info(f"Flow broken by opening: {app_name}")
@@ -217,7 +401,7 @@ class FlowAgent:
 
     def _on_extension_message(self, message: dict) -> Optional[dict]:
         """Handle messages from Chrome extension"""
-        self.logger.debug(f"Extension message: {message}")
+        self.logger.debug("Extension message: %s", message)
 
         cmd = message.get('cmd')
         if cmd == 'get_status':
@@ -246,17 +430,26 @@ class FlowAgent:
     @property
     def auth(self):
         """Lazy initialization of auth service"""
-        if self._auth is None:
-            try:
-                self._auth = AuthService(self.config)
-            except Exception as e:
-                self.logger.error(f"Failed to initialize auth service: {e}")
-                # Return a dummy object that always returns None for user_id
-                class DummyAuth:
-                    def is_authenticated(self): return False
-                    current_user = None
-                self._auth = DummyAuth()
-        return self._auth
+        with self._auth_lock:
+            if self._auth is None:
+                try:
+                    self._auth = AuthService(self.config, scheduler=self.cloud, restore_in_background=True)
+                except Exception as e:
+                    self.logger.error(f"Failed to initialize auth service: {e}")
+                    # Return a dummy object that always returns None for user_id
+                    class DummyAuth:
+                        def is_authenticated(self): return False
+                        current_user = None
+                    self._auth = DummyAuth()
+            return self._auth
+    
+    def _upload_activity(self, rows: List[Dict]) -> bool:
+        """Send a batch of activity minutes for the current user"""
+        return self.db.upload_activity_minutes(rows, self._get_user_id())
+    
+    def _ship_logs(self, rows: List[Dict]) -> bool:
+        """Send a batch of log rows for the current user"""
+        return self.db.insert_agent_logs(rows, self._get_user_id())
     
     def _get_user_id(self) -> Optional[str]:
         """Get current user ID from auth service"""
@@ -277,6 +470,7 @@ class FlowAgent:
         current_app = self.input_collector.get_foreground_app()
         self.session_start_app = current_app
         self.session_start_time = time.time()
+        self.session_timeline = SessionTimeline(self.session_start_time, current_app)
         
         # Get user ID (may be None if not authenticated)
         user_id = self._get_user_id()
@@ -287,9 +481,10 @@ class FlowAgent:
         self.current_session_id = self.db.start_session(user_id, current_app or "Unknown")
         
         # Log flow_on event
-        self.db.insert_event(user_id, self.current_session_id, 'flow_on', {
-            'app': current_app
-        })
+        if self.upload_raw_events:
+            self.db.insert_event(user_id, self.current_session_id, 'flow_on', {
+                'app': current_app
+            })
         
         # Enable protection
         self.protection.enable_protection(self.blocklist)
@@ -313,26 +508,39 @@ class FlowAgent:
         duration_seconds = time.time() - self.session_start_time if self.session_start_time else 0
         duration_minutes = int(duration_seconds / 60)
         
-        # End session in database
+        # End session in database, with its app timeline in the same request
+        timeline = self.session_timeline
+        self.session_timeline = None
+        if timeline is not None:
+            timeline.end(current_app)
         self.db.end_session(
             self.current_session_id,
             current_app or "Unknown",
             metrics['typing_rate'],
             metrics['max_idle_gap'],
-            reason
+            reason,
+            timeline=timeline.encode() if timeline is not None else None
         )
         
         # Log flow_off event
-        self.db.insert_event(user_id, self.current_session_id, 'flow_off', {
-            'app': current_app,
-            'reason': reason
-        })
+        if self.upload_raw_events:
+            self.db.insert_event(user_id, self.current_session_id, 'flow_off', {
+                'app': current_app,
+                'reason': reason
+            })
         
         # Update gamification stats
         if duration_minutes > 0:
-            self.gamification.add_flow_session(duration_minutes)
+            self.gamification.add_flow_session(
+                duration_minutes,
+                start_time=self.session_start_time,
+                start_app=self.session_start_app,
+                end_reason=reason
+            )
         
         # Disable protection
+        self.timers.cancel(self._pause_timer)
+        self._pause_timer = None
         self.protection.disable_protection()
         
         self.logger.info(f"Ended flow session: {self.current_session_id} (reason: {reason})")
@@ -340,21 +548,110 @@ class FlowAgent:
         self.session_start_time = None
     
     def _load_settings(self):
-        """Load settings from database"""
+        """Apply the last known settings from disk"""
+        if self.settings_manager.load_local():
+            self._on_settings_changed('flow_config', self.settings_manager.flow_config_cache)
+            self._on_settings_changed('blocklist', self.settings_manager.blocklist_cache)
+        else:
+            self.logger.info("No local settings snapshot, using default settings")
+    
+        self.flow_config_watcher.start()
+    
+    def _refresh_settings(self):
+        """Fetch settings from the database and apply what changed"""
         try:
+            settings = self.db.get_settings_many(['flow_detection', 'blocklist'], self._get_user_id())
+            
             # Load flow detection config
-            flow_config = self.db.get_settings('flow_detection')
+            flow_config = settings.get('flow_detection')
             if flow_config:
-                self.flow_config = flow_config
-                self.flow_engine.config = flow_config
-                self.logger.info("Loaded flow detection config from database")
+                self.settings_manager.apply_remote('flow_config', flow_config)
             
             # Load blocklist
-            blocklist_config = self.db.get_settings('blocklist')
+            blocklist_config = settings.get('blocklist')
             if blocklist_config and 'domains' in blocklist_config:
-                self.blocklist = blocklist_config['domains']
-                self.logger.info(f"Loaded blocklist: {len(self.blocklist)} domains")
+                self.settings_manager.apply_remote('blocklist', blocklist_config)
             
         except Exception as e:
             self.logger.warning(f"Could not load settings from database: {e}")
-            self.logger.info("Using default settings")
+        
+    def _start_settings_sync(self):
+        """
+        Restore the keychain session and keep settings in sync when signed in
+        
+        Settings sync is the agent's first use of auth, so this is where the
+        lazy AuthService (supabase, keyring) gets created, a while after
+        start-up rather than on every start.
+        """
+        self._settings_sync_timer = None
+        if not self.running:
+            return
+        
+        auth = self.auth
+        if hasattr(auth, 'wait_until_restored') and not auth.wait_until_restored(10):
+            self.logger.warning("Session restore timed out, settings sync not started")
+            return
+        if not auth.is_authenticated():
+            return
+        
+        self.settings_manager.attach(auth, auth.client)
+        self.settings_manager.start_auto_sync()
+    
+    def apply_flow_config(self, config) -> Tuple[bool, Optional[str]]:
+        """
+        Validate and swap in a new flow config
+        
+        Returns:
+            (success: bool, error_message: Optional[str]); on error the
+            current config stays in effect
+        """
+        try:
+            compiled = self.flow_engine.set_config(config)
+        except FlowConfigError as e:
+            self.logger.error(f"Rejected flow config: {e}")
+            return False, str(e)
+        
+        self.flow_config = compiled.as_dict()
+        self.logger.info("Applied updated flow config")
+        return True, None
+    
+    def update_settings(self, flow_config: Optional[Dict] = None,
+                        blocklist: Optional[List[str]] = None) -> Tuple[bool, Optional[str]]:
+        """
+        Apply settings edited locally (dashboard API) and hand them to the settings manager
+        
+        The manager records them in its snapshot and pending changes and
+        pushes them when signed in, so they survive an offline restart.
+        
+        Returns:
+            (success: bool, error_message: Optional[str]); nothing is saved
+            if the flow config is rejected
+        """
+        if flow_config is not None:
+            success, error = self.apply_flow_config(flow_config)
+            if not success:
+                return False, error
+            self.settings_manager.update_flow_config(self.flow_config)
+            self._write_through_setting('flow_detection', self.flow_config)
+        
+        if blocklist is not None:
+            value = {'domains': list(blocklist)}
+            self._on_settings_changed('blocklist', value)
+            self.settings_manager.update_blocklist(value)
+            self._write_through_setting('blocklist', value)
+        
+        return True, None
+    
+    def _write_through_setting(self, key: str, value: Optional[Dict]):
+        """Keep the database settings cache on the edited value so reads don't revert it"""
+        self.db.cache_setting(key, value, self._get_user_id())
+    
+    def _on_settings_changed(self, section: str, value):
+        """Hot-apply changed settings"""
+        if section == 'flow_config' and value:
+            self.apply_flow_config(value)
+        elif section == 'blocklist' and value and 'domains' in value:
+            self.blocklist = value['domains']
+            if self.protection.blocking_enabled:
+                self.protection.enable_blocking(self.blocklist)
+            self.logger.info(f"Applied updated blocklist: {len(self.blocklist)} domains")
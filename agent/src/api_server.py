@@ -3,33 +3,53 @@ Local HTTP API Server - Provides REST API for dashboard
 """
 
 import logging
-from flask import Flask, jsonify, request
-from flask_cors import CORS
+import select
+import socket
 from typing import Callable, Optional
 import threading
+import time
+
+from .instrumentation import get_registry
 
 
 class AgentAPIServer:
-    """HTTP API server for dashboard communication"""
+    """
+    HTTP API server for dashboard communication
+    
+    The port is bound at start so clients can connect right away, but Flask
+    is only imported and the app built when the first connection arrives;
+    agents nobody queries never load the web stack.
+    """
     
     def __init__(self, agent, config: dict):
         self.logger = logging.getLogger(__name__)
         self.agent = agent
         self.config = config
         
-        # Create Flask app
+        # Flask app, built on first connection
+        self.app = None
+        
+        # Server thread
+        self.server_thread = None
+        self.running = False
+        self._socket: Optional[socket.socket] = None
+        self._server = None
+    
+    def _create_app(self):
+        """Build the Flask app (first use imports Flask)"""
+        from flask import Flask
+        from flask_cors import CORS
+        
         self.app = Flask(__name__)
         CORS(self.app)  # Enable CORS for localhost
         
         # Setup routes
         self._setup_routes()
-        
-        # Server thread
-        self.server_thread = None
-        self.running = False
+        return self.app
     
     def _setup_routes(self):
         """Setup API routes"""
+        from flask import Response, jsonify, request
         
         @self.app.route('/status', methods=['GET'])
         def get_status():
@@ -40,12 +60,17 @@ class AgentAPIServer:
                 metrics = self.agent.metrics.get_all_metrics()
                 
                 # Check permissions for UI
-                from .ui.utils import check_permissions
-                permissions = check_permissions()
+                try:
+                    from .ui.utils import check_permissions
+                    permissions = check_permissions()
+                except ImportError:
+                    permissions = None
                 
                 return jsonify({
                     'status': 'ok',
                     'agent_running': True,
+                    'ready': self.agent.startup.is_ready(),
+                    'startup': self.agent.startup.status(),
                     'flow_state': state.value,
                     'time_in_state_seconds': time_in_state,
                     'current_session_id': self.agent.current_session_id,
@@ -64,11 +89,8 @@ class AgentAPIServer:
                 data = request.json
                 duration_minutes = data.get('duration_minutes', 10)
                 
-                # Disable protection
-                self.agent.protection.disable_protection()
-                self.agent.overlay_manager.close_overlay()
-                
-                # TODO: Re-enable after duration
+                # Disable protection; re-enabled by the agent when the pause expires
+                self.agent.pause_protection(duration_minutes)
                 
                 return jsonify({
                     'status': 'ok',
@@ -111,6 +133,59 @@ class AgentAPIServer:
                 self.logger.error(f"Error getting gamification stats: {e}")
                 return jsonify({'status': 'error', 'message': str(e)}), 500
         
+        @self.app.route('/stats/history', methods=['GET'])
+        def get_session_history():
+            """Get recent sessions and per-day heatmap"""
+            try:
+                days = request.args.get('days', 90, type=int)
+                limit = request.args.get('limit', 20, type=int)
+                return jsonify({
+                    'status': 'ok',
+                    'heatmap': self.agent.gamification.get_heatmap(days),
+                    'sessions': self.agent.gamification.get_recent_sessions(limit)
+                })
+            except Exception as e:
+                self.logger.error(f"Error getting session history: {e}")
+                return jsonify({'status': 'error', 'message': str(e)}), 500
+        
+        @self.app.route('/stats/timeseries', methods=['GET'])
+        def get_metrics_timeseries():
+            """Get stored metrics for a time range (epoch seconds, default last 24 h)"""
+            try:
+                end = request.args.get('end', time.time(), type=float)
+                start = request.args.get('start', end - 86400, type=float)
+                columns = request.args.get('columns')
+                series = self.agent.metrics_store.query(
+                    start, end,
+                    resolution=request.args.get('resolution'),
+                    columns=columns.split(',') if columns else None,
+                    max_points=request.args.get('max_points', 2000, type=int)
+                )
+                return jsonify({'status': 'ok', **series})
+            except ValueError as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
+            except Exception as e:
+                self.logger.error(f"Error getting metrics timeseries: {e}")
+                return jsonify({'status': 'error', 'message': str(e)}), 500
+        
+        @self.app.route('/stats/timeseries/usage', methods=['GET'])
+        def get_metrics_storage():
+            """Get disk use and retention of the metrics store"""
+            try:
+                return jsonify({
+                    'status': 'ok',
+                    'bytes': self.agent.metrics_store.disk_usage(),
+                    'retention_seconds': self.agent.metrics_store.retention
+                })
+            except Exception as e:
+                self.logger.error(f"Error getting metrics storage: {e}")
+                return jsonify({'status': 'error', 'message': str(e)}), 500
+        
+        @self.app.route('/metrics', methods=['GET'])
+        def get_instrumentation():
+            """Agent performance metrics in the Prometheus text format"""
+            return Response(get_registry().render(), mimetype='text/plain; version=0.0.4')
+        
         @self.app.route('/settings', methods=['GET'])
         def get_settings():
             """Get current settings"""
@@ -130,19 +205,13 @@ class AgentAPIServer:
             try:
                 data = request.json
                 
-                if 'flow_config' in data:
-                    self.agent.flow_config = data['flow_config']
-                    self.agent.flow_engine.config = data['flow_config']
-                
-                if 'blocklist' in data:
-                    self.agent.blocklist = data['blocklist']
-                
-                # Save to database
-                if 'flow_config' in data:
-                    self.agent.db.upsert_setting('flow_detection', data['flow_config'])
-                
-                if 'blocklist' in data:
-                    self.agent.db.upsert_setting('blocklist', {'domains': data['blocklist']})
+                # Saved and synced by the settings manager
+                success, error = self.agent.update_settings(
+                    flow_config=data.get('flow_config'),
+                    blocklist=data.get('blocklist')
+                )
+                if not success:
+                    return jsonify({'status': 'error', 'message': error}), 400
                 
                 return jsonify({
                     'status': 'ok',
@@ -156,22 +225,49 @@ class AgentAPIServer:
         """Start the API server"""
         port = self.config.get('agent', {}).get('api_port', 8765)
         
-        def run_server():
-            self.app.run(
-                host='127.0.0.1',
-                port=port,
-                debug=False,
-                use_reloader=False
-            )
+        try:
+            self._socket = socket.create_server(('127.0.0.1', port))
+        except OSError as e:
+            self.logger.error(f"API server could not bind port {port}: {e}")
+            return
         
         self.running = True
-        self.server_thread = threading.Thread(target=run_server, daemon=True)
+        self.server_thread = threading.Thread(target=self._serve, daemon=True)
         self.server_thread.start()
         
-        self.logger.info(f"API server started on http://127.0.0.1:{port}")
+        self.logger.info(f"API server listening on http://127.0.0.1:{self._socket.getsockname()[1]}")
+    
+    def _serve(self):
+        """Wait for the first connection, then load Flask and serve on the bound socket"""
+        listener = self._socket
+        try:
+            while self.running:
+                readable, _, _ = select.select([listener], [], [], 0.5)
+                if readable:
+                    break
+            if not self.running:
+                return
+            
+            from werkzeug.serving import make_server
+            
+            server = make_server('127.0.0.1', listener.getsockname()[1], self._create_app(),
+                                 threaded=True, fd=listener.fileno())
+        except Exception as e:
+            self.logger.error(f"API server failed: {e}")
+            return
+        finally:
+            # make_server works on a duplicate of the descriptor
+            listener.close()
+        
+        self.logger.info("API server loaded")
+        self._server = server
+        server.serve_forever()
     
     def stop(self):
         """Stop the API server"""
         self.running = False
-        # Flask doesn't have a clean shutdown method in development mode
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
         self.logger.info("API server stopped")
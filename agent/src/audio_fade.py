@@ -0,0 +1,288 @@
+"""
+Audio Fade Engine - Smooth system volume fades without per-step processes
+"""
+
+import logging
+import math
+import select
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+from .timer_wheel import TimerWheel, get_timer_wheel
+
+
+# Easing curves map progress in [0, 1] to fade position in [0, 1]
+def linear(t: float) -> float:
+    return t
+
+
+def ease_in_out(t: float) -> float:
+    return 0.5 - 0.5 * math.cos(math.pi * t)
+
+
+def ease_out_quad(t: float) -> float:
+    return 1 - (1 - t) * (1 - t)
+
+
+class VolumeBackend:
+    """Reads and sets the system output volume (0-100)"""
+    
+    def get_volume(self) -> int:
+        raise NotImplementedError
+    
+    def set_volume(self, volume: int):
+        raise NotImplementedError
+    
+    def close(self):
+        pass
+
+
+class FakeVolumeBackend(VolumeBackend):
+    """In-memory volume for tests and non-macOS platforms"""
+    
+    def __init__(self, volume: int = 50):
+        self.volume = volume
+        self.history = []
+    
+    def get_volume(self) -> int:
+        return self.volume
+    
+    def set_volume(self, volume: int):
+        self.volume = volume
+        self.history.append(volume)
+
+
+# JXA loop: one line per command on stdin ("get" or "set N"), replies to "get" on stdout
+_JXA_VOLUME_SERVER = r'''
+ObjC.import('Foundation');
+var app = Application.currentApplication();
+app.includeStandardAdditions = true;
+var stdin = $.NSFileHandle.fileHandleWithStandardInput;
+var stdout = $.NSFileHandle.fileHandleWithStandardOutput;
+function reply(s) {
+    stdout.writeData($(s + '\n').dataUsingEncoding($.NSUTF8StringEncoding));
+}
+var buffer = '';
+while (true) {
+    var data = stdin.availableData;
+    if (data.length == 0) break;
+    buffer += $.NSString.alloc.initWithDataEncoding(data, $.NSUTF8StringEncoding).js;
+    var lines = buffer.split('\n');
+    buffer = lines.pop();
+    for (var i = 0; i < lines.length; i++) {
+        var line = lines[i];
+        if (line == 'get') {
+            reply(String(app.getVolumeSettings().outputVolume));
+        } else if (line.indexOf('set ') == 0) {
+            app.setVolume(null, {outputVolume: parseInt(line.slice(4), 10)});
+        }
+    }
+}
+'''
+
+
+class OsaScriptVolumeBackend(VolumeBackend):
+    """
+    macOS volume through one long-lived osascript (JXA) process
+    
+    The process is spawned on first use and reused for every get/set, so a
+    fade costs pipe writes instead of one osascript launch per step. Reads
+    wait at most timeout seconds (osascript can hang, e.g. on a permission
+    prompt); a late reply restarts the process and the last known volume
+    is returned instead.
+    """
+    
+    def __init__(self, timeout: float = 0.5):
+        self.logger = logging.getLogger(__name__)
+        self.timeout = timeout
+        self._process: Optional[subprocess.Popen] = None
+        self._last_volume: Optional[int] = None
+        self._lock = threading.Lock()
+    
+    def _ensure_process(self) -> subprocess.Popen:
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                ['osascript', '-l', 'JavaScript', '-e', _JXA_VOLUME_SERVER],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                bufsize=1
+            )
+            self.logger.info("Started persistent osascript volume process")
+        return self._process
+    
+    def get_volume(self) -> int:
+        with self._lock:
+            process = self._ensure_process()
+            process.stdin.write('get\n')
+            process.stdin.flush()
+            
+            ready, _, _ = select.select([process.stdout], [], [], self.timeout)
+            reply = process.stdout.readline().strip() if ready else ''
+            if not reply:
+                # Its late reply would be read as the answer to the next get
+                self._stop_process()
+                if self._last_volume is None:
+                    raise TimeoutError("osascript did not report the volume in time")
+                self.logger.warning(f"osascript volume read timed out; using last known {self._last_volume}")
+                return self._last_volume
+            
+            self._last_volume = int(reply)
+            return self._last_volume
+    
+    def set_volume(self, volume: int):
+        with self._lock:
+            process = self._ensure_process()
+            process.stdin.write(f'set {volume}\n')
+            process.stdin.flush()
+            self._last_volume = volume
+    
+    def _stop_process(self):
+        if self._process and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        self._process = None
+    
+    def close(self):
+        with self._lock:
+            if self._process and self._process.poll() is None:
+                self._process.stdin.close()
+                try:
+                    self._process.wait(timeout=1)
+                except subprocess.TimeoutExpired:
+                    self._process.kill()
+            self._process = None
+
+
+def default_volume_backend() -> VolumeBackend:
+    """Pick the real backend on macOS, the fake one elsewhere"""
+    if sys.platform == 'darwin' and shutil.which('osascript'):
+        return OsaScriptVolumeBackend()
+    return FakeVolumeBackend()
+
+
+class Fade:
+    """Handle for an in-progress fade"""
+    
+    def __init__(self, start: int, target: int, duration: float, easing: Callable[[float], float],
+                 on_done: Optional[Callable[[bool], None]]):
+        self.start = start
+        self.target = target
+        self.duration = duration
+        self.easing = easing
+        self.on_done = on_done
+        self.started_at = time.monotonic()
+        self.last_volume = start
+        self.cancelled = False
+        self.timer = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+    
+    def cancel(self):
+        """Stop the fade where it is"""
+        self.cancelled = True
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the fade finishes or is cancelled"""
+        return self._done.wait(timeout)
+    
+    def is_done(self) -> bool:
+        return self._done.is_set()
+
+
+class AudioFadeEngine:
+    """Runs volume fades as timer-wheel steps against a VolumeBackend"""
+    
+    def __init__(self, backend: Optional[VolumeBackend] = None, timers: Optional[TimerWheel] = None,
+                 step_seconds: float = 0.05):
+        self.logger = logging.getLogger(__name__)
+        self.backend = backend or default_volume_backend()
+        self.timers = timers
+        self.step_seconds = step_seconds
+        self.current: Optional[Fade] = None
+    
+    def get_volume(self) -> int:
+        return self.backend.get_volume()
+    
+    def fade_to(self, target: int, duration: float = 2.0, easing: Callable[[float], float] = ease_in_out,
+                start: Optional[int] = None, on_done: Optional[Callable[[bool], None]] = None) -> Fade:
+        """
+        Fade volume to target over duration seconds
+        
+        Any fade already running is cancelled. on_done(completed) is called
+        once the fade finishes (True) or is cancelled (False).
+        """
+        self.cancel()
+        
+        if start is None:
+            start = self.backend.get_volume()
+        target = max(0, min(100, int(target)))
+        
+        fade = Fade(start, target, max(0.0, duration), easing, on_done)
+        self.current = fade
+        
+        if fade.duration == 0 or start == target:
+            self._finish(fade, completed=True)
+            return fade
+        
+        timers = self.timers or get_timer_wheel()
+        fade.timer = timers.call_repeating(self.step_seconds, self._step, fade, initial_delay=0)
+        return fade
+    
+    def cancel(self):
+        """Cancel the running fade, if any"""
+        fade = self.current
+        if fade and not fade.is_done():
+            fade.cancel()
+            self._finish(fade, completed=False)
+    
+    def _step(self, fade: Fade):
+        if fade.is_done():
+            return
+        if fade.cancelled:
+            self._finish(fade, completed=False)
+            return
+        
+        progress = min(1.0, (time.monotonic() - fade.started_at) / fade.duration)
+        volume = round(fade.start + (fade.target - fade.start) * fade.easing(progress))
+        volume = max(0, min(100, volume))
+        
+        # Only talk to the backend when the integer volume actually moves
+        if volume != fade.last_volume:
+            try:
+                self.backend.set_volume(volume)
+            except Exception as e:
+                self.logger.error(f"Error setting volume: {e}")
+                self._finish(fade, completed=False)
+                return
+            fade.last_volume = volume
+        
+        if progress >= 1.0:
+            self._finish(fade, completed=True)
+    
+    def _finish(self, fade: Fade, completed: bool):
+        with fade._lock:
+            if fade.is_done():
+                return
+            fade._done.set()
+        if fade.timer:
+            fade.timer.cancel()
+        if completed and fade.last_volume != fade.target:
+            self.backend.set_volume(fade.target)
+            fade.last_volume = fade.target
+        if self.current is fade:
+            self.current = None
+        if fade.on_done:
+            try:
+                fade.on_done(completed)
+            except Exception as e:
+                self.logger.error(f"Error in fade callback: {e}")
+    
+    def close(self):
+        self.cancel()
+        self.backend.close()
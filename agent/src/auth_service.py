@@ -4,40 +4,82 @@ Handles all Supabase authentication operations
 """
 
 import logging
-from typing import Dict, Optional, Tuple
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
 from datetime import datetime, timedelta
-from supabase import create_client, Client
-from gotrue.errors import AuthApiError
 
-# Disable problematic keyring backends to prevent segfault with PyObjC
-import keyring
-try:
-    from keyring.backends.macOS import Keyring as MacOSKeyring
-    keyring.set_keyring(MacOSKeyring())
-except ImportError:
-    # Fallback - just use default but disable the problematic ones
-    pass
+from .cloud_scheduler import CloudScheduler, get_cloud_scheduler
+from .lazy_import import lazy_import
+from .timer_wheel import get_timer_wheel
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+
+def _configure_keyring(module):
+    # Disable problematic keyring backends to prevent segfault with PyObjC
+    try:
+        from keyring.backends.macOS import Keyring as MacOSKeyring
+        module.set_keyring(MacOSKeyring())
+    except ImportError:
+        # Fallback - just use default but disable the problematic ones
+        pass
+
+
+# Heavy dependencies, imported when auth is first used
+supabase = lazy_import('supabase')
+client_options = lazy_import('supabase.lib.client_options')
+gotrue_errors = lazy_import('gotrue.errors')
+keyring = lazy_import('keyring', on_load=_configure_keyring)
 
 
 class AuthService:
-    """Manages user authentication with Supabase"""
+    """
+    Manages user authentication with Supabase
+    
+    Tokens are refreshed by a background job before they expire, keychain
+    entries are read once and mirrored in memory, and the user profile is
+    cached for profile_ttl seconds (served stale while a refresh runs).
+    """
     
     KEYRING_SERVICE = "FlowFacilitator"
     ACCESS_TOKEN_KEY = "access_token"
     REFRESH_TOKEN_KEY = "refresh_token"
     
-    def __init__(self, config: Dict):
+    REFRESH_MARGIN_SECONDS = 300  # refresh this long before the access token expires
+    REFRESH_CHECK_SECONDS = 60
+    
+    def __init__(self, config: Dict, scheduler: Optional[CloudScheduler] = None,
+                 restore_in_background: bool = False):
         self.logger = logging.getLogger(__name__)
         self.config = config
-        self.client: Optional[Client] = None
+        self.client: Optional['Client'] = None
         self.current_user = None
         self.session = None
+        self.scheduler = scheduler
+        
+        # Keychain mirror: None until first read, then (access, refresh) or ()
+        self._credentials: Optional[Tuple[str, ...]] = None
+        
+        # Profile cache
+        self.profile_ttl = 300
+        self._profile: Optional[Dict] = None
+        self._profile_expires_at = 0.0
+        self._profile_generation = 0  # bumped on every invalidation; older fetches are dropped
+        self._profile_refreshing: Optional[int] = None  # generation being refetched
+        self._profile_lock = threading.Lock()
+        
+        self.restored = threading.Event()
         
         # Initialize Supabase client
         self._initialize_client()
         
         # Try to restore session from keychain
-        self._restore_session()
+        if restore_in_background:
+            get_timer_wheel().call_later(0, self._restore_session, background=True)
+        else:
+            self._restore_session()
     
     def _initialize_client(self):
         """Initialize Supabase client"""
@@ -46,7 +88,10 @@ class AuthService:
             # Use anon key for client-side auth
             anon_key = self.config['supabase'].get('anon_key') or self.config['supabase']['service_key']
             
-            self.client = create_client(url, anon_key)
+            # Token refresh is ours (see _refresh_if_due), not gotrue's timer thread
+            self.client = supabase.create_client(
+                url, anon_key, options=client_options.ClientOptions(auto_refresh_token=False)
+            )
             self.logger.info(f"Initialized Supabase client at {url}")
             
         except Exception as e:
@@ -56,36 +101,56 @@ class AuthService:
     def _restore_session(self):
         """Restore session from keychain"""
         try:
-            access_token = keyring.get_password(self.KEYRING_SERVICE, self.ACCESS_TOKEN_KEY)
-            refresh_token = keyring.get_password(self.KEYRING_SERVICE, self.REFRESH_TOKEN_KEY)
+            access_token, refresh_token = self._load_credentials() or (None, None)
             
             if access_token and refresh_token:
                 # Try to restore session
                 result = self.client.auth.set_session(access_token, refresh_token)
                 
                 if result.user:
-                    self.current_user = result.user
-                    self.session = result.session
+                    self._set_session(result.session, result.user)
                     self.logger.info(f"Restored session for user: {self.current_user.email}")
                     return True
                     
         except Exception as e:
             self.logger.warning(f"Could not restore session: {e}")
             self._clear_stored_credentials()
+        finally:
+            self.restored.set()
         
         return False
     
+    def wait_until_restored(self, timeout: Optional[float] = None) -> bool:
+        """Block until the startup session restore has finished"""
+        return self.restored.wait(timeout)
+    
+    def _load_credentials(self) -> Tuple[str, ...]:
+        """Read tokens from the keychain once; later calls use memory"""
+        if self._credentials is None:
+            try:
+                access_token = keyring.get_password(self.KEYRING_SERVICE, self.ACCESS_TOKEN_KEY)
+                refresh_token = keyring.get_password(self.KEYRING_SERVICE, self.REFRESH_TOKEN_KEY)
+                self._credentials = (access_token, refresh_token) if access_token and refresh_token else ()
+            except Exception as e:
+                self.logger.warning(f"Could not read credentials: {e}")
+                self._credentials = ()
+        return self._credentials
+    
     def _store_credentials(self, access_token: str, refresh_token: str):
         """Store credentials in keychain"""
+        if self._credentials == (access_token, refresh_token):
+            return
         try:
             keyring.set_password(self.KEYRING_SERVICE, self.ACCESS_TOKEN_KEY, access_token)
             keyring.set_password(self.KEYRING_SERVICE, self.REFRESH_TOKEN_KEY, refresh_token)
+            self._credentials = (access_token, refresh_token)
             self.logger.info("Stored credentials in keychain")
         except Exception as e:
             self.logger.error(f"Failed to store credentials: {e}")
     
     def _clear_stored_credentials(self):
         """Clear credentials from keychain"""
+        self._credentials = ()
         try:
             keyring.delete_password(self.KEYRING_SERVICE, self.ACCESS_TOKEN_KEY)
             keyring.delete_password(self.KEYRING_SERVICE, self.REFRESH_TOKEN_KEY)
@@ -93,6 +158,44 @@ class AuthService:
         except Exception as e:
             self.logger.warning(f"Could not clear credentials: {e}")
     
+    def _set_session(self, session, user):
+        """Adopt a new session: persist tokens, schedule refresh, warm the profile"""
+        previous_user_id = getattr(self.current_user, 'id', None)
+        self.session = session
+        self.current_user = user
+        
+        if previous_user_id != getattr(user, 'id', None):
+            self.clear_profile()
+        
+        if not session:
+            return
+        
+        self._store_credentials(session.access_token, session.refresh_token)
+        if self._profile is None:
+            self._refresh_profile_async()
+        
+        scheduler = self.scheduler or get_cloud_scheduler()
+        if 'token_refresh' not in scheduler.jobs:
+            scheduler.add_job(
+                'token_refresh',
+                self._refresh_if_due,
+                interval=self.REFRESH_CHECK_SECONDS,
+                backoff_base=10,
+                backoff_cap=self.REFRESH_CHECK_SECONDS
+            )
+    
+    def _refresh_if_due(self):
+        """Scheduler job: refresh the session when it is close to expiring"""
+        if not self.session:
+            return
+        expires_at = self.session.expires_at or 0
+        if expires_at - time.time() > self.REFRESH_MARGIN_SECONDS:
+            return
+        
+        success, error = self.refresh_session()
+        if not success:
+            raise ConnectionError(error)
+    
     def sign_up(self, email: str, password: str, full_name: str = "") -> Tuple[bool, Optional[str]]:
         """
         Sign up a new user
@@ -119,16 +222,10 @@ class AuthService:
 
             if result.user:
                 self.logger.info(f"🔐 [DEBUG] Signup successful - user ID: {result.user.id}, email: {result.user.email}")
-                self.current_user = result.user
-                self.session = result.session
-
-                # Store credentials
+                # Store credentials, schedule refresh
                 if result.session:
                     self.logger.info("🔐 [DEBUG] Storing session credentials")
-                    self._store_credentials(
-                        result.session.access_token,
-                        result.session.refresh_token
-                    )
+                self._set_session(result.session, result.user)
 
                 self.logger.info(f"User signed up: {email}")
                 return True, None
@@ -136,7 +233,7 @@ class AuthService:
                 self.logger.warning("🔐 [DEBUG] Signup failed - no user returned")
                 return False, "Signup failed"
 
-        except AuthApiError as e:
+        except gotrue_errors.AuthApiError as e:
             self.logger.error(f"🔐 [DEBUG] Signup AuthApiError: {e}")
             return False, str(e)
         except Exception as e:
@@ -163,16 +260,10 @@ class AuthService:
 
             if result.user:
                 self.logger.info(f"🔐 [DEBUG] Signin successful - user ID: {result.user.id}, email: {result.user.email}")
-                self.current_user = result.user
-                self.session = result.session
-
-                # Store credentials
+                # Store credentials, schedule refresh
                 if result.session:
                     self.logger.info("🔐 [DEBUG] Storing session credentials")
-                    self._store_credentials(
-                        result.session.access_token,
-                        result.session.refresh_token
-                    )
+                self._set_session(result.session, result.user)
 
                 self.logger.info(f"User signed in: {email}")
                 return True, None
@@ -180,7 +271,7 @@ class AuthService:
                 self.logger.warning("🔐 [DEBUG] Signin failed - no user returned")
                 return False, "Sign in failed"
 
-        except AuthApiError as e:
+        except gotrue_errors.AuthApiError as e:
             self.logger.error(f"🔐 [DEBUG] Signin AuthApiError: {e}")
             error_msg = "Invalid email or password"
             if "Email not confirmed" in str(e):
@@ -205,6 +296,8 @@ class AuthService:
             
             self.current_user = None
             self.session = None
+            self.clear_profile()
+            (self.scheduler or get_cloud_scheduler()).remove_job('token_refresh')
             
             self.logger.info("User signed out")
             return True, None
@@ -225,7 +318,7 @@ class AuthService:
             self.logger.info(f"Password reset email sent to: {email}")
             return True, None
             
-        except AuthApiError as e:
+        except gotrue_errors.AuthApiError as e:
             self.logger.error(f"Password reset error: {e}")
             return False, str(e)
         except Exception as e:
@@ -250,7 +343,7 @@ class AuthService:
             self.logger.info("Password updated")
             return True, None
             
-        except AuthApiError as e:
+        except gotrue_errors.AuthApiError as e:
             self.logger.error(f"Password update error: {e}")
             return False, str(e)
         except Exception as e:
@@ -275,14 +368,8 @@ class AuthService:
             result = self.client.auth.refresh_session(self.session.refresh_token)
             
             if result.session:
-                self.session = result.session
-                self.current_user = result.user
-                
                 # Update stored credentials
-                self._store_credentials(
-                    result.session.access_token,
-                    result.session.refresh_token
-                )
+                self._set_session(result.session, result.user)
                 
                 self.logger.info("Session refreshed")
                 return True, None
@@ -297,28 +384,90 @@ class AuthService:
         """Check if user is authenticated"""
         return self.current_user is not None and self.session is not None
     
-    def get_user_profile(self) -> Optional[Dict]:
+    def get_user_profile(self, force_refresh: bool = False) -> Optional[Dict]:
         """
         Get user profile from all_users table
         
+        Served from cache; an expired entry is returned as-is while a
+        background refresh runs, so only the very first call waits.
+        
         Returns:
             User profile dict or None
         """
-        try:
-            if not self.is_authenticated():
-                return None
+        if not self.is_authenticated():
+            return None
             
+        with self._profile_lock:
+            profile = self._profile
+            fresh = time.monotonic() < self._profile_expires_at
+        
+        if profile is not None and not force_refresh:
+            if not fresh:
+                self._refresh_profile_async()
+            return profile
+        
+        return self._fetch_profile()
+    
+    def _fetch_profile(self) -> Optional[Dict]:
+        with self._profile_lock:
+            generation = self._profile_generation
+        try:
             result = self.client.rpc('get_user_profile').execute()
             
-            if result.data and len(result.data) > 0:
-                return result.data[0]
-            
-            return None
+            profile = result.data[0] if result.data and len(result.data) > 0 else None
+            if profile is not None:
+                with self._profile_lock:
+                    if generation != self._profile_generation:
+                        # Invalidated while in flight: pre-update or another user's profile
+                        return self._profile
+                    self._profile = profile
+                    self._profile_expires_at = time.monotonic() + self.profile_ttl
+            return profile
             
         except Exception as e:
             self.logger.error(f"Error getting user profile: {e}")
             return None
     
+    def _refresh_profile_async(self):
+        """Refetch the profile on a background thread (at most one at a time)"""
+        with self._profile_lock:
+            generation = self._profile_generation
+            if self._profile_refreshing == generation:
+                return
+            self._profile_refreshing = generation
+        
+        def refresh():
+            try:
+                self._fetch_profile()
+            finally:
+                with self._profile_lock:
+                    if self._profile_refreshing == generation:
+                        self._profile_refreshing = None
+        
+        get_timer_wheel().call_later(0, refresh, background=True)
+    
+    def invalidate_profile(self, updates: Optional[Dict] = None):
+        """
+        Mark the cached profile stale and refetch it in the background
+        
+        Readers keep getting the cached copy, with updates merged in, until
+        the refetch lands; fetches started before this call are discarded.
+        """
+        with self._profile_lock:
+            self._profile_generation += 1
+            self._profile_expires_at = 0.0
+            if self._profile is not None and updates:
+                self._profile = {**self._profile, **updates}
+        if self.is_authenticated():
+            self._refresh_profile_async()
+    
+    def clear_profile(self):
+        """Drop the cached profile (user changed) and any fetch still in flight"""
+        with self._profile_lock:
+            self._profile_generation += 1
+            self._profile = None
+            self._profile_expires_at = 0.0
+    
     def update_user_profile(self, data: Dict) -> Tuple[bool, Optional[str]]:
         """
         Update user profile
@@ -343,6 +492,7 @@ class AuthService:
             
             # Update all_users table
             self.client.table('all_users').update(data).eq('id', self.current_user.id).execute()
+            self.invalidate_profile(data)
             
             self.logger.info("User profile updated")
             return True, None
@@ -363,6 +513,7 @@ class AuthService:
                 return False, "User not authenticated"
             
             self.client.rpc('complete_onboarding').execute()
+            self.invalidate_profile({'onboarding_complete': True})
             
             self.logger.info("Onboarding marked complete")
             return True, None
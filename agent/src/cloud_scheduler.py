@@ -0,0 +1,249 @@
+"""
+Cloud Scheduler - Jittered, backoff-aware scheduling for periodic cloud work
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from .timer_wheel import TimerWheel, get_timer_wheel
+
+
+class RetryAfter(Exception):
+    """Raised by a job when the server asked us to come back later"""
+    
+    def __init__(self, seconds: float, message: str = ""):
+        super().__init__(message or f"Retry after {seconds}s")
+        self.seconds = seconds
+
+
+def retry_after_hint(error: Exception) -> Optional[float]:
+    """Extract a server Retry-After hint (seconds) from an exception, if any"""
+    if isinstance(error, RetryAfter):
+        return error.seconds
+    
+    # httpx/requests errors carry the response
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if headers:
+        value = headers.get('Retry-After') or headers.get('retry-after')
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+    return None
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing service for a while
+    
+    closed -> open after failure_threshold consecutive failures; open ->
+    half_open once reset_timeout has passed, letting one trial call through;
+    the trial's outcome closes or re-opens the breaker.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 300,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+    
+    def allow(self) -> bool:
+        """Check whether a call may go through now"""
+        if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        return self.state != self.OPEN
+    
+    def remaining(self) -> float:
+        """Seconds until an open breaker lets a trial call through"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - self.clock())
+    
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+    
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+
+
+class PeriodicJob:
+    """
+    Scheduling policy and state for one periodic job
+    
+    Successful runs are spaced interval apart with +/- jitter; failures back
+    off with decorrelated jitter (each delay drawn between base and three
+    times the previous delay, capped), never sooner than a server hint. The
+    first run is splayed over initial_splay * interval so agents started
+    together do not call in together.
+    """
+    
+    def __init__(self, name: str, fn: Callable[[], Optional[bool]], interval: float,
+                 jitter: float = 0.1, initial_splay: float = 0.2,
+                 backoff_base: float = 30, backoff_cap: float = 3600,
+                 breaker: Optional[CircuitBreaker] = None,
+                 rng: Optional[random.Random] = None):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.jitter = jitter
+        self.initial_splay = initial_splay
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker or CircuitBreaker()
+        self.rng = rng or random.Random()
+        
+        self.timer = None
+        self.running = False
+        self.last_delay = 0.0
+        self.consecutive_failures = 0
+        self.last_run: Optional[float] = None
+        self.last_error: Optional[str] = None
+    
+    def first_delay(self) -> float:
+        return self.rng.uniform(0, self.interval * self.initial_splay)
+    
+    def success_delay(self) -> float:
+        self.consecutive_failures = 0
+        self.last_delay = 0.0
+        return self.interval * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+    
+    def failure_delay(self, retry_after: Optional[float] = None) -> float:
+        self.consecutive_failures += 1
+        previous = self.last_delay or self.backoff_base
+        delay = min(self.backoff_cap, self.rng.uniform(self.backoff_base, previous * 3))
+        self.last_delay = delay
+        
+        if retry_after is not None:
+            # Honour the hint, spread so everyone told "60s" does not return at 60s
+            delay = max(delay, retry_after * self.rng.uniform(1, 1 + self.jitter))
+        return delay
+    
+    def open_delay(self) -> float:
+        """Delay while the breaker is open: until it half-opens, plus jitter"""
+        return self.breaker.remaining() + self.rng.uniform(0, self.backoff_base)
+    
+    def status(self) -> Dict:
+        return {
+            'interval': self.interval,
+            'breaker': self.breaker.state,
+            'consecutive_failures': self.consecutive_failures,
+            'last_run': self.last_run,
+            'last_error': self.last_error,
+            'next_run_in': self.timer.remaining() if self.timer else None
+        }
+
+
+class CloudScheduler:
+    """
+    Runs PeriodicJobs on the timer wheel
+    
+    A job fails when it raises or returns False; raise RetryAfter (or an
+    HTTP error carrying a Retry-After header) to pass a server hint.
+    """
+    
+    def __init__(self, timers: Optional[TimerWheel] = None):
+        self.logger = logging.getLogger(__name__)
+        self.timers = timers or get_timer_wheel()
+        self.jobs: Dict[str, PeriodicJob] = {}
+        self._lock = threading.Lock()
+    
+    def add_job(self, name: str, fn: Callable[[], Optional[bool]], interval: float,
+                run_immediately: bool = False, **options) -> PeriodicJob:
+        """Register and start a periodic job (replaces one with the same name)"""
+        self.remove_job(name)
+        job = PeriodicJob(name, fn, interval, **options)
+        job.running = True
+        with self._lock:
+            self.jobs[name] = job
+        self._schedule(job, 0 if run_immediately else job.first_delay())
+        self.logger.info(f"Scheduled cloud job '{name}' every ~{interval}s")
+        return job
+    
+    def remove_job(self, name: str):
+        """Stop and forget a job"""
+        with self._lock:
+            job = self.jobs.pop(name, None)
+        if job:
+            job.running = False
+            self.timers.cancel(job.timer)
+            job.timer = None
+    
+    def run_now(self, name: str):
+        """Run a job as soon as possible instead of at its next slot"""
+        job = self.jobs.get(name)
+        if job and job.running:
+            self.timers.cancel(job.timer)
+            self._schedule(job, 0)
+    
+    def stop(self):
+        """Stop all jobs"""
+        for name in list(self.jobs):
+            self.remove_job(name)
+    
+    def status(self) -> Dict[str, Dict]:
+        return {name: job.status() for name, job in list(self.jobs.items())}
+    
+    def _schedule(self, job: PeriodicJob, delay: float):
+        job.timer = self.timers.call_later(delay, self._run, job, background=True)
+    
+    def _run(self, job: PeriodicJob):
+        if not job.running:
+            return
+        
+        if not job.breaker.allow():
+            self._schedule(job, job.open_delay())
+            return
+        
+        job.last_run = time.time()
+        try:
+            ok = job.fn() is not False
+            hint = None
+            if not ok:
+                job.last_error = "job reported failure"
+        except Exception as e:
+            ok = False
+            hint = retry_after_hint(e)
+            job.last_error = str(e)
+            self.logger.warning(f"Cloud job '{job.name}' failed: {e}")
+        
+        if ok:
+            job.breaker.record_success()
+            job.last_error = None
+            delay = job.success_delay()
+        else:
+            job.breaker.record_failure()
+            delay = job.failure_delay(hint)
+            if job.breaker.state == CircuitBreaker.OPEN:
+                self.logger.warning(f"Circuit open for cloud job '{job.name}'")
+                delay = max(delay, job.open_delay())
+        
+        if job.running:
+            self._schedule(job, delay)
+
+
+_shared_scheduler: Optional[CloudScheduler] = None
+_shared_lock = threading.Lock()
+
+
+def get_cloud_scheduler() -> CloudScheduler:
+    """Get the process-wide cloud scheduler"""
+    global _shared_scheduler
+    with _shared_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = CloudScheduler()
+        return _shared_scheduler
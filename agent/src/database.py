@@ -2,10 +2,25 @@
 Database Client - Handles all Supabase interactions
 """
 
+import copy
 import logging
-from typing import Dict, Optional, List
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Optional, List, Tuple
 from datetime import datetime
-from supabase import create_client, Client
+
+from .instrumentation import get_registry
+from .lazy_import import lazy_import
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+# Imported on connect()
+supabase = lazy_import('supabase')
+
+_metrics = get_registry()
+CALL_SECONDS = _metrics.histogram('flow_agent_supabase_call_seconds', 'Supabase call latency', ['call'])
+CALL_ERRORS = _metrics.counter('flow_agent_supabase_errors_total', 'Failed Supabase calls', ['call'])
 
 
 class DatabaseClient:
@@ -14,12 +29,17 @@ class DatabaseClient:
     def __init__(self, config: Dict):
         self.logger = logging.getLogger(__name__)
         self.config = config
-        self.client: Optional[Client] = None
+        self.client: Optional['Client'] = None
         self.connected = False
         
         # Event buffer for offline mode
         self.event_buffer = []
         self.max_buffer_size = 1000
+        
+        # Read-through settings cache: (user_id, key) -> (expires_at, value)
+        self.settings_ttl = 300
+        self._settings_cache: Dict[Tuple[Optional[str], str], Tuple[float, Optional[Dict]]] = {}
+        self._settings_lock = threading.Lock()
     
     def connect(self):
         """Connect to Supabase"""
@@ -27,13 +47,13 @@ class DatabaseClient:
             url = self.config['supabase']['url']
             key = self.config['supabase']['service_key']
             
-            self.client = create_client(url, key)
+            self.client = supabase.create_client(url, key)
             self.connected = True
             self.logger.info(f"Connected to Supabase at {url}")
             
             # Flush any buffered events
             if self.event_buffer:
-                self._flush_buffer()
+                self.flush_buffer()
             
         except Exception as e:
             self.logger.error(f"Failed to connect to Supabase: {e}")
@@ -43,6 +63,7 @@ class DatabaseClient:
         """Disconnect from Supabase"""
         self.connected = False
         self.client = None
+        self.invalidate_settings()
         self.logger.info("Disconnected from Supabase")
     
     def start_session(self, user_id: Optional[str], start_app: str, meta: Dict = None) -> Optional[str]:
@@ -53,11 +74,11 @@ class DatabaseClient:
                 return None
             
             # Note: user_id is ignored - the RPC function uses auth.uid() automatically
-            result = self.client.rpc('start_session', {
+            result = self._execute('start_session', self.client.rpc('start_session', {
                 'p_start_ts': datetime.now().isoformat(),
                 'p_start_app': start_app,
                 'p_meta': meta or {}
-            }).execute()
+            }))
             
             session_id = result.data
             self.logger.info(f"Started session: {session_id} for user: {user_id or 'authenticated user'}")
@@ -68,21 +89,23 @@ class DatabaseClient:
             return None
     
     def end_session(self, session_id: str, end_app: str, avg_typing_rate: float,
-                    max_idle_gap: float, trigger_reason: str):
-        """End a flow session"""
+                    max_idle_gap: float, trigger_reason: str, timeline: Optional[bytes] = None):
+        """End a flow session, storing its packed timeline (see session_timeline) if given"""
         try:
             if not self.connected:
                 self.logger.warning("Not connected to database")
                 return
             
-            self.client.rpc('end_session', {
+            self._execute('end_session', self.client.rpc('end_session', {
                 'p_session_id': session_id,
                 'p_end_ts': datetime.now().isoformat(),
                 'p_end_app': end_app,
                 'p_avg_typing_rate': avg_typing_rate,
                 'p_max_idle_gap': max_idle_gap,
-                'p_trigger_reason': trigger_reason
-            }).execute()
+                'p_trigger_reason': trigger_reason,
+                # bytea travels as hex text over the REST API
+                'p_timeline': '\\x' + timeline.hex() if timeline is not None else None
+            }))
             
             self.logger.info(f"Ended session: {session_id}")
             
@@ -106,7 +129,7 @@ class DatabaseClient:
                     self.event_buffer.append(event_data)
                 return
             
-            self.client.table('events').insert(event_data).execute()
+            self._execute('insert_event', self.client.table('events').insert(event_data))
             
         except Exception as e:
             self.logger.error(f"Error inserting event: {e}")
@@ -114,21 +137,97 @@ class DatabaseClient:
             if len(self.event_buffer) < self.max_buffer_size:
                 self.event_buffer.append(event_data)
     
-    def get_settings(self, key: str) -> Optional[Dict]:
+    def upload_activity_minutes(self, rows: List[Dict], user_id: Optional[str]) -> bool:
+        """
+        Upsert a batch of per-minute activity rows for a user in one call
+        
+        Returns:
+            False if the batch was not stored
+        """
+        if not rows:
+            return True
+        if not self.connected or not user_id:
+            return False
+        
+        try:
+            self._execute('upsert_activity_minutes', self.client.rpc('upsert_activity_minutes', {
+                'p_user_id': user_id,
+                'p_rows': rows
+            }))
+            return True
+        except Exception as e:
+            self.logger.error(f"Error uploading activity minutes: {e}")
+            return False
+    
+    def get_settings(self, key: str, user_id: Optional[str] = None) -> Optional[Dict]:
         """Get settings by key"""
+        return self.get_settings_many([key], user_id).get(key)
+    
+    def get_settings_many(self, keys: List[str], user_id: Optional[str] = None) -> Dict[str, Dict]:
+        """
+        Get several settings of a user in one query, served from cache while fresh
+        
+        The service key bypasses RLS, so reads are always filtered by user;
+        without a user_id nothing is read.
+        
+        Returns:
+            Dict of key -> value for the keys that exist
+        """
+        if not user_id:
+            return {}
+        
+        now = time.monotonic()
+        found: Dict[str, Dict] = {}
+        missing = []
+        
+        with self._settings_lock:
+            for key in keys:
+                cached = self._settings_cache.get((user_id, key))
+                if cached and cached[0] > now:
+                    if cached[1] is not None:
+                        found[key] = cached[1]
+                else:
+                    missing.append(key)
+        
+        if not missing:
+            return found
+        
         try:
             if not self.connected:
-                return None
+                return found
             
-            result = self.client.table('settings').select('value').eq('key', key).execute()
+            query = self.client.table('settings').select('key, value').in_('key', missing).eq('user_id', user_id)
+            result = self._execute('get_settings', query)
             
-            if result.data:
-                return result.data[0]['value']
-            return None
+            fetched = {row['key']: row['value'] for row in (result.data or [])}
+            
+            # Absent keys are cached too, so they don't cost a query each time
+            expires_at = time.monotonic() + self.settings_ttl
+            with self._settings_lock:
+                for key in missing:
+                    self._settings_cache[(user_id, key)] = (expires_at, fetched.get(key))
+            
+            found.update(fetched)
+            return found
             
         except Exception as e:
             self.logger.error(f"Error getting settings: {e}")
-            return None
+            return found
+    
+    def invalidate_settings(self, key: Optional[str] = None, user_id: Optional[str] = None):
+        """Drop cached settings (all of them when key is None)"""
+        with self._settings_lock:
+            if key is None:
+                self._settings_cache.clear()
+                return
+            self._settings_cache.pop((user_id, key), None)
+    
+    def cache_setting(self, key: str, value: Optional[Dict], user_id: Optional[str] = None):
+        """Write a setting changed outside upsert_setting through to the cache"""
+        if not user_id:
+            return
+        with self._settings_lock:
+            self._settings_cache[(user_id, key)] = (time.monotonic() + self.settings_ttl, copy.deepcopy(value))
     
     def upsert_setting(self, user_id: str, key: str, value: Dict):
         """Update or insert a setting"""
@@ -136,48 +235,76 @@ class DatabaseClient:
             if not self.connected:
                 return
             
-            self.client.rpc('upsert_setting', {
+            self._execute('upsert_setting', self.client.rpc('upsert_setting', {
                 'p_user_id': user_id,
                 'p_key': key,
                 'p_value': value
-            }).execute()
+            }))
+            self.invalidate_settings(key, user_id)
             
             self.logger.info(f"Updated setting: {key} for user: {user_id}")
             
         except Exception as e:
             self.logger.error(f"Error upserting setting: {e}")
     
-    def log_agent_message(self, level: str, message: str, meta: Dict = None):
-        """Log an agent message to the database"""
+    def insert_agent_logs(self, rows: List[Dict], user_id: Optional[str] = None) -> bool:
+        """
+        Insert a batch of agent log rows in one call
+        
+        Returns:
+            False if the batch was not stored
+        """
+        if not rows:
+            return True
+        if not self.connected:
+            return False
+        
         try:
-            if not self.connected:
-                return
-            
-            self.client.table('agent_logs').insert({
-                'level': level,
-                'message': message,
-                'meta': meta or {}
-            }).execute()
-            
+            self._execute('insert_agent_logs', self.client.table('agent_logs').insert(
+                [{**row, 'user_id': user_id} for row in rows] if user_id else rows
+            ))
+            return True
         except Exception as e:
-            # Don't log errors about logging (avoid recursion)
-            pass
+            # Debug only: warnings would be shipped back through the log handler
+            self.logger.debug(f"Error inserting agent logs: {e}")
+            return False
     
-    def _flush_buffer(self):
-        """Flush buffered events to database"""
+    def flush_buffer(self) -> bool:
+        """
+        Flush buffered events to database
+        
+        Returns:
+            False if buffered events could not be sent
+        """
         if not self.event_buffer:
-            return
+            return True
+        if not self.connected:
+            return False
         
-        self.logger.info(f"Flushing {len(self.event_buffer)} buffered events...")
+        events = self.event_buffer[:]
+        self.logger.info(f"Flushing {len(events)} buffered events...")
         
         try:
             # Insert all buffered events
-            self.client.table('events').insert(self.event_buffer).execute()
-            self.event_buffer.clear()
+            self._execute('flush_events', self.client.table('events').insert(events))
+            del self.event_buffer[:len(events)]
             self.logger.info("Buffer flushed successfully")
+            return True
             
         except Exception as e:
             self.logger.error(f"Error flushing buffer: {e}")
+            return False
+    
+    def _execute(self, call: str, query):
+        """Execute a query, recording its latency and failure under call"""
+        start = time.perf_counter()
+        try:
+            return query.execute()
+        except Exception:
+            CALL_ERRORS.inc(call=call)
+            raise
+        finally:
+            CALL_SECONDS.observe(time.perf_counter() - start, call=call)
     
     def is_connected(self) -> bool:
         """Check if connected to database"""
@@ -0,0 +1,410 @@
+"""
+Flow Config - Validated, compiled flow-detection profiles
+"""
+
+import copy
+import json
+import logging
+import math
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .timer_wheel import TimerWheel, get_timer_wheel
+
+
+# Threshold: (default, minimum, maximum)
+SCHEMA = {
+    'entry': {
+        'typing_rate_min': (40, 0, 1000),
+        'app_switches_max': (2, 0, 1000),
+        'max_idle_gap_seconds': (4, 0, 3600),
+        'window_seconds': (300, 0, 86400)
+    },
+    'exit': {
+        'typing_rate_min': (30, 0, 1000),
+        'app_switches_max': (2, 0, 1000),
+        'max_idle_gap_seconds': (6, 0, 3600),
+        'delay_seconds': (30, 0, 86400)
+    }
+}
+
+# Built-in rules derived from the thresholds: (name, metric, operator, threshold key)
+ENTRY_RULES = (
+    ('typing_rate', 'typing_rate', '>=', 'typing_rate_min'),
+    ('few_app_switches', 'app_switch_count', '<=', 'app_switches_max'),
+    ('short_idle', 'max_idle_gap', '<=', 'max_idle_gap_seconds')
+)
+# Exit checks in priority order; the name is the reported exit reason
+EXIT_RULES = (
+    ('low_typing_rate', 'typing_rate', '<', 'typing_rate_min'),
+    ('excessive_app_switches', 'app_switch_count', '>', 'app_switches_max'),
+    ('idle', 'max_idle_gap', '>', 'max_idle_gap_seconds')
+)
+
+OPERATORS = ('>=', '<=', '>', '<')
+PROFILE_KEYS = ('entry', 'exit', 'detectors', 'entry_score_min', 'exit_score_min')
+DEFAULT_PROFILE = 'default'
+
+# Custom detectors: name -> fn(metrics) -> score in [0, 1]
+_detectors: Dict[str, Callable[[Dict[str, float]], float]] = {}
+
+
+class FlowConfigError(ValueError):
+    """Raised for a flow config that must not reach the detection loop"""
+
+
+def register_detector(name: str, fn: Callable[[Dict[str, float]], float]):
+    """
+    Make a Python detector available to configs as {"detector": name}
+    
+    fn receives the metrics dict and returns a score in [0, 1], which is
+    multiplied by the rule's weight. Configs compiled before registration
+    are not affected.
+    """
+    _detectors[name] = fn
+
+
+class Rule:
+    """One weighted detector: a metric comparison or a registered detector"""
+    
+    __slots__ = ('name', 'phase', 'weight', 'metric', 'op', 'value', 'detector')
+    
+    def __init__(self, name: str, phase: str, weight: float = 1.0, metric: Optional[str] = None,
+                 op: Optional[str] = None, value: Optional[float] = None, detector: Optional[str] = None):
+        self.name = name
+        self.phase = phase
+        self.weight = weight
+        self.metric = metric
+        self.op = op
+        self.value = value
+        self.detector = detector
+
+
+class CompiledProfile:
+    """
+    One detector profile compiled into a single scoring function
+    
+    score(metrics) reads each metric once and evaluates every rule in one
+    generated function (thresholds and weights inlined as constants),
+    returning (entry_score, exit_score, exit_reason). Flow is entered when
+    entry_score reaches entry_score_min and left when exit_score reaches
+    exit_score_min; the defaults (every entry rule, any exit rule) are the
+    plain threshold behaviour. A metric missing from the vector never
+    satisfies a rule.
+    """
+    
+    __slots__ = ('name', 'entry', 'exit', 'rules', 'window_seconds', 'delay_seconds',
+                 'entry_score_min', 'exit_score_min', 'score', '_raw')
+    
+    def __init__(self, name: str, raw: Dict):
+        entry, exit_cfg = _validate_thresholds(raw)
+        rules = _builtin_rules(entry, exit_cfg) + _validate_detectors(raw.get('detectors') or [])
+        entry_weights = [rule.weight for rule in rules if rule.phase == 'entry']
+        exit_weights = [rule.weight for rule in rules if rule.phase == 'exit']
+        
+        namespace = {'nan': math.nan, 'detectors': dict(_detectors)}
+        exec(_score_source(rules), namespace)
+        
+        values = {
+            'name': name,
+            'entry': entry,
+            'exit': exit_cfg,
+            'rules': tuple(rules),
+            'window_seconds': entry['window_seconds'],
+            'delay_seconds': exit_cfg['delay_seconds'],
+            'entry_score_min': _number(raw, 'entry_score_min', sum(entry_weights), 0, sum(entry_weights)),
+            'exit_score_min': _number(raw, 'exit_score_min', min(exit_weights), 0, sum(exit_weights)),
+            'score': namespace['score'],
+            '_raw': _resolved_raw(raw, entry, exit_cfg)
+        }
+        if values['entry_score_min'] <= 0 or values['exit_score_min'] <= 0:
+            raise FlowConfigError(f"profile '{name}': score minimums must be above zero")
+        for key, value in values.items():
+            object.__setattr__(self, key, value)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledProfile is immutable")
+    
+    def entry_met(self, metrics: Dict[str, float]) -> bool:
+        return self.score(metrics)[0] >= self.entry_score_min
+    
+    def exit_reason(self, metrics: Dict[str, float]) -> Optional[str]:
+        """Reason to leave flow, or None while the exit criteria are not met"""
+        _, exit_score, reason = self.score(metrics)
+        return reason if exit_score >= self.exit_score_min else None
+    
+    def as_dict(self) -> Dict:
+        return copy.deepcopy(self._raw)
+
+
+class CompiledFlowConfig:
+    """
+    Immutable, validated flow config: detector profiles and per-app overrides
+    
+    The top-level entry/exit/detectors form the 'default' profile; each
+    entry in 'profiles' is merged over it and 'profile' picks the active
+    one. 'app_overrides' maps an app name to a profile name, or to settings
+    merged over the active profile. Everything is compiled up front, so
+    for_app() is a dict lookup.
+    """
+    
+    __slots__ = ('active', 'profiles', 'app_profiles', '_raw')
+    
+    def __init__(self, raw: Dict):
+        if not isinstance(raw, dict):
+            raise FlowConfigError(f"flow config must be an object, got {type(raw).__name__}")
+        
+        base = {key: raw[key] for key in PROFILE_KEYS if key in raw}
+        sources = {DEFAULT_PROFILE: base}
+        for name, overrides in _mapping(raw, 'profiles').items():
+            sources[name] = _merge(base, overrides, f"profiles.{name}")
+        profiles = {name: CompiledProfile(name, source) for name, source in sources.items()}
+        
+        active_name = raw.get('profile', DEFAULT_PROFILE)
+        if active_name not in profiles:
+            raise FlowConfigError(f"unknown profile '{active_name}'")
+        
+        app_profiles = {}
+        for app, override in _mapping(raw, 'app_overrides').items():
+            if isinstance(override, str):
+                if override not in profiles:
+                    raise FlowConfigError(f"app_overrides.{app}: unknown profile '{override}'")
+                app_profiles[app] = profiles[override]
+            else:
+                merged = _merge(sources[active_name], override, f"app_overrides.{app}")
+                app_profiles[app] = CompiledProfile(f"{active_name}:{app}", merged)
+        
+        resolved = profiles[active_name].as_dict()
+        for key in ('profile', 'profiles', 'app_overrides'):
+            if key in raw:
+                resolved[key] = copy.deepcopy(raw[key])
+        
+        for key, value in (('active', profiles[active_name]), ('profiles', profiles),
+                           ('app_profiles', app_profiles), ('_raw', resolved)):
+            object.__setattr__(self, key, value)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledFlowConfig is immutable")
+    
+    def for_app(self, app: Optional[str]) -> CompiledProfile:
+        """Profile in effect while app is in the foreground"""
+        return self.app_profiles.get(app, self.active) if app else self.active
+    
+    # Shortcuts to the active profile
+    @property
+    def entry(self) -> Dict:
+        return self.active.entry
+    
+    @property
+    def exit(self) -> Dict:
+        return self.active.exit
+    
+    @property
+    def window_seconds(self) -> float:
+        return self.active.window_seconds
+    
+    @property
+    def delay_seconds(self) -> float:
+        return self.active.delay_seconds
+    
+    def entry_met(self, metrics: Dict[str, float]) -> bool:
+        return self.active.entry_met(metrics)
+    
+    def exit_reason(self, metrics: Dict[str, float]) -> Optional[str]:
+        return self.active.exit_reason(metrics)
+    
+    def as_dict(self) -> Dict:
+        """Resolved config (defaults filled in) as a new plain dict"""
+        return copy.deepcopy(self._raw)
+    
+    def __eq__(self, other):
+        return isinstance(other, CompiledFlowConfig) and self._raw == other._raw
+    
+    def __hash__(self):
+        return hash(json.dumps(self._raw, sort_keys=True))
+
+
+def _number(raw: Dict, key: str, default: float, minimum: float, maximum: float, where: str = "") -> float:
+    value = raw.get(key, default)
+    label = f"{where}.{key}" if where else key
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise FlowConfigError(f"{label} must be a number, got {value!r}")
+    if not minimum <= value <= maximum:
+        raise FlowConfigError(f"{label} must be between {minimum} and {maximum}, got {value}")
+    return float(value)
+    
+
+def _mapping(raw: Dict, key: str) -> Dict:
+    value = raw.get(key) or {}
+    if not isinstance(value, dict):
+        raise FlowConfigError(f"'{key}' must be an object")
+    return value
+
+
+def _merge(base: Dict, overrides, where: str) -> Dict:
+    """Overlay profile settings on a base: thresholds per key, detectors appended"""
+    if not isinstance(overrides, dict):
+        raise FlowConfigError(f"{where} must be an object or a profile name")
+    merged = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if key in ('entry', 'exit'):
+            if not isinstance(value, dict):
+                raise FlowConfigError(f"{where}.{key} must be an object")
+            merged[key] = {**(merged.get(key) or {}), **value}
+        elif key == 'detectors':
+            if not isinstance(value, list):
+                raise FlowConfigError(f"{where}.detectors must be a list")
+            merged['detectors'] = list(merged.get('detectors') or []) + value
+        elif key in PROFILE_KEYS:
+            merged[key] = value
+    return merged
+
+
+def _validate_thresholds(raw: Dict) -> Tuple[Dict, Dict]:
+    resolved = {}
+    for section, fields in SCHEMA.items():
+        given = raw.get(section) or {}
+        if not isinstance(given, dict):
+            raise FlowConfigError(f"'{section}' must be an object")
+        resolved[section] = {key: _number(given, key, default, minimum, maximum, section)
+                             for key, (default, minimum, maximum) in fields.items()}
+    return resolved['entry'], resolved['exit']
+
+
+def _builtin_rules(entry: Dict, exit_cfg: Dict) -> List[Rule]:
+    rules = [Rule(name, 'entry', metric=metric, op=op, value=entry[key])
+             for name, metric, op, key in ENTRY_RULES]
+    rules += [Rule(name, 'exit', metric=metric, op=op, value=exit_cfg[key])
+              for name, metric, op, key in EXIT_RULES]
+    return rules
+
+
+def _validate_detectors(detectors) -> List[Rule]:
+    if not isinstance(detectors, list):
+        raise FlowConfigError("'detectors' must be a list")
+    
+    rules = []
+    for index, spec in enumerate(detectors):
+        where = f"detectors[{index}]"
+        if not isinstance(spec, dict):
+            raise FlowConfigError(f"{where} must be an object")
+        
+        phase = spec.get('phase', 'entry')
+        if phase not in ('entry', 'exit'):
+            raise FlowConfigError(f"{where}.phase must be 'entry' or 'exit'")
+        weight = _number(spec, 'weight', 1.0, 0, 1000, where)
+        
+        if 'detector' in spec:
+            if spec['detector'] not in _detectors:
+                raise FlowConfigError(f"{where}: unknown detector '{spec['detector']}'")
+            rules.append(Rule(str(spec.get('name', spec['detector'])), phase, weight, detector=spec['detector']))
+            continue
+        
+        metric = spec.get('metric')
+        if not isinstance(metric, str) or not metric:
+            raise FlowConfigError(f"{where}.metric must be a metric name")
+        if spec.get('op') not in OPERATORS:
+            raise FlowConfigError(f"{where}.op must be one of {', '.join(OPERATORS)}")
+        value = _number(spec, 'value', math.nan, -math.inf, math.inf, where)
+        rules.append(Rule(str(spec.get('name', metric)), phase, weight, metric=metric, op=spec['op'], value=value))
+    return rules
+
+
+def _score_source(rules: List[Rule]) -> str:
+    # Numbers are validated finite floats and strings go through repr(), so
+    # the generated source contains nothing but literals
+    metrics = sorted({rule.metric for rule in rules if rule.metric})
+    local = {metric: f"m{index}" for index, metric in enumerate(metrics)}
+    
+    lines = ["def score(metrics):", "    get = metrics.get"]
+    lines += [f"    {local[metric]} = get({metric!r}, nan)" for metric in metrics]
+    lines += ["    entry = 0.0", "    exit_score = 0.0", "    reason = None"]
+    
+    for rule in rules:
+        total = 'entry' if rule.phase == 'entry' else 'exit_score'
+        if rule.detector:
+            lines.append(f"    s = detectors[{rule.detector!r}](metrics)")
+            lines.append("    if s > 0:")
+            lines.append(f"        {total} += {rule.weight!r} * min(s, 1.0)")
+        else:
+            lines.append(f"    if {local[rule.metric]} {rule.op} {rule.value!r}:")
+            lines.append(f"        {total} += {rule.weight!r}")
+        if rule.phase == 'exit':
+            lines.append("        if reason is None:")
+            lines.append(f"            reason = {rule.name!r}")
+    
+    lines.append("    return entry, exit_score, reason")
+    return "\n".join(lines) + "\n"
+
+
+def _resolved_raw(raw: Dict, entry: Dict, exit_cfg: Dict) -> Dict:
+    resolved = {'entry': dict(entry), 'exit': dict(exit_cfg)}
+    for key in ('detectors', 'entry_score_min', 'exit_score_min'):
+        if key in raw:
+            resolved[key] = copy.deepcopy(raw[key])
+    return resolved
+
+
+def compile_flow_config(raw: Dict) -> CompiledFlowConfig:
+    """Validate and compile a raw flow config; raises FlowConfigError"""
+    if isinstance(raw, CompiledFlowConfig):
+        return raw
+    return CompiledFlowConfig(raw)
+
+
+class FlowConfigWatcher:
+    """
+    Polls a JSON flow-config file and reports valid changes
+    
+    Only the modification time is checked on each poll; the file is parsed
+    and compiled when it changes, and an invalid file is logged and ignored
+    so the last good config stays in effect.
+    """
+    
+    def __init__(self, path: Path, on_change: Callable[[CompiledFlowConfig], None],
+                 interval: float = 2.0, timers: Optional[TimerWheel] = None):
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path)
+        self.on_change = on_change
+        self.interval = interval
+        self.timers = timers or get_timer_wheel()
+        self._mtime: Optional[int] = None
+        self._timer = None
+    
+    def start(self):
+        """Load the file if present and start polling"""
+        self.check()
+        if self._timer is None:
+            self._timer = self.timers.call_repeating(self.interval, self.check, background=True)
+    
+    def stop(self):
+        self.timers.cancel(self._timer)
+        self._timer = None
+    
+    def check(self) -> bool:
+        """Reload the file if it changed; True if a new config was applied"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._mtime = None
+            return False
+        except OSError as e:
+            self.logger.warning(f"Could not stat flow config {self.path}: {e}")
+            return False
+        
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        
+        try:
+            with open(self.path) as f:
+                compiled = compile_flow_config(json.load(f))
+        except (OSError, ValueError) as e:
+            # json.JSONDecodeError and FlowConfigError are both ValueErrors
+            self.logger.error(f"Ignoring invalid flow config {self.path}: {e}")
+            return False
+        
+        self.logger.info(f"Reloaded flow config from {self.path}")
+        self.on_change(compiled)
+        return True
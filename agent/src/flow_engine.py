@@ -5,7 +5,9 @@ Flow Rule Engine - Evaluates flow state based on metrics
 import logging
 import time
 from enum import Enum
-from typing import Dict, Callable, Optional
+from typing import Dict, Callable, Optional, Union
+
+from .flow_config import CompiledFlowConfig, compile_flow_config
 
 
 class FlowState(Enum):
@@ -17,11 +19,18 @@ class FlowState(Enum):
 
 
 class FlowRuleEngine:
-    """Applies flow detection rules and manages state transitions"""
+    """
+    Applies flow detection rules and manages state transitions
+    
+    The config is held as a CompiledFlowConfig and replaced by swapping one
+    reference, so evaluate() always sees a whole, validated config. Each
+    tick scores every detector of the foreground app's profile in a single
+    call.
+    """
     
-    def __init__(self, config: Dict, on_flow_change: Optional[Callable] = None):
+    def __init__(self, config: Union[Dict, CompiledFlowConfig], on_flow_change: Optional[Callable] = None):
         self.logger = logging.getLogger(__name__)
-        self.config = config
+        self._compiled = compile_flow_config(config)
         self.on_flow_change = on_flow_change
         
         # Current state
@@ -31,41 +40,46 @@ class FlowRuleEngine:
         # Timers
         self.flow_criteria_met_since = None
         self.exit_criteria_met_since = None
+        
+        # Last tick's detector scores: (profile, entry_score, exit_score, exit_reason)
+        self.last_scores = None
+    
+    @property
+    def config(self) -> Dict:
+        """Current config as a plain dict (defaults filled in)"""
+        return self._compiled.as_dict()
+    
+    @config.setter
+    def config(self, config: Union[Dict, CompiledFlowConfig]):
+        self.set_config(config)
+    
+    @property
+    def compiled_config(self) -> CompiledFlowConfig:
+        return self._compiled
+    
+    def set_config(self, config: Union[Dict, CompiledFlowConfig]) -> CompiledFlowConfig:
+        """Validate, compile and swap in a new config; raises FlowConfigError and keeps the old one"""
+        compiled = compile_flow_config(config)
+        self._compiled = compiled
+        return compiled
     
-    def evaluate(self, metrics: Dict[str, float]) -> FlowState:
-        """Evaluate current metrics and update state"""
+    def evaluate(self, metrics: Dict[str, float], app: Optional[str] = None) -> FlowState:
+        """Evaluate current metrics (for the foreground app's profile) and update state"""
         current_time = time.time()
-        
-        # Get thresholds from config with defaults
-        entry = self.config.get('entry', {})
-        exit_cfg = self.config.get('exit', {})
-        
-        # Check entry criteria
-        entry_criteria_met = (
-            metrics['typing_rate'] >= entry.get('typing_rate_min', 40) and
-            metrics['app_switch_count'] <= entry.get('app_switches_max', 2) and
-            metrics['max_idle_gap'] <= entry.get('max_idle_gap_seconds', 4)
-        )
-        
-        # Check exit criteria
-        exit_criteria_met = (
-            metrics['typing_rate'] < exit_cfg.get('typing_rate_min', 30) or
-            metrics['app_switch_count'] > exit_cfg.get('app_switches_max', 2) or
-            metrics['max_idle_gap'] > exit_cfg.get('max_idle_gap_seconds', 6)
-        )
+        config = self._compiled.for_app(app)
+        entry_score, exit_score, reason = config.score(metrics)
+        self.last_scores = (config.name, entry_score, exit_score, reason)
         
         # State machine logic
-        old_state = self.state
-        
         if self.state == FlowState.IDLE or self.state == FlowState.WORKING:
-            if entry_criteria_met:
+            if entry_score >= config.entry_score_min:
                 if self.flow_criteria_met_since is None:
                     self.flow_criteria_met_since = current_time
                     self.state = FlowState.WORKING
                 else:
                     # Check if criteria have been met long enough
                     duration = current_time - self.flow_criteria_met_since
-                    if duration >= entry.get('window_seconds', 300):
+                    if duration >= config.window_seconds:
                         self._transition_to(FlowState.IN_FLOW)
             else:
                 # Criteria not met, reset
@@ -73,14 +87,13 @@ class FlowRuleEngine:
                 self.state = FlowState.IDLE
         
         elif self.state == FlowState.IN_FLOW:
-            if exit_criteria_met:
+            if exit_score >= config.exit_score_min:
                 if self.exit_criteria_met_since is None:
                     self.exit_criteria_met_since = current_time
                 else:
                     # Check if exit criteria have persisted long enough
                     duration = current_time - self.exit_criteria_met_since
-                    if duration >= exit_cfg.get('delay_seconds', 30):
-                        reason = self._get_exit_reason(metrics, exit_cfg)
+                    if duration >= config.delay_seconds:
                         self._transition_to(FlowState.WORKING, reason=reason)
             else:
                 # Still in flow, reset exit timer
@@ -108,16 +121,6 @@ class FlowRuleEngine:
         self.logger.info(f"State transition: {old_state.value} -> {new_state.value}" + 
                         (f" (reason: {reason})" if reason else ""))
     
-    def _get_exit_reason(self, metrics: Dict, exit_cfg: Dict) -> str:
-        """Determine why flow state is exiting"""
-        if metrics['typing_rate'] < exit_cfg.get('typing_rate_min', 30):
-            return "low_typing_rate"
-        elif metrics['app_switch_count'] > exit_cfg.get('app_switches_max', 2):
-            return "excessive_app_switches"
-        elif metrics['max_idle_gap'] > exit_cfg.get('max_idle_gap_seconds', 6):
-            return "idle"
-        return "unknown"
-    
     def get_state(self) -> FlowState:
         """Get current flow state"""
         return self.state
@@ -3,11 +3,14 @@ Gamification System - RPG-style stats and progressive overload
 """
 
 import logging
-import json
-from datetime import datetime, timedelta
+import time
+from datetime import date, datetime, timedelta
 from typing import Dict, Optional, List
 from pathlib import Path
 
+from .session_history import SessionHistoryStore
+from .stats_store import StatsStore
+
 
 class UserStats:
     """RPG-style user statistics"""
@@ -68,6 +71,8 @@ class GamificationSystem:
             stats_file = stats_dir / 'user_stats.json'
         
         self.stats_file = stats_file
+        self.store = StatsStore(stats_file)
+        self.history = SessionHistoryStore(stats_file.with_suffix('.sessions.db'))
         self.stats = self._load_stats()
         
         # Progressive overload
@@ -75,27 +80,41 @@ class GamificationSystem:
         self.schedule = []
         
     def _load_stats(self) -> UserStats:
-        """Load user stats from file"""
-        if self.stats_file.exists():
-            try:
-                with open(self.stats_file, 'r') as f:
-                    data = json.load(f)
-                return UserStats.from_dict(data)
-            except Exception as e:
-                self.logger.error(f"Error loading stats: {e}")
+        """Load user stats from snapshot + journal"""
+        try:
+            return UserStats.from_dict(self.store.load())
+        except Exception as e:
+            self.logger.error(f"Error loading stats: {e}")
         
         return UserStats()
     
     def _save_stats(self):
-        """Save user stats to file"""
+        """Queue changed stats for a debounced journal write"""
         try:
-            with open(self.stats_file, 'w') as f:
-                json.dump(self.stats.to_dict(), f, indent=2)
+            self.store.record(self.stats.to_dict())
         except Exception as e:
             self.logger.error(f"Error saving stats: {e}")
     
-    def add_flow_session(self, duration_minutes: int):
+    def flush(self):
+        """Write any queued stats changes to disk now"""
+        self.store.flush()
+    
+    def close(self):
+        """Flush and compact stats on shutdown"""
+        self.store.close()
+        self.history.close()
+    
+    def add_flow_session(self, duration_minutes: int, start_time: Optional[float] = None,
+                         end_time: Optional[float] = None, start_app: Optional[str] = None,
+                         end_reason: Optional[str] = None):
         """Add a completed flow session"""
+        end_time = end_time or time.time()
+        start_time = start_time or end_time - duration_minutes * 60
+        try:
+            self.history.add_session(start_time, end_time, duration_minutes, start_app, end_reason)
+        except Exception as e:
+            self.logger.error(f"Error recording session history: {e}")
+        
         # Update stamina
         self.stats.stamina += duration_minutes
         
@@ -118,6 +137,9 @@ class GamificationSystem:
         # Check for level up
         self._check_level_up()
         
+        # Streak follows the days that actually have sessions
+        self._sync_streak()
+        
         # Update progressive goal
         self._update_progressive_goal()
         
@@ -135,10 +157,21 @@ class GamificationSystem:
         
         self.logger.info(f"💪 Resilience +{count}, +{xp_gained} XP")
     
-    def update_streak(self, had_session_today: bool):
-        """Update daily consistency streak"""
+    def update_streak(self, had_session_today: Optional[bool] = None):
+        """
+        Update daily consistency streak
+        
+        With no argument the day is checked against session history.
+        """
+        if had_session_today is None:
+            had_session_today = self.history.has_session_on(date.today())
+        
         if had_session_today:
-            self.stats.consistency += 1
+            if self.history.has_session_on(date.today()):
+                # Today is already counted in the day rollups
+                self._sync_streak()
+            else:
+                self.stats.consistency += 1
             if self.stats.consistency > self.stats.best_streak:
                 self.stats.best_streak = self.stats.consistency
                 self.logger.info(f"🔥 New best streak: {self.stats.consistency} days!")
@@ -152,6 +185,21 @@ class GamificationSystem:
         
         self._save_stats()
     
+    def _sync_streak(self):
+        """Take the current streak from the day rollups"""
+        try:
+            streak = self.history.current_streak()
+        except Exception as e:
+            self.logger.error(f"Error reading streak from history: {e}")
+            return
+        
+        # Never drop below a streak kept alive by fluid goals
+        if streak > self.stats.consistency:
+            self.stats.consistency = streak
+            if streak > self.stats.best_streak:
+                self.stats.best_streak = streak
+                self.logger.info(f"🔥 New best streak: {streak} days!")
+    
     def _check_level_up(self):
         """Check if user leveled up"""
         xp_for_next_level = self.stats.level * 1000
@@ -173,8 +221,10 @@ class GamificationSystem:
             return
         
         # Calculate typical session duration (average of last 10 sessions)
-        # For now, use overall average
-        typical_duration = self.stats.average_session_duration
+        typical_duration = self.history.average_of_last(10)
+        if typical_duration is None:
+            # History predates this install (e.g. restored stats file)
+            typical_duration = self.stats.average_session_duration
         
         # Progressive overload: 5% increase
         self.current_goal = int(typical_duration * 1.05)
@@ -237,6 +287,15 @@ class GamificationSystem:
             'total_sessions': self.stats.total_sessions
         }
     
+    def get_heatmap(self, days: int = 90) -> List[Dict]:
+        """Per-day session totals for the last N days"""
+        today = date.today()
+        return self.history.daily_rollups(today - timedelta(days=days - 1), today)
+    
+    def get_recent_sessions(self, limit: int = 20) -> List[Dict]:
+        """Most recent completed sessions"""
+        return self.history.recent_sessions(limit)
+    
     def _get_resilience_rank(self) -> str:
         """Get resilience rank based on count"""
         if self.stats.resilience >= 100:
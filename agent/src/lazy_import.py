@@ -0,0 +1,58 @@
+"""
+Lazy Import - Defer heavy third-party imports until first use
+"""
+
+import importlib
+import importlib.util
+import threading
+from typing import Callable, Optional
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access
+    
+    Lets a module keep `name.attr` call sites while the real import (and
+    its start-up and memory cost) only happens on the code path that needs
+    it. on_load runs once, right after the import, for one-time setup.
+    """
+    
+    def __init__(self, name: str, on_load: Optional[Callable] = None):
+        self._name = name
+        self._on_load = on_load
+        self._module = None
+        self._lock = threading.Lock()
+    
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+    
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    module = importlib.import_module(self._name)
+                    if self._on_load:
+                        self._on_load(module)
+                    self._module = module
+        return self._module
+    
+    def __getattr__(self, attr):
+        # Only called for names not set in __init__
+        return getattr(self._load(), attr)
+    
+    def __repr__(self):
+        return f"<lazy module '{self._name}' ({'loaded' if self.loaded else 'not loaded'})>"
+
+
+def lazy_import(name: str, on_load: Optional[Callable] = None) -> LazyModule:
+    """Return a proxy for module `name` that imports it on first use"""
+    return LazyModule(name, on_load)
+
+
+def module_available(name: str) -> bool:
+    """Check whether a module can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
@@ -0,0 +1,87 @@
+"""
+Log Pipeline - Non-blocking logging with rotating, compressed log files
+"""
+
+import gzip
+import logging
+import os
+import queue
+import shutil
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Callable, Optional, TextIO
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def _gzip_namer(name: str) -> str:
+    return name + '.gz'
+
+
+def _gzip_rotator(source: str, dest: str):
+    if not os.path.exists(source):
+        return
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class CompressingRotatingFileHandler(RotatingFileHandler):
+    """
+    Rotates when the file reaches max_bytes or the local day changes
+    
+    Rotated files are gzipped (agent.log.1.gz, agent.log.2.gz, ...) and at
+    most backup_count of them are kept.
+    """
+    
+    def __init__(self, filename: Path, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                 daily: bool = True, clock: Callable[[], float] = time.time):
+        super().__init__(str(filename), maxBytes=max_bytes, backupCount=backup_count,
+                         encoding='utf-8', delay=True)
+        self.namer = _gzip_namer
+        self.rotator = _gzip_rotator
+        self.daily = daily
+        self.clock = clock
+        self._day = self._today()
+    
+    def _today(self):
+        return time.localtime(self.clock())[:3]
+    
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.daily and self._today() != self._day:
+            return True
+        return bool(super().shouldRollover(record))
+    
+    def doRollover(self):
+        super().doRollover()
+        self._day = self._today()
+
+
+def start_logging(level: int, log_file: Path, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                  stream: Optional[TextIO] = sys.stdout) -> QueueListener:
+    """
+    Route root logging through a queue to the file and console handlers
+    
+    Log calls only enqueue the record; formatting, writes, rotation and
+    compression happen on the listener thread. Stop the returned listener
+    at exit to drain the queue.
+    """
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT)
+    
+    handlers = [CompressingRotatingFileHandler(log_file, max_bytes=max_bytes, backup_count=backup_count)]
+    if stream is not None:
+        handlers.append(logging.StreamHandler(stream))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(QueueHandler(log_queue))
+    listener.start()
+    return listener
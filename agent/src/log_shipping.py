@@ -0,0 +1,213 @@
+"""
+Log Shipping - Batched, deduplicated and rate-limited upload of agent logs
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Numbers, hex ids and quoted values vary between otherwise identical messages
+_VOLATILE = re.compile(r"0x[0-9a-fA-F]+|[0-9a-fA-F]{8}-[0-9a-fA-F-]{27}|\d+(\.\d+)?|'[^']*'")
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+class LogShippingHandler(logging.Handler):
+    """
+    Collects log records for remote storage with a hard cap on cost
+    
+    emit() never does I/O: records are reduced to a fingerprint (logger,
+    level, message with numbers and ids masked, exception type) and
+    identical ones waiting in the queue are merged into one entry with a
+    count. Each fingerprint may queue at most per_fingerprint entries per
+    window; extras are only counted and reported on the next entry that
+    gets through. The queue holds at most max_pending entries.
+    
+    ship() sends the queue through the send callback as one batch. At most
+    max_rows_per_hour rows are sent; rows over the budget, and batches that
+    fail to send, go to a size-capped local JSON-lines file instead of
+    being retried.
+    """
+    
+    def __init__(self, send: Callable[[List[Dict]], bool], fallback_path: Optional[Path] = None,
+                 level: int = logging.WARNING, max_pending: int = 500, max_rows_per_hour: int = 120,
+                 per_fingerprint: int = 5, fingerprint_window: float = 600.0,
+                 fallback_max_bytes: int = 5 * 1024 * 1024, max_message_length: int = 4000,
+                 clock: Callable[[], float] = time.time):
+        super().__init__(level)
+        self.send = send
+        self.fallback_path = Path(fallback_path) if fallback_path else None
+        self.max_pending = max_pending
+        self.max_rows_per_hour = max_rows_per_hour
+        self.per_fingerprint = per_fingerprint
+        self.fingerprint_window = fingerprint_window
+        self.fallback_max_bytes = fallback_max_bytes
+        self.max_message_length = max_message_length
+        self.clock = clock
+        
+        self._pending: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._windows: Dict[str, Tuple[float, int]] = {}  # fingerprint -> (window start, entries)
+        self._suppressed: Dict[str, int] = {}
+        self._hour: Tuple[float, int] = (0.0, 0)  # (hour start, rows sent)
+        self._ship_lock = threading.Lock()
+        self._local = threading.local()
+        
+        self.dropped = 0
+        self.shipped = 0
+        self.spilled = 0
+    
+    def emit(self, record: logging.LogRecord):
+        # Nothing logged while sending (HTTP client, database errors) is shipped
+        if record.name == __name__ or getattr(self._local, 'sending', False):
+            return
+        try:
+            now = self.clock()
+            fingerprint = self.fingerprint(record)
+            with self.lock:
+                entry = self._pending.get(fingerprint)
+                if entry is not None:
+                    entry['count'] += 1
+                    entry['last_seen'] = now
+                    return
+                
+                if not self._allow(fingerprint, now):
+                    self._suppressed[fingerprint] = self._suppressed.get(fingerprint, 0) + 1
+                    return
+                if len(self._pending) >= self.max_pending:
+                    self.dropped += 1
+                    return
+                
+                self._pending[fingerprint] = {
+                    'record': record,
+                    'count': 1,
+                    'suppressed': self._suppressed.pop(fingerprint, 0),
+                    'first_seen': now,
+                    'last_seen': now
+                }
+        except Exception:
+            self.handleError(record)
+    
+    def fingerprint(self, record: logging.LogRecord) -> str:
+        """Stable id for records that differ only in numbers, ids or quoted values"""
+        message = _VOLATILE.sub('#', record.getMessage())[:200]
+        exception = record.exc_info[0].__name__ if record.exc_info and record.exc_info[0] else ''
+        key = f'{record.name}|{record.levelno}|{message}|{exception}'
+        return hashlib.sha1(key.encode()).hexdigest()[:16]
+    
+    def pending(self) -> int:
+        with self.lock:
+            return len(self._pending)
+    
+    def ship(self) -> bool:
+        """
+        Send queued entries as one batch
+        
+        Returns:
+            False if a batch could not be sent (it was written to the fallback file)
+        """
+        with self._ship_lock:
+            with self.lock:
+                entries = list(self._pending.items())
+                self._pending.clear()
+            if not entries:
+                return True
+            
+            rows = [self._row(fingerprint, entry) for fingerprint, entry in entries]
+            allowed = self._take_budget(len(rows))
+            if allowed < len(rows):
+                self._spill(rows[allowed:], 'hourly_cap')
+                rows = rows[:allowed]
+            if not rows:
+                return True
+            
+            self._local.sending = True
+            try:
+                ok = bool(self.send(rows))
+            except Exception:
+                ok = False
+            finally:
+                self._local.sending = False
+            
+            if ok:
+                self.shipped += len(rows)
+            else:
+                self._spill(rows, 'send_failed')
+            return ok
+    
+    def close(self):
+        """Ship what is left, then close"""
+        try:
+            self.ship()
+        finally:
+            super().close()
+    
+    def _allow(self, fingerprint: str, now: float) -> bool:
+        """Per-fingerprint window limit (handler lock held)"""
+        start, count = self._windows.get(fingerprint, (now, 0))
+        if now - start >= self.fingerprint_window:
+            start, count = now, 0
+        if count >= self.per_fingerprint:
+            return False
+        self._windows[fingerprint] = (start, count + 1)
+        
+        if len(self._windows) > 4 * self.max_pending:
+            # Forget fingerprints whose window has passed
+            self._windows = {key: value for key, value in self._windows.items()
+                             if now - value[0] < self.fingerprint_window}
+        return True
+    
+    def _take_budget(self, wanted: int) -> int:
+        now = self.clock()
+        hour_start, sent = self._hour
+        if now - hour_start >= 3600:
+            hour_start, sent = now, 0
+        allowed = max(0, min(wanted, self.max_rows_per_hour - sent))
+        self._hour = (hour_start, sent + allowed)
+        return allowed
+    
+    def _row(self, fingerprint: str, entry: Dict) -> Dict:
+        record = entry['record']
+        try:
+            message = self.format(record)
+        except Exception:
+            message = record.getMessage()
+        meta = {
+            'logger': record.name,
+            'fingerprint': fingerprint,
+            'count': entry['count'],
+            'first_seen': _iso(entry['first_seen']),
+            'last_seen': _iso(entry['last_seen'])
+        }
+        if entry['suppressed']:
+            meta['suppressed'] = entry['suppressed']
+        return {
+            'level': record.levelname.lower(),
+            'message': message[:self.max_message_length],
+            'meta': meta,
+            'created_at': _iso(entry['first_seen'])
+        }
+    
+    def _spill(self, rows: List[Dict], reason: str):
+        """Append rows to the local fallback file, rotating it at the size cap"""
+        self.spilled += len(rows)
+        if self.fallback_path is None:
+            return
+        try:
+            self.fallback_path.parent.mkdir(parents=True, exist_ok=True)
+            if self.fallback_path.exists() and self.fallback_path.stat().st_size >= self.fallback_max_bytes:
+                os.replace(self.fallback_path, self.fallback_path.with_name(self.fallback_path.name + '.1'))
+            with open(self.fallback_path, 'a') as f:
+                for row in rows:
+                    f.write(json.dumps({**row, 'reason': reason}, separators=(',', ':')) + '\n')
+        except OSError:
+            pass  # Nowhere left to report it
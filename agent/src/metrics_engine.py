@@ -3,24 +3,252 @@ Rolling Metrics Engine - Computes real-time metrics from events
 """
 
 import logging
+import math
+import threading
 import time
 from collections import deque
-from typing import Dict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+# Label -> seconds; every window is answered from the same counters
+WINDOWS = {
+    '10s': 10,
+    '60s': 60,
+    '5m': 300,
+    '15m': 900,
+    '1h': 3600
+}
+
+
+class WindowCounter:
+    """
+    Per-second cumulative event counts for several channels in one ring
+    
+    Slot t % size holds each channel's running total as of second t, so
+    the number of events in any window up to the horizon is one
+    subtraction. Seconds without events are filled in when time moves on,
+    at most once each. Events stamped before the newest second (clock
+    adjustments, late delivery) are counted in the newest second.
+    """
+    
+    def __init__(self, channels: Iterable[str], horizon: int = 3600):
+        self.channels = {name: index for index, name in enumerate(channels)}
+        self.size = int(horizon) + 1
+        self._cumulative = [[0] * self.size for _ in self.channels]
+        self._totals = [0] * len(self.channels)
+        self._second: Optional[int] = None
+        self._lock = threading.Lock()
+    
+    def add(self, channel: str, timestamp: float, count: int = 1):
+        """Count events on a channel at timestamp"""
+        index = self.channels[channel]
+        with self._lock:
+            self._advance(int(timestamp))
+            self._totals[index] += count
+            self._cumulative[index][self._second % self.size] = self._totals[index]
+    
+    def count(self, channel: str, window: float, now: Optional[float] = None) -> int:
+        """Events on a channel in the last window seconds (capped at the horizon)"""
+        index = self.channels[channel]
+        span = max(0, min(int(window), self.size - 1))
+        with self._lock:
+            self._advance(int(time.time() if now is None else now))
+            if self._second is None:
+                return 0
+            cumulative = self._cumulative[index]
+            return cumulative[self._second % self.size] - cumulative[(self._second - span) % self.size]
+    
+    def reset(self):
+        with self._lock:
+            for cumulative in self._cumulative:
+                cumulative[:] = [0] * self.size
+            self._totals = [0] * len(self.channels)
+            self._second = None
+    
+    def _advance(self, second: int):
+        if self._second is None:
+            self._second = second
+            return
+        if second <= self._second:
+            return
+        
+        # Carry totals forward through the seconds that had no events
+        first = max(self._second + 1, second - self.size + 1)
+        for index, cumulative in enumerate(self._cumulative):
+            total = self._totals[index]
+            for slot in range(first, second + 1):
+                cumulative[slot % self.size] = total
+        self._second = second
+
+
+# Upper edges (seconds) of the inter-keystroke interval histogram buckets;
+# a final bucket runs up to the pause threshold
+IKI_BUCKETS = (0.05, 0.1, 0.15, 0.2, 0.3, 0.5, 0.75, 1.0)
+
+
+class KeystrokeRhythm:
+    """
+    Streaming inter-keystroke timing: interval histogram, bursts and cadence
+    
+    Statistics are exponentially weighted over roughly the last half_life
+    intervals and updated in O(1) per keystroke with fixed memory. Only
+    timestamps are used. Gaps longer than pause_seconds count as pauses and
+    are kept out of the cadence statistics; a burst is a run of at least
+    burst_min_keys keystrokes no more than burst_gap apart.
+    """
+    
+    def __init__(self, half_life: int = 200, burst_gap: float = 0.25, burst_min_keys: int = 5,
+                 pause_seconds: float = 2.0,
+                 on_burst: Optional[Callable[[float, int], None]] = None,
+                 on_pause: Optional[Callable[[float, float], None]] = None):
+        self.decay = 0.5 ** (1 / half_life)
+        self.burst_gap = burst_gap
+        self.burst_min_keys = burst_min_keys
+        self.pause_seconds = pause_seconds
+        self.on_burst = on_burst
+        self.on_pause = on_pause
+        self.edges = tuple(edge for edge in IKI_BUCKETS if edge < pause_seconds) + (pause_seconds,)
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            # Histogram increments grow by 1/decay instead of decaying every
+            # bucket; they are rescaled before they can overflow
+            self._histogram = [0.0] * len(self.edges)
+            self._scale = 1.0
+            self._weight = 0.0
+            
+            self._mean = 0.0
+            self._variance = 0.0
+            self._intervals = 0
+            
+            self._last: Optional[float] = None
+            self._run = 0
+            self._run_start: Optional[float] = None
+            self._keys = 0.0        # decayed keystrokes in finished runs
+            self._burst_keys = 0.0  # ... of which were in bursts
+            self._burst_length = 0.0
+            self.bursts = 0
+            self.pauses = 0
+    
+    def add(self, timestamp: float):
+        """Record a keystroke at timestamp"""
+        burst = pause = None
+        with self._lock:
+            last, self._last = self._last, timestamp
+            if last is None:
+                self._run, self._run_start = 1, timestamp
+                return
+            interval = max(0.0, timestamp - last)
+            
+            if interval > self.burst_gap:
+                burst = self._end_run(last)
+                self._run, self._run_start = 1, timestamp
+            else:
+                self._run += 1
+            
+            if interval > self.pause_seconds:
+                self.pauses += 1
+                pause = (timestamp, interval)
+            else:
+                self._add_interval(interval)
+        
+        if burst and self.on_burst:
+            self.on_burst(*burst)
+        if pause and self.on_pause:
+            self.on_pause(*pause)
+    
+    def _add_interval(self, interval: float):
+        self._scale /= self.decay
+        bucket = 0
+        while interval > self.edges[bucket]:
+            bucket += 1
+        self._histogram[bucket] += self._scale
+        self._weight += self._scale
+        if self._scale > 1e12:
+            self._histogram = [value / self._scale for value in self._histogram]
+            self._weight /= self._scale
+            self._scale = 1.0
+        
+        # Exponentially weighted mean and variance (West's update)
+        self._intervals += 1
+        alpha = max(1 - self.decay, 1 / self._intervals)
+        delta = interval - self._mean
+        self._mean += alpha * delta
+        self._variance = (1 - alpha) * (self._variance + alpha * delta * delta)
+    
+    def _end_run(self, ended_at: float) -> Optional[Tuple[float, int]]:
+        weight = self.decay ** self._run
+        self._keys = self._keys * weight + self._run
+        self._burst_keys *= weight
+        if self._run < self.burst_min_keys:
+            return None
+        self._burst_keys += self._run
+        self.bursts += 1
+        # Average over about the last ten bursts
+        self._burst_length += (self._run - self._burst_length) * max(0.1, 1 / self.bursts)
+        return (ended_at, self._run)
+    
+    def histogram(self) -> List[Tuple[float, float]]:
+        """(bucket upper edge in seconds, share of recent intervals) pairs"""
+        with self._lock:
+            if not self._weight:
+                return [(edge, 0.0) for edge in self.edges]
+            return [(edge, value / self._weight) for edge, value in zip(self.edges, self._histogram)]
+    
+    def quantile(self, q: float) -> float:
+        """Interval (seconds) below which q of recent intervals fall, interpolated within buckets"""
+        lower, cumulative = 0.0, 0.0
+        for edge, share in self.histogram():
+            if share and cumulative + share >= q:
+                return lower + (edge - lower) * (q - cumulative) / share
+            lower, cumulative = edge, cumulative + share
+        return 0.0 if not cumulative else self.edges[-1]
+    
+    def get_metrics(self) -> Dict[str, float]:
+        with self._lock:
+            mean = self._mean
+            cv = math.sqrt(self._variance) / mean if mean > 0 else 0.0
+            keys, burst_keys = self._keys, self._burst_keys
+            if self._run >= self.burst_min_keys:
+                burst_keys += self._run
+            keys += self._run
+            intervals = self._intervals
+            burst_length = self._burst_length
+        return {
+            'iki_mean_ms': mean * 1000,
+            'iki_p50_ms': self.quantile(0.5) * 1000,
+            'iki_p90_ms': self.quantile(0.9) * 1000,
+            'iki_cv': cv,
+            # 1 for perfectly even cadence, towards 0 as intervals scatter
+            'cadence_regularity': 1 / (1 + cv) if intervals else 0.0,
+            'burst_ratio': burst_keys / keys if keys else 0.0,
+            'avg_burst_length': burst_length
+        }
 
 
 class RollingMetrics:
     """Maintains sliding windows and computes metrics"""
     
-    def __init__(self, typing_window: int = 60, rolling_window: int = 300):
+    def __init__(self, typing_window: int = 60, rolling_window: int = 300,
+                 windows: Optional[Dict[str, int]] = None):
         self.logger = logging.getLogger(__name__)
         
         # Window sizes (seconds)
         self.typing_window = typing_window
         self.rolling_window = rolling_window
+        self.windows = dict(WINDOWS if windows is None else windows)
+        
+        # Event counts for every window
+        horizon = max([typing_window, rolling_window] + list(self.windows.values()))
+        self.counts = WindowCounter(('keystroke', 'app_switch', 'mouse', 'burst', 'pause'), horizon)
         
-        # Event storage (timestamp, event_type)
-        self.keystrokes = deque()
-        self.app_switches = deque()
+        # Inter-keystroke timing
+        self.rhythm = KeystrokeRhythm(on_burst=lambda ended_at, keys: self.counts.add('burst', ended_at),
+                                      on_pause=lambda ended_at, gap: self.counts.add('pause', ended_at))
+        
+        # Idle periods (start_time, duration) within the rolling window
         self.idle_periods = deque()
         
         # Current metrics
@@ -33,14 +261,13 @@ class RollingMetrics:
     
     def add_keystroke(self, timestamp: float):
         """Add a keystroke event"""
-        self.keystrokes.append(timestamp)
+        self.counts.add('keystroke', timestamp)
+        self.rhythm.add(timestamp)
         self.last_event_time = timestamp
-        self._cleanup_old_events()
     
     def add_app_switch(self, timestamp: float):
         """Add an app switch event"""
-        self.app_switches.append(timestamp)
-        self._cleanup_old_events()
+        self.counts.add('app_switch', timestamp)
     
     def add_idle_period(self, start_time: float, end_time: float):
         """Add an idle period"""
@@ -55,41 +282,51 @@ class RollingMetrics:
         elif event.type == 'app_switch':
             self.add_app_switch(event.timestamp)
         elif event.type in ['mouse_move', 'mouse_click']:
+            self.counts.add('mouse', event.timestamp)
             self.last_event_time = event.timestamp
     
     def _cleanup_old_events(self):
-        """Remove events outside the rolling window"""
+        """Remove idle periods outside the rolling window"""
         current_time = time.time()
         cutoff_time = current_time - self.rolling_window
         
-        # Remove old keystrokes
-        while self.keystrokes and self.keystrokes[0] < cutoff_time:
-            self.keystrokes.popleft()
-        
-        # Remove old app switches
-        while self.app_switches and self.app_switches[0] < cutoff_time:
-            self.app_switches.popleft()
-        
         # Remove old idle periods
         while self.idle_periods and self.idle_periods[0][0] < cutoff_time:
             self.idle_periods.popleft()
     
-    def get_typing_rate(self) -> float:
-        """Get keystrokes per minute (averaged over typing window)"""
-        current_time = time.time()
-        cutoff_time = current_time - self.typing_window
+    def get_typing_rate(self, window: Optional[int] = None) -> float:
+        """Get keystrokes per minute (averaged over window, default typing window)"""
+        window = window or self.typing_window
+        rate = self.counts.count('keystroke', window) / window * 60
+        if window == self.typing_window:
+            self._typing_rate = rate
+        return rate
         
-        # Count keystrokes in the typing window
-        recent_keystrokes = sum(1 for ts in self.keystrokes if ts >= cutoff_time)
+    def get_app_switch_count(self, window: Optional[int] = None) -> int:
+        """Get number of app switches in window (default rolling window)"""
+        window = window or self.rolling_window
+        count = self.counts.count('app_switch', window)
+        if window == self.rolling_window:
+            self._app_switch_count = count
+        return count
         
-        # Convert to per-minute rate
-        self._typing_rate = (recent_keystrokes / self.typing_window) * 60
-        return self._typing_rate
+    def get_window_metrics(self) -> Dict[str, float]:
+        """Typing rate, app switches and mouse events for every configured window"""
+        now = time.time()
+        metrics = {}
+        for label, seconds in self.windows.items():
+            metrics[f'typing_rate_{label}'] = self.counts.count('keystroke', seconds, now) / seconds * 60
+            metrics[f'app_switches_{label}'] = self.counts.count('app_switch', seconds, now)
+            metrics[f'mouse_events_{label}'] = self.counts.count('mouse', seconds, now)
+        return metrics
     
-    def get_app_switch_count(self) -> int:
-        """Get number of app switches in rolling window"""
-        self._app_switch_count = len(self.app_switches)
-        return self._app_switch_count
+    def get_rhythm_metrics(self) -> Dict[str, float]:
+        """Inter-keystroke timing, plus bursts and pauses per minute over the typing window"""
+        metrics = self.rhythm.get_metrics()
+        now = time.time()
+        metrics['bursts_per_min'] = self.counts.count('burst', self.typing_window, now) / self.typing_window * 60
+        metrics['pauses_per_min'] = self.counts.count('pause', self.typing_window, now) / self.typing_window * 60
+        return metrics
     
     def get_max_idle_gap(self) -> float:
         """Get maximum idle gap in rolling window"""
@@ -113,13 +350,15 @@ class RollingMetrics:
             'typing_rate': self.get_typing_rate(),
             'app_switch_count': self.get_app_switch_count(),
             'max_idle_gap': self.get_max_idle_gap(),
-            'current_idle': self.get_current_idle_time()
+            'current_idle': self.get_current_idle_time(),
+            **self.get_window_metrics(),
+            **self.get_rhythm_metrics()
         }
     
     def reset(self):
         """Reset all metrics"""
-        self.keystrokes.clear()
-        self.app_switches.clear()
+        self.counts.reset()
+        self.rhythm.reset()
         self.idle_periods.clear()
         self._typing_rate = 0.0
         self._app_switch_count = 0
@@ -0,0 +1,370 @@
+"""
+Metrics Store - Local time series of agent metrics with 1-minute and 1-hour rollups
+"""
+
+import logging
+import math
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .timer_wheel import TimerWheel, get_timer_wheel
+
+
+# Tier -> (resolution seconds, seconds covered by one file, default retention seconds)
+TIERS = {
+    'raw': (1, 3600, 6 * 3600),
+    '1m': (60, 86400, 30 * 86400),
+    '1h': (3600, 30 * 86400, 365 * 86400)
+}
+
+# magic, schema checksum, rows, columns, length of the column names (0 = seen earlier in the file)
+BLOCK_HEADER = struct.Struct('<4sIIII')
+BLOCK_MAGIC = b'TSB1'
+
+Row = Tuple[float, Dict[str, float]]
+
+
+def _numeric(metrics: Dict) -> Dict[str, float]:
+    """Keep finite numbers only"""
+    return {
+        name: float(value) for name, value in metrics.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+    }
+
+
+def encode_block(timestamps: List[float], columns: Dict[str, List[float]], include_names: bool = True) -> bytes:
+    """
+    One columnar block: header, column names, float64 timestamps, then
+    each column as float32 (native byte order; files never leave the machine)
+    """
+    names = sorted(columns)
+    encoded_names = '\n'.join(names).encode()
+    checksum = zlib.crc32(encoded_names)
+    parts = [BLOCK_HEADER.pack(BLOCK_MAGIC, checksum, len(timestamps), len(names),
+                               len(encoded_names) if include_names else 0)]
+    if include_names:
+        parts.append(encoded_names)
+    parts.append(array('d', timestamps).tobytes())
+    for name in names:
+        parts.append(array('f', columns[name]).tobytes())
+    return b''.join(parts)
+
+
+def valid_length(data: bytes) -> int:
+    """Bytes up to the end of the last complete block"""
+    offset = 0
+    while offset + BLOCK_HEADER.size <= len(data):
+        magic, _, rows, column_count, names_length = BLOCK_HEADER.unpack_from(data, offset)
+        end = offset + BLOCK_HEADER.size + names_length + rows * 8 + column_count * rows * 4
+        if magic != BLOCK_MAGIC or end > len(data):
+            break
+        offset = end
+    return offset
+
+
+def decode_blocks(data: bytes) -> Iterator[Tuple[array, Dict[str, array]]]:
+    """Yield (timestamps, columns) per block; stops at a torn final block"""
+    schemas: Dict[int, List[str]] = {}
+    offset = 0
+    while offset + BLOCK_HEADER.size <= len(data):
+        magic, checksum, rows, column_count, names_length = BLOCK_HEADER.unpack_from(data, offset)
+        end = offset + BLOCK_HEADER.size + names_length + rows * 8 + column_count * rows * 4
+        if magic != BLOCK_MAGIC or end > len(data):
+            return
+        
+        position = offset + BLOCK_HEADER.size
+        if names_length:
+            schemas[checksum] = data[position:position + names_length].decode().split('\n')
+            position += names_length
+        names = schemas.get(checksum)
+        offset = end
+        if names is None or len(names) != column_count:
+            continue
+        
+        timestamps = array('d')
+        timestamps.frombytes(data[position:position + rows * 8])
+        position += rows * 8
+        columns = {}
+        for name in names:
+            column = array('f')
+            column.frombytes(data[position:position + rows * 4])
+            position += rows * 4
+            columns[name] = column
+        yield timestamps, columns
+
+
+class _Rollup:
+    """Mean and max of every metric over the current bucket of one tier"""
+    
+    def __init__(self, resolution: int):
+        self.resolution = resolution
+        self.bucket: Optional[int] = None
+        self.samples = 0
+        self._sums: Dict[str, float] = {}
+        self._weights: Dict[str, float] = {}
+        self._maxima: Dict[str, float] = {}
+    
+    def add(self, timestamp: float, means: Dict[str, float], maxima: Dict[str, float],
+            samples: int = 1) -> Optional[Tuple[int, Dict[str, float], Dict[str, float], int]]:
+        """Fold in a sample; returns the finished bucket when timestamp moves past it"""
+        bucket = int(timestamp // self.resolution) * self.resolution
+        finished = None
+        if self.bucket is None:
+            self.bucket = bucket
+        elif bucket > self.bucket:
+            finished = self.current()
+            self.bucket = bucket
+            self.samples = 0
+            self._sums, self._weights, self._maxima = {}, {}, {}
+        # A sample older than the open bucket (clock change) is counted in it
+        
+        self.samples += samples
+        for name, value in means.items():
+            self._sums[name] = self._sums.get(name, 0.0) + value * samples
+            self._weights[name] = self._weights.get(name, 0) + samples
+        for name, value in maxima.items():
+            if value > self._maxima.get(name, -math.inf):
+                self._maxima[name] = value
+        return finished
+    
+    def current(self) -> Optional[Tuple[int, Dict[str, float], Dict[str, float], int]]:
+        """(bucket start, means, maxima, samples) so far"""
+        if self.bucket is None or not self.samples:
+            return None
+        means = {name: total / self._weights[name] for name, total in self._sums.items()}
+        return self.bucket, means, dict(self._maxima), self.samples
+    
+    @staticmethod
+    def as_row(rollup: Tuple[int, Dict[str, float], Dict[str, float], int]) -> Row:
+        bucket, means, maxima, samples = rollup
+        values = dict(means)
+        values.update({f'{name}.max': value for name, value in maxima.items()})
+        values['samples'] = samples
+        return float(bucket), values
+
+
+class MetricsStore:
+    """
+    Append-only per-second metric samples, rolled up into coarser tiers
+    
+    Every tier keeps its rows in files covering a fixed span of time
+    (raw: one hour, 1m: one day, 1h: thirty days). Rows are buffered and
+    appended as columnar blocks on a timer; a block names its columns the
+    first time that set appears in a file, so the metric set can change
+    without migrations. Rollups keep the mean and max of each metric plus
+    the sample count. Retention deletes whole files, which keeps disk use
+    bounded without rewriting anything. A partial bucket still being
+    aggregated at shutdown is dropped.
+    """
+    
+    def __init__(self, directory: Path, retention: Optional[Dict[str, float]] = None,
+                 flush_interval: float = 60.0, timers: Optional[TimerWheel] = None):
+        self.logger = logging.getLogger(__name__)
+        self.directory = Path(directory)
+        self.flush_interval = flush_interval
+        self.timers = timers
+        self.retention = {tier: spec[2] for tier, spec in TIERS.items()}
+        self.retention.update(retention or {})
+        
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._pending: Dict[str, List[Row]] = {tier: [] for tier in TIERS}
+        self._rollups = {tier: _Rollup(TIERS[tier][0]) for tier in TIERS if tier != 'raw'}
+        self._named: Dict[Path, set] = {}  # schema checksums already written per file
+        self._timer = None
+    
+    def start(self):
+        """Start flushing on a timer"""
+        if self._timer is None:
+            timers = self.timers or get_timer_wheel()
+            self._timer = timers.call_repeating(self.flush_interval, self.flush, background=True)
+    
+    def close(self):
+        """Stop the timer and write out buffered rows"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.flush()
+    
+    def record(self, metrics: Dict, timestamp: Optional[float] = None):
+        """Add one sample of metrics (non-numeric values are skipped)"""
+        timestamp = time.time() if timestamp is None else timestamp
+        values = _numeric(metrics)
+        with self._lock:
+            self._pending['raw'].append((timestamp, values))
+            minute = self._rollups['1m'].add(timestamp, values, values)
+            if minute is None:
+                return
+            self._pending['1m'].append(_Rollup.as_row(minute))
+            hour = self._rollups['1h'].add(*minute)
+            if hour is not None:
+                self._pending['1h'].append(_Rollup.as_row(hour))
+    
+    def flush(self):
+        """Append buffered rows to their tier files and apply retention"""
+        with self._io_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = {tier: [] for tier in TIERS}
+            
+            for tier, rows in pending.items():
+                if rows:
+                    try:
+                        self._write(tier, rows)
+                    except OSError as e:
+                        self.logger.error(f"Error writing {tier} metrics: {e}")
+            self._prune()
+    
+    def query(self, start: float, end: float, resolution: Optional[str] = None,
+              columns: Optional[Iterable[str]] = None, max_points: int = 2000) -> Dict:
+        """
+        Rows between start and end (epoch seconds) from one tier
+        
+        Without a resolution the finest tier that covers the range within
+        its retention and max_points is used. Returns parallel lists:
+        timestamps and one list per column, with None for missing values.
+        """
+        if resolution is None:
+            resolution = self._pick_tier(start, end, max_points)
+        if resolution not in TIERS:
+            raise ValueError(f"Unknown resolution '{resolution}', expected one of {', '.join(TIERS)}")
+        wanted = set(columns) if columns else None
+        
+        rows: List[Row] = []
+        with self._io_lock:
+            for timestamps, block in self._read(resolution, start, end):
+                names = [name for name in block if wanted is None or name in wanted]
+                for index, timestamp in enumerate(timestamps):
+                    if start <= timestamp <= end:
+                        rows.append((timestamp, {name: block[name][index] for name in names}))
+            with self._lock:
+                buffered = list(self._pending[resolution])
+                rollup = self._rollups.get(resolution)
+                partial = rollup.current() if rollup else None
+        
+        if partial is not None:
+            buffered.append(_Rollup.as_row(partial))
+        for timestamp, values in buffered:
+            if start <= timestamp <= end:
+                rows.append((timestamp, {name: value for name, value in values.items()
+                                         if wanted is None or name in wanted}))
+        rows.sort(key=lambda row: row[0])
+        
+        names = sorted(wanted or {name for _, values in rows for name in values})
+        return {
+            'resolution': resolution,
+            'resolution_seconds': TIERS[resolution][0],
+            'start': start,
+            'end': end,
+            'timestamps': [timestamp for timestamp, _ in rows],
+            'columns': {
+                name: [_json_value(values.get(name)) for _, values in rows]
+                for name in names
+            }
+        }
+    
+    def disk_usage(self) -> Dict[str, int]:
+        """Bytes on disk per tier"""
+        usage = {}
+        for tier in TIERS:
+            usage[tier] = sum(path.stat().st_size for path, _ in self._files(tier))
+        return usage
+    
+    def _pick_tier(self, start: float, end: float, max_points: int) -> str:
+        oldest_needed = time.time() - start
+        for tier, (resolution, _, _) in TIERS.items():
+            if (end - start) / resolution <= max_points and oldest_needed <= self.retention[tier]:
+                return tier
+        return '1h'
+    
+    def _files(self, tier: str) -> List[Tuple[Path, int]]:
+        """(path, span start) for every file of a tier, oldest first"""
+        directory = self.directory / tier
+        if not directory.is_dir():
+            return []
+        files = []
+        for path in directory.glob('*.tsf'):
+            try:
+                files.append((path, int(path.stem)))
+            except ValueError:
+                continue
+        return sorted(files, key=lambda item: item[1])
+    
+    def _write(self, tier: str, rows: List[Row]):
+        """Append rows as blocks, one per run of rows sharing a file and column set (io lock held)"""
+        span = TIERS[tier][1]
+        directory = self.directory / tier
+        directory.mkdir(parents=True, exist_ok=True)
+        
+        groups: List[Tuple[Path, Tuple[str, ...], List[Row]]] = []
+        for row in rows:
+            path = directory / f'{int(row[0] // span) * span:010d}.tsf'
+            names = tuple(sorted(row[1]))
+            if groups and groups[-1][0] == path and groups[-1][1] == names:
+                groups[-1][2].append(row)
+            else:
+                groups.append((path, names, [row]))
+        
+        for path, names, group in groups:
+            checksum = zlib.crc32('\n'.join(names).encode())
+            if path not in self._named:
+                self._repair(path)
+            named = self._named.setdefault(path, set())
+            block = encode_block(
+                [timestamp for timestamp, _ in group],
+                {name: [values[name] for _, values in group] for name in names},
+                include_names=checksum not in named
+            )
+            with open(path, 'ab') as f:
+                f.write(block)
+            named.add(checksum)
+    
+    def _repair(self, path: Path):
+        """Cut a block torn by a crash off the end of a file before appending to it"""
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return
+        length = valid_length(data)
+        if length < len(data):
+            self.logger.warning(f"Truncating {len(data) - length} torn bytes from {path}")
+            with open(path, 'r+b') as f:
+                f.truncate(length)
+    
+    def _read(self, tier: str, start: float, end: float) -> Iterator[Tuple[array, Dict[str, array]]]:
+        span = TIERS[tier][1]
+        for path, span_start in self._files(tier):
+            if span_start + span <= start or span_start > end:
+                continue
+            try:
+                data = path.read_bytes()
+            except OSError as e:
+                self.logger.warning(f"Could not read {path}: {e}")
+                continue
+            yield from decode_blocks(data)
+    
+    def _prune(self):
+        """Delete files that lie wholly outside their tier's retention (io lock held)"""
+        now = time.time()
+        for tier, (_, span, _) in TIERS.items():
+            cutoff = now - self.retention[tier]
+            for path, span_start in self._files(tier):
+                if span_start + span > cutoff:
+                    break
+                try:
+                    os.remove(path)
+                    self._named.pop(path, None)
+                except OSError as e:
+                    self.logger.warning(f"Could not remove expired {path}: {e}")
+
+
+def _json_value(value: Optional[float]) -> Optional[float]:
+    if value is None or math.isnan(value):
+        return None
+    return round(value, 4)
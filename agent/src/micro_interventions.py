@@ -4,20 +4,143 @@ Micro-Interventions - Soft resets for cognitive fatigue
 
 import logging
 import time
-import subprocess
-import tkinter as tk
 from typing import Optional
-import threading
+
+from .audio_fade import AudioFadeEngine, VolumeBackend
+from .lazy_import import lazy_import
+from .timer_wheel import TimerWheel, get_timer_wheel
+from .ui_thread import UIThread, get_ui_thread
+
+# Loaded when the first window is built
+tk = lazy_import('tkinter')
+
+
+class BlurWindow:
+    """Pre-built, hidden full-screen blur shown during a micro-break (UI thread only)"""
+    
+    def __init__(self, ui: UIThread):
+        self.ui = ui
+        self.window = None
+        self.built = False
+        self.visible = False
+    
+    def build(self):
+        """Create the hidden window and its widgets"""
+        if self.built:
+            return
+        self.built = True
+        
+        if self.ui.root is None:
+            return
+        
+        self.window = tk.Toplevel(self.ui.root)
+        self.window.withdraw()
+        self.window.title("Micro-Intervention")
+        
+        # Full screen, transparent, always on top
+        self.window.attributes('-fullscreen', True)
+        self.window.attributes('-topmost', True)
+        self.window.attributes('-alpha', 0.7)  # Semi-transparent
+        
+        # Blur effect simulation (gray overlay)
+        self.window.configure(bg='#6b7280')
+        
+        # Message
+        container = tk.Frame(self.window, bg='#6b7280')
+        container.place(relx=0.5, rely=0.5, anchor='center')
+        
+        icon = tk.Label(
+            container,
+            text="🧘",
+            font=('Arial', 60),
+            bg='#6b7280',
+            fg='white'
+        )
+        icon.pack(pady=(0, 20))
+        
+        message = tk.Label(
+            container,
+            text="Micro-Break\nTake a deep breath",
+            font=('Arial', 32),
+            bg='#6b7280',
+            fg='white',
+            justify='center'
+        )
+        message.pack()
+        
+        submessage = tk.Label(
+            container,
+            text="Recharging your focus...",
+            font=('Arial', 18),
+            bg='#6b7280',
+            fg='#d1d5db',
+            pady=20
+        )
+        submessage.pack()
+    
+    def show(self):
+        """Show the blur"""
+        self.build()
+        self.visible = True
+        if self.window:
+            self.window.deiconify()
+            self.window.lift()
+    
+    def hide(self):
+        """Hide the blur so it can be reused"""
+        self.visible = False
+        if self.window:
+            self.window.withdraw()
 
 
 class MicroIntervention:
     """Handles micro-interventions for cognitive fatigue"""
     
-    def __init__(self):
+    def __init__(self, timers: Optional[TimerWheel] = None, ui: Optional[UIThread] = None,
+                 volume_backend: Optional[VolumeBackend] = None):
         self.logger = logging.getLogger(__name__)
-        self.blur_window = None
+        self.blur_window: Optional[BlurWindow] = None
         self.intervention_active = False
         self.original_volume = None
+        self.timers = timers
+        self._restore_timer = None
+        self._ui = ui
+        self._volume_backend = volume_backend
+        self._audio: Optional[AudioFadeEngine] = None
+        self.fade_seconds = 2.0
+        
+        # Minimum gap between interventions
+        self.cooldown_seconds = 600
+        self.last_intervention_end: Optional[float] = None
+    
+    @property
+    def audio(self) -> AudioFadeEngine:
+        """Fade engine for system volume, created on first use"""
+        if self._audio is None:
+            self._audio = AudioFadeEngine(self._volume_backend, timers=self.timers)
+        return self._audio
+    
+    @property
+    def ui(self) -> UIThread:
+        """UI thread the blur window lives on"""
+        if self._ui is None:
+            self._ui = get_ui_thread()
+        return self._ui
+    
+    def prepare(self) -> BlurWindow:
+        """Pre-build the hidden blur window so an intervention appears instantly"""
+        if self.blur_window is None:
+            self.blur_window = BlurWindow(self.ui)
+            self.ui.submit(self.blur_window.build)
+        return self.blur_window
+    
+    def can_intervene(self) -> bool:
+        """Check that no intervention is running and the cooldown has passed"""
+        if self.intervention_active:
+            return False
+        if self.last_intervention_end is None:
+            return True
+        return time.time() - self.last_intervention_end >= self.cooldown_seconds
         
     def detect_cognitive_fatigue(self, metrics: dict, history: list) -> bool:
         """
@@ -28,6 +151,7 @@ class MicroIntervention:
         - Frequent app switching
         - Increasing idle gaps
         - Declining typing rate over time
+        - Keystroke cadence becoming irregular
         """
         if len(history) < 5:
             return False
@@ -61,6 +185,15 @@ class MicroIntervention:
                     self.logger.info(f"Cognitive fatigue detected: declining typing rate (-{decline:.1f} kpm)")
                     return True
         
+        # Check for cadence breaking up
+        regularity = [m['cadence_regularity'] for m in recent if m.get('cadence_regularity')]
+        if len(regularity) >= 3:
+            if regularity[-1] < regularity[-2] < regularity[-3]:
+                drop = regularity[-3] - regularity[-1]
+                if drop > 0.15:
+                    self.logger.info(f"Cognitive fatigue detected: irregular cadence (-{drop:.2f})")
+                    return True
+        
         return False
     
     def trigger_soft_reset(self, duration_seconds: int = 30):
@@ -70,6 +203,9 @@ class MicroIntervention:
         - Apply blur effect to screen
         - Fade out audio volume
         - Display gentle message
+        
+        Returns immediately; the fade runs on the timer wheel and the restore
+        step is scheduled there rather than holding a thread.
         """
         if self.intervention_active:
             self.logger.warning("Intervention already active")
@@ -84,129 +220,85 @@ class MicroIntervention:
         # Fade out audio
         self._fade_audio(fade_out=True)
         
-        # Wait for duration
-        time.sleep(duration_seconds)
+        # Restore after duration
+        timers = self.timers or get_timer_wheel()
+        self._restore_timer = timers.call_later(duration_seconds, self._end_soft_reset)
+        
+    def _end_soft_reset(self):
+        """Restore screen and audio at the end of an intervention"""
+        self._restore_timer = None
+        if not self.intervention_active:
+            return
         
-        # Restore
         self._stop_blur_effect()
-        self._fade_audio(fade_out=False)
+        self._fade_audio(fade_out=False, on_done=self._on_restored)
         
+    def _on_restored(self, completed: bool):
+        """Mark the intervention finished once audio is back"""
+        if not self.intervention_active:
+            return
         self.intervention_active = False
+        self.last_intervention_end = time.time()
         self.logger.info("Soft reset intervention complete")
     
     def _start_blur_effect(self):
         """Apply blur effect using transparent overlay"""
-        def show_blur():
-            self.blur_window = tk.Tk()
-            self.blur_window.title("Micro-Intervention")
-            
-            # Full screen, transparent, always on top
-            self.blur_window.attributes('-fullscreen', True)
-            self.blur_window.attributes('-topmost', True)
-            self.blur_window.attributes('-alpha', 0.7)  # Semi-transparent
-            
-            # Blur effect simulation (gray overlay)
-            self.blur_window.configure(bg='#6b7280')
-            
-            # Message
-            container = tk.Frame(self.blur_window, bg='#6b7280')
-            container.place(relx=0.5, rely=0.5, anchor='center')
-            
-            icon = tk.Label(
-                container,
-                text="🧘",
-                font=('Arial', 60),
-                bg='#6b7280',
-                fg='white'
-            )
-            icon.pack(pady=(0, 20))
-            
-            message = tk.Label(
-                container,
-                text="Micro-Break\nTake a deep breath",
-                font=('Arial', 32),
-                bg='#6b7280',
-                fg='white',
-                justify='center'
-            )
-            message.pack()
-            
-            submessage = tk.Label(
-                container,
-                text="Recharging your focus...",
-                font=('Arial', 18),
-                bg='#6b7280',
-                fg='#d1d5db',
-                pady=20
-            )
-            submessage.pack()
-            
-            self.blur_window.mainloop()
-        
-        thread = threading.Thread(target=show_blur, daemon=True)
-        thread.start()
-        time.sleep(0.5)  # Give window time to appear
+        self.ui.submit(self.prepare().show)
     
     def _stop_blur_effect(self):
         """Remove blur effect"""
         if self.blur_window:
-            self.blur_window.destroy()
-            self.blur_window = None
+            self.ui.submit(self.blur_window.hide)
     
-    def _fade_audio(self, fade_out: bool, duration: float = 2.0):
+    def _fade_audio(self, fade_out: bool, duration: Optional[float] = None, on_done=None):
         """
         Fade audio volume in or out
         
-        Uses osascript to control macOS system volume
+        Runs asynchronously on the fade engine; a new fade cancels any fade
+        still in progress.
         """
+        if duration is None:
+            duration = self.fade_seconds
+        
         try:
-            # Get current volume
-            result = subprocess.run(
-                ['osascript', '-e', 'output volume of (get volume settings)'],
-                capture_output=True,
-                text=True
-            )
-            current_volume = int(result.stdout.strip())
-            
             if fade_out:
                 # Store original volume
+                current_volume = self.audio.get_volume()
                 self.original_volume = current_volume
                 target_volume = 0
             else:
                 # Restore original volume
-                target_volume = self.original_volume or current_volume
+                current_volume = None
+                target_volume = self.original_volume
+                if target_volume is None:
+                    target_volume = self.audio.get_volume()
             
-            # Calculate steps
-            steps = 20
-            step_duration = duration / steps
-            volume_step = (target_volume - current_volume) / steps
+            def finished(completed: bool):
+                if completed:
+                    self.logger.info(f"Audio faded {'out' if fade_out else 'in'}")
+                if on_done:
+                    on_done(completed)
             
-            # Fade
-            for i in range(steps):
-                new_volume = int(current_volume + (volume_step * (i + 1)))
-                new_volume = max(0, min(100, new_volume))  # Clamp to 0-100
-                
-                subprocess.run(
-                    ['osascript', '-e', f'set volume output volume {new_volume}'],
-                    check=False
-                )
-                time.sleep(step_duration)
-            
-            self.logger.info(f"Audio faded {'out' if fade_out else 'in'}")
+            return self.audio.fade_to(target_volume, duration, start=current_volume, on_done=finished)
             
         except Exception as e:
             self.logger.error(f"Error fading audio: {e}")
+            if on_done:
+                on_done(False)
     
     def cancel_intervention(self):
         """Cancel any active intervention"""
+        if self._restore_timer:
+            self._restore_timer.cancel()
+            self._restore_timer = None
+        
         if self.intervention_active:
             self._stop_blur_effect()
+            self.audio.cancel()
             if self.original_volume is not None:
                 try:
-                    subprocess.run(
-                        ['osascript', '-e', f'set volume output volume {self.original_volume}'],
-                        check=False
-                    )
-                except:
-                    pass
+                    self.audio.backend.set_volume(self.original_volume)
+                except Exception as e:
+                    self.logger.error(f"Error restoring volume: {e}")
             self.intervention_active = False
+            self.last_intervention_end = time.time()
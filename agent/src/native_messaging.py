@@ -37,7 +37,7 @@ class NativeMessagingHost:
             try:
                 message = self._read_message()
                 if message:
-                    self.logger.debug(f"Received message: {message}")
+                    self.logger.debug("Received message: %s", message)
                     response = self._handle_message(message)
                     if response:
                         self._send_message(response)
@@ -72,7 +72,7 @@ class NativeMessagingHost:
             sys.stdout.buffer.write(encoded_message)
             sys.stdout.buffer.flush()
             
-            self.logger.debug(f"Sent message: {message}")
+            self.logger.debug("Sent message: %s", message)
         except Exception as e:
             self.logger.error(f"Error sending message: {e}")
     
@@ -5,25 +5,57 @@ Overlay Manager - Creates full-screen overlays for distraction blocking
 import logging
 import time
 from typing import Callable, Optional
-import tkinter as tk
-from tkinter import ttk
-import threading
+
+from .instrumentation import get_registry
+from .lazy_import import lazy_import
+from .timer_wheel import TimerWheel, get_timer_wheel
+from .ui_thread import UIThread, get_ui_thread
+
+# Loaded when the first window is built
+tk = lazy_import('tkinter')
+
+SHOW_SECONDS = get_registry().histogram('flow_agent_overlay_show_seconds',
+                                        'Time from blocking an app to its overlay being shown')
 
 
 class OverlayWindow:
-    """Full-screen overlay window for blocking distractions"""
+    """
+    Full-screen overlay window for blocking distractions
     
-    def __init__(self, app_name: str, on_unlock: Optional[Callable] = None):
+    The window is built once, hidden, on the UI thread and re-shown for each
+    blocked app. All methods must run on the UI thread.
+    """
+    
+    def __init__(self, ui: UIThread, on_unlock: Optional[Callable] = None,
+                 timers: Optional[TimerWheel] = None):
         self.logger = logging.getLogger(__name__)
-        self.app_name = app_name
+        self.ui = ui
+        self.app_name = None
         self.on_unlock = on_unlock
         self.countdown_seconds = 10
         self.window = None
-        self.countdown_active = True
+        self.countdown_active = False
+        self.timers = timers or get_timer_wheel()
+        self._countdown_timer = None
+        self._remaining = self.countdown_seconds
         
-    def show(self):
-        """Show the overlay window"""
-        self.window = tk.Tk()
+        # View state (mirrors the widgets; the only state in headless mode)
+        self.built = False
+        self.visible = False
+        self.countdown_text = ""
+        self.unlock_enabled = False
+    
+    def build(self):
+        """Create the hidden window and its widgets"""
+        if self.built:
+            return
+        self.built = True
+        
+        if self.ui.root is None:
+            return
+        
+        self.window = tk.Toplevel(self.ui.root)
+        self.window.withdraw()
         self.window.title("FlowFacilitator - Flow Protection")
         
         # Make it full screen and always on top
@@ -59,14 +91,14 @@ class OverlayWindow:
         title_label.pack(pady=(0, 10))
         
         # Message
-        message_label = tk.Label(
+        self.message_label = tk.Label(
             container,
-            text=f"You tried to open: {self.app_name}",
+            text="",
             font=('Arial', 20),
             bg='#1f2937',
             fg='#9ca3af'
         )
-        message_label.pack(pady=(0, 30))
+        self.message_label.pack(pady=(0, 30))
         
         # Question
         question_label = tk.Label(
@@ -81,7 +113,7 @@ class OverlayWindow:
         # Countdown label
         self.countdown_label = tk.Label(
             container,
-            text=f"Unlock available in {self.countdown_seconds}s",
+            text="",
             font=('Arial', 18),
             bg='#1f2937',
             fg='#6b7280'
@@ -127,66 +159,136 @@ class OverlayWindow:
         )
         stats_label.pack()
         
+    def show(self, app_name: str):
+        """Show the overlay for an app"""
+        self.build()
+        self.app_name = app_name
+        self.countdown_active = True
+        self.visible = True
+        self._set_locked()
+        
+        if self.window:
+            self.message_label.config(text=f"You tried to open: {app_name}")
+            self.window.deiconify()
+            self.window.lift()
+            self.window.focus_force()
+        
         # Start countdown
         self._start_countdown()
         
-        # Run the window
-        self.window.mainloop()
+    def hide(self):
+        """Hide the overlay so it can be reused"""
+        self.countdown_active = False
+        self._stop_countdown()
+        self.visible = False
+        if self.window:
+            self.window.withdraw()
+    
+    def _set_locked(self):
+        """Reset the unlock controls to their disabled state"""
+        self._remaining = self.countdown_seconds
+        self.countdown_text = f"Unlock available in {self._remaining}s"
+        self.unlock_enabled = False
+        if self.window:
+            self.countdown_label.config(text=self.countdown_text)
+            self.unlock_button.config(
+                text="Unlock (disabled)",
+                bg='#374151',
+                fg='#9ca3af',
+                state='disabled',
+                cursor='arrow',
+                command=''
+            )
     
     def _start_countdown(self):
         """Start the countdown timer"""
-        def countdown():
-            remaining = self.countdown_seconds
-            while remaining > 0 and self.countdown_active:
-                self.countdown_label.config(text=f"Unlock available in {remaining}s")
-                time.sleep(1)
-                remaining -= 1
+        self._stop_countdown()
+        self._countdown_timer = self.timers.call_repeating(
+            1.0, self.ui.submit, self._countdown_tick, initial_delay=1.0
+        )
             
-            if self.countdown_active:
-                # Enable unlock button
-                self.countdown_label.config(text="You can now unlock")
-                self.unlock_button.config(
-                    text="Unlock and Break Flow",
-                    bg='#ef4444',
-                    fg='white',
-                    state='normal',
-                    cursor='hand2',
-                    command=self._unlock
-                )
-        
-        thread = threading.Thread(target=countdown, daemon=True)
-        thread.start()
+    def _countdown_tick(self):
+        """Advance the countdown by one second"""
+        if not self.countdown_active:
+            self._stop_countdown()
+            return
+        
+        self._remaining -= 1
+        if self._remaining > 0:
+            self.countdown_text = f"Unlock available in {self._remaining}s"
+            if self.window:
+                self.countdown_label.config(text=self.countdown_text)
+            return
+        
+        self._stop_countdown()
+        
+        # Enable unlock button
+        self.countdown_text = "You can now unlock"
+        self.unlock_enabled = True
+        if self.window:
+            self.countdown_label.config(text=self.countdown_text)
+            self.unlock_button.config(
+                text="Unlock and Break Flow",
+                bg='#ef4444',
+                fg='white',
+                state='normal',
+                cursor='hand2',
+                command=self._unlock
+            )
+        
+    def _stop_countdown(self):
+        """Cancel the countdown timer"""
+        self.timers.cancel(self._countdown_timer)
+        self._countdown_timer = None
     
     def _unlock(self):
         """Handle unlock button click"""
-        self.countdown_active = False
+        if not self.unlock_enabled:
+            return
+        self.hide()
         if self.on_unlock:
             self.on_unlock(broke_flow=True)
-        self.window.destroy()
     
     def _stay_in_flow(self):
         """Handle stay in flow button click"""
-        self.countdown_active = False
+        self.hide()
         if self.on_unlock:
             self.on_unlock(broke_flow=False)
-        self.window.destroy()
     
     def close(self):
         """Close the overlay"""
-        self.countdown_active = False
-        if self.window:
-            self.window.destroy()
+        self.hide()
 
 
 class OverlayManager:
     """Manages overlay windows for distraction blocking"""
     
-    def __init__(self, on_flow_broken: Optional[Callable] = None):
+    def __init__(self, on_flow_broken: Optional[Callable] = None, timers: Optional[TimerWheel] = None,
+                 ui: Optional[UIThread] = None):
         self.logger = logging.getLogger(__name__)
         self.on_flow_broken = on_flow_broken
+        self.timers = timers
         self.active_overlay = None
         self.blocked_apps = set()
         
+        # Single reusable overlay, created on first use
+        self._ui = ui
+        self._overlay: Optional[OverlayWindow] = None
+    
+    @property
+    def ui(self) -> UIThread:
+        """UI thread the overlay lives on"""
+        if self._ui is None:
+            self._ui = get_ui_thread()
+        return self._ui
+    
+    def prepare(self):
+        """Pre-build the hidden overlay so showing it is instant"""
+        if self._overlay is None:
+            self._overlay = OverlayWindow(self.ui, self._on_unlock, timers=self.timers)
+            self.ui.submit(self._overlay.build)
+        return self._overlay
+        
     def set_blocked_apps(self, apps: list):
         """Set the list of apps to block with overlay"""
         self.blocked_apps = set(apps)
@@ -211,23 +313,28 @@ class OverlayManager:
         
         self.logger.info(f"Showing overlay for blocked app: {app_name}")
         
-        def on_unlock(broke_flow: bool):
-            self.active_overlay = None
-            if broke_flow and self.on_flow_broken:
-                self.on_flow_broken(app_name)
-            elif not broke_flow:
-                self.logger.info(f"User resisted distraction: {app_name} (Resilience +1)")
-        
-        # Create and show overlay in separate thread
-        def show_overlay():
-            self.active_overlay = OverlayWindow(app_name, on_unlock)
-            self.active_overlay.show()
-        
-        thread = threading.Thread(target=show_overlay, daemon=True)
-        thread.start()
+        requested = time.perf_counter()
+        overlay = self.active_overlay = self.prepare()
+        
+        def show():
+            overlay.show(app_name)
+            SHOW_SECONDS.observe(time.perf_counter() - requested)
+        
+        self.ui.submit(show)
+    
+    def _on_unlock(self, broke_flow: bool):
+        """Handle overlay dismissal (runs on the UI thread)"""
+        app_name = self.active_overlay.app_name if self.active_overlay else None
+        self.active_overlay = None
+        if broke_flow and self.on_flow_broken:
+            # Ending a session does network I/O; keep it off the UI thread
+            timers = self.timers or get_timer_wheel()
+            timers.call_later(0, self.on_flow_broken, app_name, background=True)
+        elif not broke_flow:
+            self.logger.info(f"User resisted distraction: {app_name} (Resilience +1)")
     
     def close_overlay(self):
         """Close any active overlay"""
         if self.active_overlay:
-            self.active_overlay.close()
+            self.ui.submit(self.active_overlay.close)
             self.active_overlay = None
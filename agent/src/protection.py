@@ -5,18 +5,30 @@ Protection Controller - Manages DND and extension blocking
 import logging
 import subprocess
 import json
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from .timer_wheel import TimerWheel, get_timer_wheel
 
 
 class ProtectionController:
     """Controls macOS DND and Chrome extension blocking"""
     
-    def __init__(self, config: Dict, native_messaging_host=None):
+    # Lifetime of a blocking command in the extension; renewed while protection is on
+    BLOCKING_TTL_SECONDS = 3600
+    # Renew this long before the TTL runs out; the TTL itself is only the safety net
+    BLOCKING_RENEW_MARGIN_SECONDS = 360
+    
+    def __init__(self, config: Dict, native_messaging_host=None, timers: Optional[TimerWheel] = None):
         self.logger = logging.getLogger(__name__)
         self.config = config
         self.dnd_enabled = False
         self.blocking_enabled = False
         self.native_messaging = native_messaging_host
+        self.timers = timers or get_timer_wheel()
+        
+        # Blocking TTL renewal
+        self.blocked_domains: List[str] = []
+        self._ttl_timer = None
     
     def enable_protection(self, blocklist: List[str]):
         """Enable all protection mechanisms"""
@@ -114,20 +126,27 @@ class ProtectionController:
     def enable_blocking(self, domains: List[str]):
         """Send enable blocking command to Chrome extension"""
         try:
+            ttl = self.BLOCKING_TTL_SECONDS
             message = {
                 'cmd': 'enable_blocking',
                 'domains': domains,
-                'ttl_seconds': 3600
+                'ttl_seconds': ttl
             }
             
             # Send via native messaging
             if self.native_messaging:
-                self.native_messaging.send_command('enable_blocking', domains=domains, ttl_seconds=3600)
+                self.native_messaging.send_command('enable_blocking', domains=domains, ttl_seconds=ttl)
                 self.logger.info(f"Sent blocking command to extension: {len(domains)} domains")
             else:
                 self.logger.warning(f"Native messaging not available, cannot send to extension: {message}")
             
             self.blocking_enabled = True
+            self.blocked_domains = list(domains)
+            
+            # Renew ahead of the extension's TTL so wheel or messaging latency never lets it lapse
+            self.timers.cancel(self._ttl_timer)
+            self._ttl_timer = self.timers.call_later(max(0.0, ttl - self.BLOCKING_RENEW_MARGIN_SECONDS),
+                                                     self._renew_blocking, background=True)
             
         except Exception as e:
             self.logger.error(f"Failed to enable blocking: {e}")
@@ -135,6 +154,9 @@ class ProtectionController:
     def disable_blocking(self):
         """Send disable blocking command to Chrome extension"""
         try:
+            self.timers.cancel(self._ttl_timer)
+            self._ttl_timer = None
+            
             # Send via native messaging
             if self.native_messaging:
                 self.native_messaging.send_command('disable_blocking')
@@ -147,6 +169,13 @@ class ProtectionController:
         except Exception as e:
             self.logger.error(f"Failed to disable blocking: {e}")
     
+    def _renew_blocking(self):
+        """Re-send blocking before the extension's TTL lapses mid-session"""
+        self._ttl_timer = None
+        if self.blocking_enabled:
+            self.logger.info("Blocking TTL nearly expired, renewing")
+            self.enable_blocking(self.blocked_domains)
+    
     def update_blocklist(self, domains: List[str]):
         """Update the blocklist in the extension"""
         try:
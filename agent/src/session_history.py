@@ -0,0 +1,205 @@
+"""
+Session History - Local SQLite store of completed flow sessions
+"""
+
+import logging
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    start_ts REAL PRIMARY KEY,
+    end_ts REAL NOT NULL,
+    day TEXT NOT NULL,
+    duration_minutes REAL NOT NULL,
+    start_app TEXT,
+    end_reason TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_end ON sessions(end_ts);
+CREATE INDEX IF NOT EXISTS idx_sessions_duration ON sessions(duration_minutes);
+
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    day TEXT PRIMARY KEY,
+    session_count INTEGER NOT NULL,
+    total_minutes REAL NOT NULL,
+    best_minutes REAL NOT NULL,
+    streak INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_daily_rollups_streak ON daily_rollups(streak);
+"""
+
+
+class SessionHistoryStore:
+    """
+    Completed sessions keyed by start time, with per-day rollups
+    
+    Each insert updates the session's day row in the same transaction, and
+    the day row carries the streak length ending on that day, so streaks,
+    personal bests, last-N averages and heatmaps are index lookups instead
+    of scans over every session. A new day row renumbers the consecutive
+    days after it, so a session backfilled for an earlier day extends the
+    streaks that follow.
+    """
+    
+    def __init__(self, db_path: Path):
+        self.logger = logging.getLogger(__name__)
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._repair_streaks()
+    
+    def add_session(self, start_ts: float, end_ts: float, duration_minutes: float,
+                    start_app: Optional[str] = None, end_reason: Optional[str] = None):
+        """Record a completed session and update its day rollup"""
+        start_day = date.fromtimestamp(start_ts)
+        day = start_day.isoformat()
+        previous_day = (start_day - timedelta(days=1)).isoformat()
+        
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'INSERT OR IGNORE INTO sessions (start_ts, end_ts, day, duration_minutes, start_app, end_reason) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (start_ts, end_ts, day, duration_minutes, start_app, end_reason)
+            )
+            if cursor.rowcount == 0:
+                return
+            
+            updated = self._conn.execute(
+                'UPDATE daily_rollups SET session_count = session_count + 1, '
+                'total_minutes = total_minutes + ?, best_minutes = MAX(best_minutes, ?) WHERE day = ?',
+                (duration_minutes, duration_minutes, day)
+            )
+            if updated.rowcount == 0:
+                row = self._conn.execute(
+                    'SELECT streak FROM daily_rollups WHERE day = ?', (previous_day,)
+                ).fetchone()
+                streak = (row[0] if row else 0) + 1
+                self._conn.execute(
+                    'INSERT INTO daily_rollups (day, session_count, total_minutes, best_minutes, streak) '
+                    'VALUES (?, 1, ?, ?, ?)',
+                    (day, duration_minutes, duration_minutes, streak)
+                )
+                
+                # Days already recorded after this one now continue its streak
+                later_day = start_day
+                while True:
+                    later_day += timedelta(days=1)
+                    streak += 1
+                    shifted = self._conn.execute(
+                        'UPDATE daily_rollups SET streak = ? WHERE day = ?', (streak, later_day.isoformat())
+                    )
+                    if shifted.rowcount == 0:
+                        break
+    
+    def _repair_streaks(self):
+        """Renumber stored streaks from the day rows (older versions never updated later days)"""
+        with self._lock, self._conn:
+            rows = self._conn.execute('SELECT day, streak FROM daily_rollups ORDER BY day').fetchall()
+            fixes = []
+            previous, streak = None, 0
+            for day_text, stored in rows:
+                day = date.fromisoformat(day_text)
+                streak = streak + 1 if previous == day - timedelta(days=1) else 1
+                if stored != streak:
+                    fixes.append((streak, day_text))
+                previous = day
+            if fixes:
+                self._conn.executemany('UPDATE daily_rollups SET streak = ? WHERE day = ?', fixes)
+                self.logger.info(f"Repaired streaks of {len(fixes)} days")
+    
+    def count(self) -> int:
+        """Total number of recorded sessions"""
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+    
+    def average_of_last(self, n: int) -> Optional[float]:
+        """Average duration (minutes) of the n most recently finished sessions"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT AVG(duration_minutes) FROM '
+                '(SELECT duration_minutes FROM sessions ORDER BY end_ts DESC LIMIT ?)',
+                (n,)
+            ).fetchone()
+        return row[0]
+    
+    def personal_best(self) -> float:
+        """Longest session (minutes)"""
+        with self._lock:
+            row = self._conn.execute('SELECT MAX(duration_minutes) FROM sessions').fetchone()
+        return row[0] or 0
+    
+    def current_streak(self, today: Optional[date] = None) -> int:
+        """
+        Consecutive days with a session, ending today
+        
+        A streak that ended yesterday still counts until today is over.
+        """
+        today = today or date.today()
+        yesterday = today - timedelta(days=1)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT streak FROM daily_rollups WHERE day IN (?, ?) ORDER BY day DESC LIMIT 1',
+                (today.isoformat(), yesterday.isoformat())
+            ).fetchone()
+        return row[0] if row else 0
+    
+    def has_session_on(self, day: date) -> bool:
+        """Check whether any session started on a day"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT 1 FROM daily_rollups WHERE day = ?', (day.isoformat(),)
+            ).fetchone()
+        return row is not None
+    
+    def best_streak(self) -> int:
+        """Longest streak ever recorded"""
+        with self._lock:
+            row = self._conn.execute('SELECT MAX(streak) FROM daily_rollups').fetchone()
+        return row[0] or 0
+    
+    def daily_rollups(self, start_day: date, end_day: date) -> List[Dict]:
+        """Per-day totals for a calendar heatmap (inclusive range)"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT day, session_count, total_minutes, best_minutes FROM daily_rollups '
+                'WHERE day BETWEEN ? AND ? ORDER BY day',
+                (start_day.isoformat(), end_day.isoformat())
+            ).fetchall()
+        return [
+            {'day': day, 'sessions': count, 'total_minutes': total, 'best_minutes': best}
+            for day, count, total, best in rows
+        ]
+    
+    def recent_sessions(self, limit: int = 20) -> List[Dict]:
+        """Most recently finished sessions, newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT start_ts, end_ts, duration_minutes, start_app, end_reason FROM sessions '
+                'ORDER BY end_ts DESC LIMIT ?',
+                (limit,)
+            ).fetchall()
+        return [
+            {
+                'start': datetime.fromtimestamp(start).isoformat(),
+                'end': datetime.fromtimestamp(end).isoformat(),
+                'duration_minutes': duration,
+                'start_app': app,
+                'end_reason': reason
+            }
+            for start, end, duration, app, reason in rows
+        ]
+    
+    def close(self):
+        """Close the database"""
+        with self._lock:
+            self._conn.close()
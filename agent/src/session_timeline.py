@@ -0,0 +1,144 @@
+"""
+Session Timeline - Compact, delta-encoded record of a flow session's app activity
+"""
+
+import time
+from typing import Dict, List, Optional, Union
+
+# Blob layout (all integers are unsigned LEB128 varints):
+#   version byte, flags byte (bit 0: truncated)
+#   session start (ms since epoch)
+#   app count, then each app name as length + UTF-8 bytes
+#   entries until the end: ms since the previous entry, (app index << 2) | kind
+FORMAT_VERSION = 1
+FLAG_TRUNCATED = 0x01
+KINDS = ('start', 'app_switch', 'end')
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, offset: int):
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError("Truncated timeline varint")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class SessionTimeline:
+    """
+    App switches during one session, kept as (offset, kind, app) entries
+    
+    App names are interned, so a switch costs a few bytes once encoded.
+    Past max_entries further switches are dropped and the blob is marked
+    truncated; the end entry is always kept.
+    """
+    
+    def __init__(self, start_ts: float, start_app: Optional[str] = None, max_entries: int = 20000):
+        self.start_ms = int(start_ts * 1000)
+        self.max_entries = max_entries
+        self.truncated = False
+        self._apps: Dict[str, int] = {}
+        self._entries: List[tuple] = []
+        self._add('start', start_app, start_ts)
+    
+    def add_switch(self, app: Optional[str], timestamp: Optional[float] = None):
+        """Record the foreground app changing"""
+        if len(self._entries) >= self.max_entries:
+            self.truncated = True
+            return
+        self._add('app_switch', app, timestamp)
+    
+    def end(self, app: Optional[str], timestamp: Optional[float] = None):
+        """Record the end of the session"""
+        self._add('end', app, timestamp)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def encode(self) -> bytes:
+        """Pack the timeline into its binary blob"""
+        out = bytearray([FORMAT_VERSION, FLAG_TRUNCATED if self.truncated else 0])
+        _write_varint(out, max(0, self.start_ms))
+        _write_varint(out, len(self._apps))
+        for name in self._apps:
+            encoded = name.encode()
+            _write_varint(out, len(encoded))
+            out += encoded
+        
+        previous = self.start_ms
+        for at_ms, kind, app_index in self._entries:
+            # Clock steps backwards are clamped to zero delta
+            at_ms = max(at_ms, previous)
+            _write_varint(out, at_ms - previous)
+            _write_varint(out, (app_index << 2) | kind)
+            previous = at_ms
+        return bytes(out)
+    
+    def _add(self, kind: str, app: Optional[str], timestamp: Optional[float]):
+        name = app or ''
+        index = self._apps.setdefault(name, len(self._apps))
+        at_ms = int((time.time() if timestamp is None else timestamp) * 1000)
+        self._entries.append((at_ms, KINDS.index(kind), index))
+
+
+def decode_timeline(blob: Union[bytes, bytearray, memoryview, str]) -> Dict:
+    """
+    Unpack a timeline blob
+    
+    Accepts raw bytes or Postgres bytea hex text ('\\x...'), as returned by
+    the REST API. Entry times are seconds since the session start.
+    """
+    if isinstance(blob, str):
+        blob = bytes.fromhex(blob[2:] if blob.startswith('\\x') else blob)
+    data = bytes(blob)
+    if len(data) < 2 or data[0] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported timeline version {data[0] if data else None}")
+    
+    flags = data[1]
+    start_ms, offset = _read_varint(data, 2)
+    app_count, offset = _read_varint(data, offset)
+    apps = []
+    for _ in range(app_count):
+        length, offset = _read_varint(data, offset)
+        apps.append(data[offset:offset + length].decode())
+        offset += length
+    
+    entries = []
+    elapsed_ms = 0
+    while offset < len(data):
+        delta, offset = _read_varint(data, offset)
+        code, offset = _read_varint(data, offset)
+        elapsed_ms += delta
+        entries.append({
+            't': elapsed_ms / 1000,
+            'kind': KINDS[code & 0x03],
+            'app': apps[code >> 2] or None
+        })
+    
+    return {
+        'start': start_ms / 1000,
+        'truncated': bool(flags & FLAG_TRUNCATED),
+        'apps': [app or None for app in apps],
+        'entries': entries
+    }
+
+
+def app_durations(timeline: Dict) -> Dict[Optional[str], float]:
+    """Seconds spent in each app, from a decoded timeline"""
+    durations: Dict[Optional[str], float] = {}
+    entries = timeline['entries']
+    for current, following in zip(entries, entries[1:]):
+        durations[current['app']] = durations.get(current['app'], 0.0) + following['t'] - current['t']
+    return durations
@@ -0,0 +1,138 @@
+"""
+Startup Graph - Dependency-aware, concurrent start-up of agent components
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+class StartupPhase:
+    """One start-up step and its readiness state"""
+    
+    PENDING = 'pending'
+    RUNNING = 'running'
+    READY = 'ready'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'  # a dependency failed
+    
+    def __init__(self, name: str, fn: Callable, depends_on: Iterable[str] = (), critical: bool = False):
+        self.name = name
+        self.fn = fn
+        self.depends_on = list(depends_on)
+        self.critical = critical
+        self.state = self.PENDING
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None  # seconds after the graph started
+        self.duration: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+    
+    def status(self) -> Dict:
+        return {
+            'state': self.state,
+            'started_ms': round(self.started_at * 1000, 1) if self.started_at is not None else None,
+            'duration_ms': round(self.duration * 1000, 1) if self.duration is not None else None,
+            'error': self.error
+        }
+
+
+class StartupGraph:
+    """
+    Runs start-up phases as soon as their dependencies are ready
+    
+    Each phase runs on its own short-lived thread, so a phase waiting on the
+    network never holds up local ones. A failed phase skips its dependents;
+    a critical phase that failed or was skipped is raised from wait().
+    """
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.phases: Dict[str, StartupPhase] = {}
+        self._lock = threading.Lock()
+        self._started: Optional[float] = None
+    
+    def add(self, name: str, fn: Callable, depends_on: Iterable[str] = (), critical: bool = False) -> StartupPhase:
+        """Register a phase; dependencies must be added first"""
+        for dependency in depends_on:
+            if dependency not in self.phases:
+                raise ValueError(f"Startup phase '{name}' depends on unknown phase '{dependency}'")
+        phase = StartupPhase(name, fn, depends_on, critical)
+        self.phases[name] = phase
+        return phase
+    
+    def run(self):
+        """Start every phase that has no dependencies; the rest follow as they unblock"""
+        self._started = time.perf_counter()
+        self._launch_ready()
+    
+    def wait(self, names: Optional[Iterable[str]] = None, timeout: Optional[float] = None) -> bool:
+        """Wait for phases (default: all) to finish; True if they all did in time"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for name in names or list(self.phases):
+            phase = self.phases[name]
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not phase.done.wait(remaining):
+                return False
+            if phase.critical and phase.state != StartupPhase.READY:
+                raise RuntimeError(f"Startup phase '{name}' {phase.state}: {phase.error}")
+        return True
+    
+    def is_ready(self, name: Optional[str] = None) -> bool:
+        """Check one phase, or all of them, reached ready"""
+        phases = [self.phases[name]] if name else list(self.phases.values())
+        return all(phase.state == StartupPhase.READY for phase in phases)
+    
+    def timings(self) -> Dict[str, float]:
+        """Seconds each finished phase took"""
+        return {name: phase.duration for name, phase in list(self.phases.items()) if phase.duration is not None}
+    
+    def status(self) -> Dict[str, Dict]:
+        return {name: phase.status() for name, phase in list(self.phases.items())}
+    
+    def _launch_ready(self):
+        to_start: List[StartupPhase] = []
+        to_skip: List[StartupPhase] = []
+        with self._lock:
+            for phase in self.phases.values():
+                if phase.state != StartupPhase.PENDING:
+                    continue
+                states = [self.phases[dependency].state for dependency in phase.depends_on]
+                blocked = [dependency for dependency, state in zip(phase.depends_on, states)
+                           if state in (StartupPhase.FAILED, StartupPhase.SKIPPED)]
+                if blocked:
+                    phase.state = StartupPhase.SKIPPED
+                    phase.error = f"dependency '{blocked[0]}' did not start"
+                    to_skip.append(phase)
+                elif all(state == StartupPhase.READY for state in states):
+                    phase.state = StartupPhase.RUNNING
+                    phase.started_at = time.perf_counter() - self._started
+                    to_start.append(phase)
+        
+        for phase in to_skip:
+            self.logger.warning(f"Skipping startup phase '{phase.name}': {phase.error}")
+            phase.done.set()
+        for phase in to_start:
+            threading.Thread(target=self._run_phase, args=(phase,), name=f'startup-{phase.name}',
+                             daemon=True).start()
+        if to_skip:
+            self._launch_ready()
+    
+    def _run_phase(self, phase: StartupPhase):
+        begin = self._started + phase.started_at
+        try:
+            phase.fn()
+            state = StartupPhase.READY
+        except Exception as e:
+            phase.error = str(e)
+            state = StartupPhase.FAILED
+            self.logger.error(f"Startup phase '{phase.name}' failed: {e}")
+        
+        phase.duration = time.perf_counter() - begin
+        phase.finished_at = phase.started_at + phase.duration
+        with self._lock:
+            phase.state = state
+        self.logger.debug(f"Startup phase '{phase.name}' {state} in {phase.duration * 1000:.0f} ms")
+        phase.done.set()
+        self._launch_ready()
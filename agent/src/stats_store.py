@@ -0,0 +1,178 @@
+"""
+Stats Store - Journaled, crash-safe persistence for small JSON state
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from .timer_wheel import TimerWheel, get_timer_wheel
+
+
+class StatsStore:
+    """
+    Snapshot + append-only journal for a flat dict of values
+    
+    record() only diffs against the last recorded state and queues the
+    changed keys; a debounced flush on the timer wheel appends them to the
+    journal as one compact line. Every compact_every lines the full state
+    is written to a temp file and atomically renamed over the snapshot,
+    then the journal is truncated. On load the snapshot is read and journal
+    lines newer than its sequence number are replayed; a torn final line
+    from a crash is dropped and cut from the file.
+    """
+    
+    SEQ_KEY = '_seq'
+    
+    def __init__(self, snapshot_path: Path, flush_delay: float = 1.0, compact_every: int = 200,
+                 timers: Optional[TimerWheel] = None):
+        self.logger = logging.getLogger(__name__)
+        self.snapshot_path = Path(snapshot_path)
+        self.journal_path = self.snapshot_path.with_name(self.snapshot_path.name + '.journal')
+        self.flush_delay = flush_delay
+        self.compact_every = compact_every
+        self.timers = timers
+        
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._state: Dict = {}
+        self._pending: Dict = {}
+        self._seq = 0
+        self._snapshot_seq = 0
+        self._journal_lines = 0
+        self._flush_timer = None
+    
+    def load(self) -> Dict:
+        """Read snapshot and replay the journal; returns the current state"""
+        state = {}
+        snapshot_seq = 0
+        
+        if self.snapshot_path.exists():
+            try:
+                text = self.snapshot_path.read_text()
+                if text.strip():
+                    state = json.loads(text)
+                    snapshot_seq = int(state.pop(self.SEQ_KEY, 0))
+            except Exception as e:
+                self.logger.error(f"Error loading stats snapshot: {e}")
+                state = {}
+        
+        seq = snapshot_seq
+        lines = 0
+        if self.journal_path.exists():
+            try:
+                with open(self.journal_path, 'r+b') as f:
+                    valid_end = 0
+                    for line in f:
+                        try:
+                            if not line.endswith(b'\n'):
+                                raise ValueError("missing newline")
+                            entry = json.loads(line)
+                        except ValueError:
+                            # Torn write from a crash; everything after it is unusable
+                            self.logger.warning("Dropping truncated stats journal entry")
+                            break
+                        if entry['s'] > snapshot_seq:
+                            state.update(entry['d'])
+                            seq = entry['s']
+                        lines += 1
+                        valid_end += len(line)
+                    
+                    # Cut the torn tail so the next append starts on a fresh line
+                    if f.seek(0, os.SEEK_END) != valid_end:
+                        f.truncate(valid_end)
+                        f.flush()
+                        os.fsync(f.fileno())
+            except Exception as e:
+                self.logger.error(f"Error replaying stats journal: {e}")
+        
+        with self._lock:
+            self._state = dict(state)
+            self._seq = seq
+            self._snapshot_seq = snapshot_seq
+            self._journal_lines = lines
+        return state
+    
+    def record(self, state: Dict):
+        """Queue the keys of state that changed since the last record"""
+        with self._lock:
+            changed = {k: v for k, v in state.items() if self._state.get(k, object()) != v}
+            if not changed:
+                return
+            self._state.update(changed)
+            self._pending.update(changed)
+            
+            if self._flush_timer is None:
+                timers = self.timers or get_timer_wheel()
+                self._flush_timer = timers.call_later(self.flush_delay, self.flush, background=True)
+    
+    def flush(self):
+        """Append pending changes to the journal now"""
+        with self._io_lock:
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                if not self._pending:
+                    return
+                pending = self._pending
+                self._pending = {}
+                self._seq += 1
+                seq = self._seq
+            
+            try:
+                self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+                line = json.dumps({'s': seq, 'd': pending}, separators=(',', ':'))
+                with open(self.journal_path, 'a') as f:
+                    f.write(line + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._journal_lines += 1
+            except Exception as e:
+                self.logger.error(f"Error writing stats journal: {e}")
+                with self._lock:
+                    # Keep the changes for the next attempt, newer values win
+                    pending.update(self._pending)
+                    self._pending = pending
+                return
+            
+            if self._journal_lines >= self.compact_every:
+                self._compact()
+    
+    def compact(self):
+        """Flush, then fold the journal into a fresh snapshot"""
+        self.flush()
+        with self._io_lock:
+            if self._journal_lines:
+                self._compact()
+    
+    def _compact(self):
+        """Atomically replace the snapshot and truncate the journal (io lock held)"""
+        with self._lock:
+            snapshot = dict(self._state)
+            snapshot[self.SEQ_KEY] = self._seq
+            seq = self._seq
+        
+        tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            
+            # Journal entries up to seq are now in the snapshot and skipped on replay,
+            # so a crash before this truncate is harmless
+            with open(self.journal_path, 'w'):
+                pass
+            self._snapshot_seq = seq
+            self._journal_lines = 0
+        except Exception as e:
+            self.logger.error(f"Error compacting stats: {e}")
+    
+    def close(self):
+        """Write everything out and compact"""
+        self.compact()
@@ -0,0 +1,284 @@
+"""
+Timer Wheel - Shared scheduler for all time-based agent actions
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+
+class TimerHandle:
+    """A scheduled callback registered with a TimerWheel"""
+
+    __slots__ = ('deadline', 'callback', 'args', 'interval', 'background',
+                 'cancelled', '_tick', '_slot', '_wheel')
+
+    def __init__(self, wheel: 'TimerWheel', deadline: float, callback: Callable,
+                 args: tuple, interval: Optional[float], background: bool):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.interval = interval
+        self.background = background
+        self.cancelled = False
+        self._tick = 0
+        self._slot = None
+        self._wheel = wheel
+
+    def cancel(self):
+        """Cancel this timer (safe to call more than once)"""
+        self._wheel.cancel(self)
+
+    def remaining(self) -> float:
+        """Seconds until this timer fires"""
+        return max(0.0, self.deadline - time.monotonic())
+
+
+class TimerWheel:
+    """
+    Hierarchical timing wheel
+
+    Timers are hashed into slots by deadline tick, so insert and cancel are
+    O(1). Level 0 has one slot per tick; each higher level covers a whole
+    revolution of the level below and is cascaded down when the lower level
+    wraps. A single thread sleeps until the next tick that has work, so
+    timers sharing a tick fire together in one wakeup.
+    """
+
+    def __init__(self, tick_seconds: float = 0.05, slot_bits: int = 6, levels: int = 4):
+        self.logger = logging.getLogger(__name__)
+        self.tick_seconds = tick_seconds
+        self.slot_bits = slot_bits
+        self.slots = 1 << slot_bits
+        self.slot_mask = self.slots - 1
+        self.levels = levels
+
+        self._wheel = [[set() for _ in range(self.slots)] for _ in range(levels)]
+        self._ready = set()  # Timers whose tick has already been processed
+        self._count = 0
+
+        self._origin = time.monotonic()
+        self._processed_tick = 0
+        self._next_wake_tick: Optional[int] = None
+
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.running = False
+
+    def start(self):
+        """Start the wakeup thread"""
+        with self._cond:
+            if self.running:
+                return
+            self.running = True
+        self._thread = threading.Thread(target=self._run, name='timer-wheel', daemon=True)
+        self._thread.start()
+        self.logger.info("Timer wheel started")
+
+    def stop(self):
+        """Stop the wakeup thread; pending timers are dropped"""
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self.logger.info("Timer wheel stopped")
+
+    def call_later(self, delay: float, callback: Callable, *args,
+                   background: bool = False) -> TimerHandle:
+        """
+        Run callback after delay seconds
+
+        Callbacks run on the wheel thread and must be short. Pass
+        background=True for blocking work (network, subprocesses).
+        """
+        handle = TimerHandle(self, time.monotonic() + max(0.0, delay), callback,
+                             args, None, background)
+        self._add(handle)
+        return handle
+
+    def call_repeating(self, interval: float, callback: Callable, *args,
+                       initial_delay: Optional[float] = None,
+                       background: bool = False) -> TimerHandle:
+        """Run callback every interval seconds until cancelled"""
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        delay = interval if initial_delay is None else initial_delay
+        handle = TimerHandle(self, time.monotonic() + max(0.0, delay), callback,
+                             args, interval, background)
+        self._add(handle)
+        return handle
+
+    def cancel(self, handle: Optional[TimerHandle]):
+        """Cancel a timer in O(1)"""
+        if handle is None:
+            return
+        with self._cond:
+            handle.cancelled = True
+            if handle._slot is not None:
+                handle._slot.discard(handle)
+                handle._slot = None
+                self._count -= 1
+
+    def pending(self) -> int:
+        """Number of timers waiting to fire"""
+        with self._cond:
+            return self._count
+
+    def _now_tick(self) -> int:
+        return int((time.monotonic() - self._origin) / self.tick_seconds)
+
+    def _deadline_tick(self, deadline: float) -> int:
+        # Round up so a timer never fires before its deadline
+        ticks = (deadline - self._origin) / self.tick_seconds
+        whole = int(ticks)
+        return whole if whole == ticks else whole + 1
+
+    def _add(self, handle: TimerHandle):
+        with self._cond:
+            if handle.cancelled:
+                return
+            handle._tick = self._deadline_tick(handle.deadline)
+            self._place(handle)
+            self._count += 1
+            if self._next_wake_tick is None or handle._tick < self._next_wake_tick:
+                self._cond.notify()
+
+    def _place(self, handle: TimerHandle):
+        """Hash a handle into its slot relative to the last processed tick"""
+        if handle._tick <= self._processed_tick:
+            slot = self._ready
+        else:
+            for level in range(self.levels):
+                shift = level * self.slot_bits
+                if (handle._tick >> shift) - (self._processed_tick >> shift) < self.slots:
+                    slot = self._wheel[level][(handle._tick >> shift) & self.slot_mask]
+                    break
+            else:
+                # Beyond the top level: park in the furthest slot and re-hash on cascade
+                shift = (self.levels - 1) * self.slot_bits
+                index = ((self._processed_tick >> shift) + self.slots - 1) & self.slot_mask
+                slot = self._wheel[self.levels - 1][index]
+        slot.add(handle)
+        handle._slot = slot
+
+    def _next_tick(self) -> Optional[int]:
+        """Earliest tick after the processed tick that has work, or None if empty"""
+        if self._count == 0:
+            return None
+        if self._ready:
+            return self._processed_tick
+
+        best = None
+        for level in range(self.levels):
+            shift = level * self.slot_bits
+            base = self._processed_tick >> shift
+            for k in range(1, self.slots + 1):
+                candidate = (base + k) << shift
+                if best is not None and candidate >= best:
+                    break
+                if self._wheel[level][(base + k) & self.slot_mask]:
+                    best = candidate
+                    break
+        return best
+
+    def _advance(self, now_tick: int) -> List[TimerHandle]:
+        """Process every tick with work up to now_tick and collect due handles"""
+        due = []
+        if self._ready:
+            due.extend(self._take(self._ready))
+
+        while True:
+            next_tick = self._next_tick()
+            if next_tick is None or next_tick > now_tick:
+                self._processed_tick = max(self._processed_tick, now_tick)
+                break
+            self._processed_tick = next_tick
+
+            # Cascade higher levels whose boundary falls on this tick, top down
+            for level in range(self.levels - 1, 0, -1):
+                shift = level * self.slot_bits
+                if next_tick & ((1 << shift) - 1) == 0:
+                    slot = self._wheel[level][(next_tick >> shift) & self.slot_mask]
+                    for handle in self._take(slot):
+                        self._place(handle)
+                        self._count += 1
+
+            due.extend(self._take(self._wheel[0][next_tick & self.slot_mask]))
+            if self._ready:
+                due.extend(self._take(self._ready))
+        return due
+
+    def _take(self, slot: set) -> List[TimerHandle]:
+        handles = list(slot)
+        slot.clear()
+        for handle in handles:
+            handle._slot = None
+        self._count -= len(handles)
+        return handles
+
+    def _run(self):
+        """Wakeup thread"""
+        while True:
+            with self._cond:
+                if not self.running:
+                    return
+                due = self._advance(self._now_tick())
+                if not due:
+                    self._next_wake_tick = self._next_tick()
+                    if self._next_wake_tick is None:
+                        timeout = None
+                    else:
+                        wake_at = self._origin + self._next_wake_tick * self.tick_seconds
+                        timeout = max(0.0, wake_at - time.monotonic())
+                    self._cond.wait(timeout)
+                    continue
+                self._next_wake_tick = None
+
+            for handle in sorted(due, key=lambda h: h.deadline):
+                self._fire(handle)
+
+    def _fire(self, handle: TimerHandle):
+        if handle.cancelled:
+            return
+
+        if handle.interval is not None:
+            # Re-arm from the scheduled deadline so repeating timers don't drift
+            handle.deadline += handle.interval
+            now = time.monotonic()
+            if handle.deadline < now:
+                handle.deadline = now + handle.interval
+            self._add(handle)
+
+        if handle.background:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='timer-worker')
+            self._executor.submit(self._invoke, handle)
+        else:
+            self._invoke(handle)
+
+    def _invoke(self, handle: TimerHandle):
+        try:
+            handle.callback(*handle.args)
+        except Exception as e:
+            self.logger.error(f"Error in timer callback {handle.callback!r}: {e}", exc_info=True)
+
+
+_shared_wheel: Optional[TimerWheel] = None
+_shared_lock = threading.Lock()
+
+
+def get_timer_wheel() -> TimerWheel:
+    """Get the process-wide timer wheel, starting it on first use or after it was stopped"""
+    global _shared_wheel
+    with _shared_lock:
+        if _shared_wheel is None or not _shared_wheel.running:
+            _shared_wheel = TimerWheel()
+            _shared_wheel.start()
+        return _shared_wheel
@@ -0,0 +1,142 @@
+"""
+UI Thread - Single long-lived thread that owns all Tk windows
+"""
+
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from .lazy_import import lazy_import, module_available
+
+# Imported on the UI thread when the Tk root is created
+tk = lazy_import('tkinter')
+TK_AVAILABLE = module_available('tkinter')
+
+
+class UIThread:
+    """
+    Owns a single hidden Tk root and runs commands posted from other threads
+    
+    Tk is not thread-safe, so every widget call goes through submit() and
+    executes on this thread. In headless mode there is no Tk root and
+    commands run on a plain worker thread; views skip their widgets, which
+    lets tests and Linux runs exercise the same code paths.
+    """
+    
+    POLL_INTERVAL_MS = 10
+    
+    def __init__(self, headless: bool = False):
+        self.logger = logging.getLogger(__name__)
+        self.headless = headless or not TK_AVAILABLE
+        self.root = None
+        self.running = False
+        
+        self._commands: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+    
+    def start(self):
+        """Start the UI thread and wait until it accepts commands"""
+        if self.running:
+            return
+        self.running = True
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name='ui-thread', daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout=5)
+    
+    def stop(self):
+        """Stop the UI thread and destroy the root window"""
+        if not self.running:
+            return
+        self.running = False
+        self._commands.put(None)
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self.logger.info("UI thread stopped")
+    
+    def submit(self, fn: Callable, *args) -> Future:
+        """Queue fn(*args) to run on the UI thread"""
+        if not self.running:
+            self.start()
+        future = Future()
+        self._commands.put((fn, args, future))
+        return future
+    
+    def call(self, fn: Callable, *args, timeout: float = 2.0):
+        """Run fn(*args) on the UI thread and wait for its result"""
+        if self.is_ui_thread():
+            return fn(*args)
+        return self.submit(fn, *args).result(timeout=timeout)
+    
+    def is_ui_thread(self) -> bool:
+        """Check whether the caller is running on the UI thread"""
+        return threading.current_thread() is self._thread
+    
+    def _run(self):
+        if not self.headless:
+            try:
+                self.root = tk.Tk()
+                self.root.withdraw()
+            except Exception as e:
+                self.logger.warning(f"Tk unavailable, falling back to headless UI: {e}")
+                self.root = None
+                self.headless = True
+        
+        self.logger.info(f"UI thread started ({'headless' if self.headless else 'tk'})")
+        self._ready.set()
+        
+        if self.headless:
+            while self.running:
+                command = self._commands.get()
+                if command is None:
+                    break
+                self._execute(command)
+            return
+        
+        self.root.after(self.POLL_INTERVAL_MS, self._pump)
+        self.root.mainloop()
+        try:
+            self.root.destroy()
+        except Exception:
+            pass
+        self.root = None
+    
+    def _pump(self):
+        """Drain queued commands, then re-arm"""
+        while True:
+            try:
+                command = self._commands.get_nowait()
+            except queue.Empty:
+                break
+            if command is None:
+                self.root.quit()
+                return
+            self._execute(command)
+        self.root.after(self.POLL_INTERVAL_MS, self._pump)
+    
+    def _execute(self, command):
+        fn, args, future = command
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            self.logger.error(f"Error in UI command {fn!r}: {e}", exc_info=True)
+            future.set_exception(e)
+
+
+_shared_ui: Optional[UIThread] = None
+_shared_lock = threading.Lock()
+
+
+def get_ui_thread() -> UIThread:
+    """Get the process-wide UI thread, starting it on first use"""
+    global _shared_ui
+    with _shared_lock:
+        if _shared_ui is None:
+            _shared_ui = UIThread()
+            _shared_ui.start()
+        return _shared_ui
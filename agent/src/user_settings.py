@@ -3,26 +3,69 @@ User Settings Manager for FlowFacilitator
 Manages synchronization between local and cloud settings
 """
 
+import copy
+import json
 import logging
+import os
 import threading
-import time
-from typing import Dict, Optional, Tuple, Any
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
 from datetime import datetime
 
+from .cloud_scheduler import CloudScheduler, RetryAfter, get_cloud_scheduler, retry_after_hint
+
+
+# Settings sections, each a dict stored in one row of the settings table
+SECTIONS = ('preferences', 'permissions', 'flow_config', 'blocklist', 'whitelist')
+
+# Settings table keys that differ from the section name; the dashboard and
+# API server store the flow config as 'flow_detection'
+SETTINGS_KEYS = {'flow_config': 'flow_detection'}
+SECTION_FOR_KEY = {key: section for section, key in SETTINGS_KEYS.items()}
+
+# Row key the server uses for the all_users profile in get_settings_since
+PROFILE_KEY = 'profile'
+
+# Marks a key removed from its section
+_DELETED = object()
+
 
 class UserSettingsManager:
-    """Manages local + cloud settings synchronization"""
+    """
+    Manages local + cloud settings synchronization
     
-    def __init__(self, auth_service, supabase_client, local_storage_path=None):
+    Local edits are tracked per section at key level: editing a key again
+    replaces its pending value, so only the latest value of each changed key
+    is sent, and all changed sections go up in one patch_user_settings call.
+    
+    Pulls are conditional on the newest server updated_at seen so far: an
+    unchanged account costs one call with an empty result, and only the
+    sections that changed are applied and reported through on_change.
+    
+    With local_storage_path set, caches, versions and unsent edits are kept
+    in a JSON snapshot so startup can apply the last known settings without
+    the network; auth and client can be attached once sign-in is restored.
+    """
+    
+    def __init__(self, auth_service, supabase_client, local_storage_path=None,
+                 scheduler: Optional[CloudScheduler] = None,
+                 on_change: Optional[Callable[[str, Any], None]] = None,
+                 on_push: Optional[Callable[[str, Optional[Dict]], None]] = None):
         self.logger = logging.getLogger(__name__)
         self.auth = auth_service
         self.client = supabase_client
-        self.local_storage_path = local_storage_path
+        self.local_storage_path = Path(local_storage_path) if local_storage_path else None
+        self._save_lock = threading.Lock()
+        self.scheduler = scheduler or get_cloud_scheduler()
+        self.on_change = on_change
+        self.on_push = on_push
         
         # Sync settings
         self.sync_interval = 300  # 5 minutes
-        self.sync_thread = None
+        self.retry_interval = 60  # backoff base after a failed sync
+        self.sync_job = None
         self.sync_running = False
+        self._retry_after: Optional[float] = None  # server hint from the last failure
         
         # Local cache
         self.preferences_cache = {}
@@ -30,131 +73,330 @@ class UserSettingsManager:
         self.flow_config_cache = None
         self.blocklist_cache = None
         self.whitelist_cache = None
+        self.profile = None
         
         # Sync state
         self.last_sync_time = None
-        self.pending_changes = []
+        self.settings_version: Optional[str] = None  # newest settings updated_at pulled
+        self.profile_version: Optional[str] = None  # profile updated_at pulled
+        self._dirty: Dict[str, Dict[str, Any]] = {}
+        self._synced: Dict[str, Dict] = {section: {} for section in SECTIONS}
+        self._dirty_lock = threading.Lock()
     
     def start_auto_sync(self):
         """Start automatic background sync"""
-        if self.sync_thread and self.sync_thread.is_alive():
+        if self.sync_running:
             self.logger.warning("Auto-sync already running")
             return
         
         self.sync_running = True
-        self.sync_thread = threading.Thread(target=self._auto_sync_loop, daemon=True)
-        self.sync_thread.start()
+        self.sync_job = self.scheduler.add_job(
+            'settings_sync',
+            self._sync_job,
+            interval=self.sync_interval,
+            backoff_base=self.retry_interval
+        )
         self.logger.info("Started auto-sync")
     
     def stop_auto_sync(self):
         """Stop automatic background sync"""
         self.sync_running = False
-        if self.sync_thread:
-            self.sync_thread.join(timeout=5)
+        self.scheduler.remove_job('settings_sync')
+        self.sync_job = None
         self.logger.info("Stopped auto-sync")
     
-    def _auto_sync_loop(self):
-        """Background sync loop"""
-        while self.sync_running:
-            try:
-                if self.auth.is_authenticated():
-                    self.sync_from_cloud()
+    def attach(self, auth_service, supabase_client):
+        """Connect to the cloud once auth is available"""
+        self.auth = auth_service
+        self.client = supabase_client
+    
+    def _is_authenticated(self) -> bool:
+        return self.auth is not None and self.auth.is_authenticated()
+    
+    def load_local(self) -> bool:
+        """
+        Restore settings from the local snapshot
+        
+        Returns:
+            True if a snapshot was loaded
+        """
+        if not self.local_storage_path or not self.local_storage_path.exists():
+            return False
+        
+        try:
+            with open(self.local_storage_path, 'r') as f:
+                snapshot = json.load(f)
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable settings snapshot: {e}")
+            return False
+        
+        caches = snapshot.get('cache', {})
+        synced = snapshot.get('synced', {})
+        with self._dirty_lock:
+            for section in SECTIONS:
+                if section in caches:
+                    setattr(self, f'{section}_cache', caches[section])
+                self._synced[section] = synced.get(section, {})
+            
+            self._dirty = {}
+            for section, patch in snapshot.get('pending', {}).items():
+                keys = dict(patch.get('set', {}))
+                keys.update({key: _DELETED for key in patch.get('unset', [])})
+                if keys:
+                    self._dirty[section] = keys
+            
+            self.profile = snapshot.get('profile')
+            self.settings_version = snapshot.get('settings_version')
+            self.profile_version = snapshot.get('profile_version')
+        
+        self.logger.info("Loaded settings from local snapshot")
+        return True
+    
+    def save_local(self):
+        """Atomically write the local snapshot"""
+        if not self.local_storage_path:
+            return
+        
+        with self._dirty_lock:
+            snapshot = {
+                'cache': {section: self._get_section(section) for section in SECTIONS},
+                'synced': self._synced,
+                'pending': self._build_patch(self._dirty),
+                'profile': self.profile,
+                'settings_version': self.settings_version,
+                'profile_version': self.profile_version
+            }
+            data = json.dumps(snapshot, separators=(',', ':'), default=str)
+        
+        tmp_path = self.local_storage_path.with_name(self.local_storage_path.name + '.tmp')
+        try:
+            with self._save_lock:
+                self.local_storage_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(tmp_path, 'w') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.local_storage_path)
+        except Exception as e:
+            self.logger.error(f"Error saving settings snapshot: {e}")
+    
+    def _sync_job(self):
+        """Pull then push; raises so the scheduler can back off"""
+        if not self._is_authenticated():
+            return
+        
+        self._retry_after = None
+        success, error = self.sync_from_cloud()
                     
-                    # Push any pending changes
-                    if self.pending_changes:
-                        self.sync_to_cloud()
-                
-                # Wait for next sync interval
-                time.sleep(self.sync_interval)
+        # Push any pending changes
+        if success and self.has_pending_changes():
+            success, error = self.sync_to_cloud()
                 
-            except Exception as e:
-                self.logger.error(f"Error in auto-sync loop: {e}")
-                time.sleep(60)  # Wait a minute before retrying
+        if not success:
+            if self._retry_after is not None:
+                raise RetryAfter(self._retry_after, error)
+            raise ConnectionError(error)
     
     def sync_to_cloud(self) -> Tuple[bool, Optional[str]]:
         """
-        Sync local settings to cloud
+        Push pending changes to cloud in a single batched call
         
         Returns:
             (success: bool, error_message: Optional[str])
         """
         try:
-            if not self.auth.is_authenticated():
+            if not self._is_authenticated():
                 return False, "User not authenticated"
             
-            # Sync preferences
-            if self.preferences_cache:
-                self.client.rpc('update_user_preferences', {
-                    'p_preferences': self.preferences_cache
-                }).execute()
-            
-            # Sync permissions
-            if self.permissions_cache:
-                self.client.rpc('update_user_permissions', {
-                    'p_permissions': self.permissions_cache
-                }).execute()
+            with self._dirty_lock:
+                changes = self._dirty
+                self._dirty = {}
             
-            # Sync flow config
-            if self.flow_config_cache:
-                self.client.rpc('update_flow_config', {
-                    'p_flow_config': self.flow_config_cache
-                }).execute()
+            if not changes:
+                return True, None
             
-            # Sync blocklist
-            if self.blocklist_cache:
-                self.client.rpc('update_blocklist', {
-                    'p_blocklist': self.blocklist_cache
-                }).execute()
-            
-            # Sync whitelist
-            if self.whitelist_cache:
-                self.client.rpc('update_whitelist', {
-                    'p_whitelist': self.whitelist_cache
+            try:
+                patch = self._build_patch(changes)
+                self.client.rpc('patch_user_settings', {
+                    'p_changes': {SETTINGS_KEYS.get(section, section): keys for section, keys in patch.items()}
                 }).execute()
+            except Exception:
+                self._requeue(changes)
+                raise
             
             self.last_sync_time = datetime.now()
-            self.pending_changes.clear()
+            self.save_local()
+            self._notify_pushed(changes)
             
-            self.logger.info("Settings synced to cloud")
+            self.logger.info(f"Settings synced to cloud ({', '.join(changes)})")
             return True, None
             
         except Exception as e:
             self.logger.error(f"Error syncing to cloud: {e}")
+            self._retry_after = retry_after_hint(e)
             return False, str(e)
     
+    def _notify_pushed(self, changes: Dict[str, Dict[str, Any]]):
+        """Report the pushed value of each section by settings key (e.g. to update read caches)"""
+        if not self.on_push:
+            return
+        for section in changes:
+            try:
+                self.on_push(SETTINGS_KEYS.get(section, section), copy.deepcopy(self._get_section(section)))
+            except Exception as e:
+                self.logger.error(f"Error in settings push callback for '{section}': {e}")
+    
+    def _build_patch(self, changes: Dict[str, Dict[str, Any]]) -> Dict:
+        """Turn dirty keys into {section: {'set': {...}, 'unset': [...]}}"""
+        patch = {}
+        for section, keys in changes.items():
+            patch[section] = {
+                'set': {k: v for k, v in keys.items() if v is not _DELETED},
+                'unset': [k for k, v in keys.items() if v is _DELETED]
+            }
+        return patch
+    
+    def _requeue(self, changes: Dict[str, Dict[str, Any]]):
+        """Put unsent changes back, keeping anything edited since"""
+        with self._dirty_lock:
+            for section, keys in changes.items():
+                merged = dict(keys)
+                merged.update(self._dirty.get(section, {}))
+                self._dirty[section] = merged
+    
+    def _mark_dirty(self, section: str, current: Optional[Dict]):
+        """Record which keys of a section differ from the last seen value"""
+        current = current or {}
+        with self._dirty_lock:
+            previous = self._synced[section]
+            pending = self._dirty.setdefault(section, {})
+            
+            for key in previous.keys() - current.keys():
+                pending[key] = _DELETED
+            for key, value in current.items():
+                if key not in previous or previous[key] != value:
+                    pending[key] = copy.deepcopy(value)
+            
+            if not pending:
+                del self._dirty[section]
+            self._synced[section] = copy.deepcopy(current)
+    
+    def _apply_local(self, section: str, sync: bool):
+        """Track a local edit to a section and push it if requested"""
+        self._mark_dirty(section, self._get_section(section))
+        self.save_local()
+        
+        if sync and self._is_authenticated():
+            self.sync_to_cloud()
+    
+    def _get_section(self, section: str) -> Optional[Dict]:
+        return getattr(self, f'{section}_cache')
+    
+    def has_pending_changes(self) -> bool:
+        """Check whether any local edits are waiting to be pushed"""
+        with self._dirty_lock:
+            return bool(self._dirty)
+    
+    @property
+    def pending_changes(self) -> Dict[str, Dict[str, Any]]:
+        """Pending changes by section, latest value per key (None = removed)"""
+        with self._dirty_lock:
+            return {
+                section: {k: (None if v is _DELETED else v) for k, v in keys.items()}
+                for section, keys in self._dirty.items()
+            }
+    
     def sync_from_cloud(self) -> Tuple[bool, Optional[str]]:
         """
-        Sync settings from cloud to local
+        Pull settings changed on the server since the last pull
         
         Returns:
             (success: bool, error_message: Optional[str])
         """
         try:
-            if not self.auth.is_authenticated():
+            if not self._is_authenticated():
                 return False, "User not authenticated"
             
-            # Get user profile with all settings
-            profile = self.auth.get_user_profile()
+            result = self.client.rpc('get_settings_since', {
+                'p_keys': [SETTINGS_KEYS.get(section, section) for section in SECTIONS],
+                'p_since': self.settings_version,
+                'p_profile_since': self.profile_version
+            }).execute()
+            rows = result.data or []
             
-            if not profile:
-                return False, "Could not fetch user profile"
+            self.last_sync_time = datetime.now()
             
-            # Update local cache
-            self.preferences_cache = profile.get('preferences', {})
-            self.permissions_cache = profile.get('permissions', {})
-            self.flow_config_cache = profile.get('flow_config')
-            self.blocklist_cache = profile.get('blocklist', {'domains': []})
-            self.whitelist_cache = profile.get('whitelist', {'domains': [], 'apps': []})
+            if not rows:
+                self.logger.debug("Settings not modified")
+                return True, None
             
-            self.last_sync_time = datetime.now()
+            changed = []
+            for row in rows:
+                key, value, version = row['key'], row['value'], row['updated_at']
+                if key == PROFILE_KEY:
+                    self.profile = value
+                    self.profile_version = version
+                    changed.append(key)
+                    continue
+                
+                section = SECTION_FOR_KEY.get(key, key)
+                if section in SECTIONS and self._apply_remote(section, value):
+                    changed.append(section)
+                if self.settings_version is None or version > self.settings_version:
+                    self.settings_version = version
+            
+            self.save_local()
+            for section in changed:
+                self._notify(section)
             
-            self.logger.info("Settings synced from cloud")
+            self.logger.info(f"Settings synced from cloud ({', '.join(changed) or 'no changes'})")
             return True, None
             
         except Exception as e:
             self.logger.error(f"Error syncing from cloud: {e}")
+            self._retry_after = retry_after_hint(e)
             return False, str(e)
     
+    def _apply_remote(self, section: str, value: Optional[Dict]) -> bool:
+        """
+        Make a pulled section the new baseline, keeping unsent local edits on top
+        
+        Returns True if the local value changed.
+        """
+        with self._dirty_lock:
+            before = self._get_section(section)
+            cache = copy.deepcopy(value) if value is not None else None
+            self._synced[section] = copy.deepcopy(cache or {})
+            
+            for key, pending in self._dirty.get(section, {}).items():
+                if cache is None:
+                    cache = {}
+                if pending is _DELETED:
+                    cache.pop(key, None)
+                    self._synced[section].pop(key, None)
+                else:
+                    cache[key] = copy.deepcopy(pending)
+                    self._synced[section][key] = copy.deepcopy(pending)
+            
+            setattr(self, f'{section}_cache', cache)
+            return cache != before
+    
+    def apply_remote(self, section: str, value: Optional[Dict]):
+        """Apply a section fetched outside sync_from_cloud, notifying if it changed"""
+        if self._apply_remote(section, value):
+            self.save_local()
+            self._notify(section)
+    
+    def _notify(self, section: str):
+        """Tell the listener a section changed on the server"""
+        if not self.on_change:
+            return
+        value = self.profile if section == PROFILE_KEY else self._get_section(section)
+        try:
+            self.on_change(section, copy.deepcopy(value))
+        except Exception as e:
+            self.logger.error(f"Error in settings change callback for '{section}': {e}")
+    
     def get_preference(self, key: str, default: Any = None) -> Any:
         """
         Get a preference value
@@ -178,18 +420,7 @@ class UserSettingsManager:
             sync: Whether to sync to cloud immediately
         """
         self.preferences_cache[key] = value
-        
-        if sync and self.auth.is_authenticated():
-            try:
-                self.client.rpc('update_user_preferences', {
-                    'p_preferences': self.preferences_cache
-                }).execute()
-                self.logger.info(f"Preference '{key}' synced to cloud")
-            except Exception as e:
-                self.logger.error(f"Error syncing preference: {e}")
-                self.pending_changes.append(('preference', key, value))
-        else:
-            self.pending_changes.append(('preference', key, value))
+        self._apply_local('preferences', sync)
     
     def get_all_preferences(self) -> Dict:
         """Get all preferences"""
@@ -208,18 +439,7 @@ class UserSettingsManager:
             sync: Whether to sync to cloud immediately
         """
         self.permissions_cache.update(permissions)
-        
-        if sync and self.auth.is_authenticated():
-            try:
-                self.client.rpc('update_user_permissions', {
-                    'p_permissions': self.permissions_cache
-                }).execute()
-                self.logger.info("Permissions synced to cloud")
-            except Exception as e:
-                self.logger.error(f"Error syncing permissions: {e}")
-                self.pending_changes.append(('permissions', None, permissions))
-        else:
-            self.pending_changes.append(('permissions', None, permissions))
+        self._apply_local('permissions', sync)
     
     def get_flow_config(self) -> Optional[Dict]:
         """Get flow detection config"""
@@ -234,18 +454,7 @@ class UserSettingsManager:
             sync: Whether to sync to cloud immediately
         """
         self.flow_config_cache = config
-        
-        if sync and self.auth.is_authenticated():
-            try:
-                self.client.rpc('update_flow_config', {
-                    'p_flow_config': config
-                }).execute()
-                self.logger.info("Flow config synced to cloud")
-            except Exception as e:
-                self.logger.error(f"Error syncing flow config: {e}")
-                self.pending_changes.append(('flow_config', None, config))
-        else:
-            self.pending_changes.append(('flow_config', None, config))
+        self._apply_local('flow_config', sync)
     
     def get_blocklist(self) -> Dict:
         """Get blocklist"""
@@ -260,18 +469,7 @@ class UserSettingsManager:
             sync: Whether to sync to cloud immediately
         """
         self.blocklist_cache = blocklist
-        
-        if sync and self.auth.is_authenticated():
-            try:
-                self.client.rpc('update_blocklist', {
-                    'p_blocklist': blocklist
-                }).execute()
-                self.logger.info("Blocklist synced to cloud")
-            except Exception as e:
-                self.logger.error(f"Error syncing blocklist: {e}")
-                self.pending_changes.append(('blocklist', None, blocklist))
-        else:
-            self.pending_changes.append(('blocklist', None, blocklist))
+        self._apply_local('blocklist', sync)
     
     def get_whitelist(self) -> Dict:
         """Get whitelist"""
@@ -286,18 +484,7 @@ class UserSettingsManager:
             sync: Whether to sync to cloud immediately
         """
         self.whitelist_cache = whitelist
-        
-        if sync and self.auth.is_authenticated():
-            try:
-                self.client.rpc('update_whitelist', {
-                    'p_whitelist': whitelist
-                }).execute()
-                self.logger.info("Whitelist synced to cloud")
-            except Exception as e:
-                self.logger.error(f"Error syncing whitelist: {e}")
-                self.pending_changes.append(('whitelist', None, whitelist))
-        else:
-            self.pending_changes.append(('whitelist', None, whitelist))
+        self._apply_local('whitelist', sync)
     
     def resolve_conflicts(self, local: Dict, remote: Dict) -> Dict:
         """
@@ -335,7 +522,7 @@ class UserSettingsManager:
         """
         return {
             'last_sync_time': self.last_sync_time,
-            'pending_changes': len(self.pending_changes),
+            'pending_changes': sum(len(keys) for keys in self.pending_changes.values()),
             'is_syncing': self.sync_running,
-            'is_authenticated': self.auth.is_authenticated()
+            'is_authenticated': self._is_authenticated()
         }
@@ -0,0 +1,169 @@
+"""
+Load test for cloud scheduling against a local stub server
+
+Simulates a fleet of agents that all start at the same moment (MDM push,
+wake from sleep) while the backend is briefly down, in virtual time, with
+every request sent to a stub HTTP server that sheds load with 429 +
+Retry-After. Compares the old fixed schedule with CloudScheduler's policy.
+
+    python -m agent.tests.load.scheduler_load --agents 5000
+"""
+
+import argparse
+import heapq
+import http.client
+import random
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+from agent.src.cloud_scheduler import CircuitBreaker, PeriodicJob
+
+
+class StubServer:
+    """Local HTTP server with a per-second capacity and an initial outage window"""
+    
+    def __init__(self, capacity_per_second: int = 50, outage_seconds: float = 60,
+                 retry_after: float = 30):
+        self.capacity_per_second = capacity_per_second
+        self.outage_seconds = outage_seconds
+        self.retry_after = retry_after
+        self.per_second = Counter()
+        self.statuses = Counter()
+        self._lock = threading.Lock()
+        
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def do_POST(self):
+                now = float(self.headers['X-Sim-Time'])
+                status, headers = stub.handle(now)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+            
+            def log_message(self, *args):
+                pass
+        
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+    
+    def handle(self, now: float):
+        with self._lock:
+            second = int(now)
+            self.per_second[second] += 1
+            if now < self.outage_seconds:
+                status = 503
+            elif self.per_second[second] > self.capacity_per_second:
+                status = 429
+            else:
+                status = 200
+            self.statuses[status] += 1
+        if status == 200:
+            return status, {}
+        return status, {'Retry-After': str(int(self.retry_after))}
+    
+    def reset(self):
+        with self._lock:
+            self.per_second.clear()
+            self.statuses.clear()
+    
+    def __enter__(self):
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _Clock:
+    now = 0.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+def _make_job(policy: str, interval: float, retry: float, clock: _Clock, rng: random.Random) -> PeriodicJob:
+    if policy == 'fixed':
+        # Previous behaviour: fixed period, fixed retry, no breaker, hints ignored
+        return PeriodicJob('sync', None, interval, jitter=0, initial_splay=0,
+                           backoff_base=retry, backoff_cap=retry,
+                           breaker=CircuitBreaker(failure_threshold=10 ** 9, clock=clock), rng=rng)
+    return PeriodicJob('sync', None, interval, backoff_base=retry,
+                       breaker=CircuitBreaker(clock=clock), rng=rng)
+
+
+def simulate(server: StubServer, agents: int, duration: float, policy: str = 'jittered',
+             interval: float = 300, retry: float = 60, seed: int = 1) -> Dict:
+    """Run the fleet in virtual time; every request is a real call to the stub"""
+    server.reset()
+    rng = random.Random(seed)
+    clock = _Clock()
+    jobs = [_make_job(policy, interval, retry, clock, rng) for _ in range(agents)]
+    queue = [(job.first_delay(), i) for i, job in enumerate(jobs)]
+    heapq.heapify(queue)
+    
+    conn = http.client.HTTPConnection('127.0.0.1', server.port)
+    try:
+        while queue:
+            at, i = heapq.heappop(queue)
+            if at >= duration:
+                break
+            clock.now = at
+            job = jobs[i]
+            
+            if not job.breaker.allow():
+                heapq.heappush(queue, (at + job.open_delay(), i))
+                continue
+            
+            conn.request('POST', '/rpc/sync', headers={'X-Sim-Time': repr(at)})
+            response = conn.getresponse()
+            response.read()
+            
+            if response.status == 200:
+                job.breaker.record_success()
+                delay = job.success_delay()
+            else:
+                job.breaker.record_failure()
+                hint = response.getheader('Retry-After')
+                delay = job.failure_delay(float(hint) if hint and policy != 'fixed' else None)
+                if job.breaker.state == CircuitBreaker.OPEN:
+                    delay = max(delay, job.open_delay())
+            heapq.heappush(queue, (at + delay, i))
+    finally:
+        conn.close()
+    
+    return {
+        'policy': policy,
+        'agents': agents,
+        'requests': sum(server.statuses.values()),
+        'ok': server.statuses[200],
+        'rejected': sum(count for status, count in server.statuses.items() if status != 200),
+        'peak_per_second': max(server.per_second.values()) if server.per_second else 0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--agents', type=int, default=5000)
+    parser.add_argument('--duration', type=float, default=1800)
+    parser.add_argument('--capacity', type=int, default=50)
+    parser.add_argument('--outage', type=float, default=120)
+    args = parser.parse_args()
+    
+    with StubServer(capacity_per_second=args.capacity, outage_seconds=args.outage) as server:
+        for policy in ('fixed', 'jittered'):
+            result = simulate(server, args.agents, args.duration, policy=policy)
+            print(f"{policy:>9}: {result['requests']} requests, {result['ok']} ok, "
+                  f"{result['rejected']} rejected, peak {result['peak_per_second']}/s")
+
+
+if __name__ == '__main__':
+    main()
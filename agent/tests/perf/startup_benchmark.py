@@ -0,0 +1,121 @@
+"""
+Start-up benchmark for the agent
+
+Runs each measurement in a fresh interpreter (with HOME pointed at a
+temporary directory so no real settings, stats or keychain are touched):
+
+- import cost of agent.src.agent from `python -X importtime`, with the
+  heaviest modules and which optional subsystems got loaded
+- wall-clock from interpreter start to "monitoring started", and the
+  process's peak RSS at that point
+
+    python -m agent.tests.perf.startup_benchmark --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+# Subsystems that should only load when used
+HEAVY_MODULES = ('supabase', 'gotrue', 'postgrest', 'httpx', 'flask', 'flask_cors', 'werkzeug',
+                 'keyring', 'tkinter')
+
+_STARTUP_SCRIPT = """
+import json, resource, sys, threading, time
+started = time.perf_counter()
+from agent.src.agent import FlowAgent
+imported = time.perf_counter()
+
+with open('agent/config.example.json') as f:
+    config = json.load(f)
+config['agent']['api_port'] = 0
+
+agent = FlowAgent(config)
+threading.Thread(target=agent.start, daemon=True).start()
+if not agent.startup.wait(['monitoring'], timeout=30):
+    sys.exit('monitoring never started')
+monitoring = time.perf_counter()
+
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'monitoring_started_ms': (monitoring - started) * 1000,
+    'phases': agent.startup.status(),
+    'max_rss_mb': rss / (1024 * 1024 if sys.platform == 'darwin' else 1024),
+    'loaded': sorted(m for m in %r if m in sys.modules)
+}))
+sys.stdout.flush()
+import os
+os._exit(0)
+""" % (HEAVY_MODULES,)
+
+
+def _run(args: List[str], home: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, HOME=home, PYTHONDONTWRITEBYTECODE='1')
+    return subprocess.run([sys.executable] + args, cwd=REPO_ROOT, env=env, stdin=subprocess.DEVNULL,
+                          capture_output=True, text=True, timeout=120, check=True)
+
+
+def measure_imports(module: str = 'agent.src.agent') -> Dict:
+    """Import a module in a fresh interpreter under -X importtime"""
+    with tempfile.TemporaryDirectory() as home:
+        result = _run(['-X', 'importtime', '-c', f"import {module}"], home)
+    
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, total, name = line.split('|')
+        try:
+            cumulative[name.strip()] = int(total) / 1000
+        except ValueError:
+            continue  # header line
+    
+    top_level = {name: ms for name, ms in cumulative.items() if '.' not in name}
+    return {
+        'total_ms': cumulative.get(module, 0.0),
+        'heaviest': sorted(top_level.items(), key=lambda item: -item[1])[:10],
+        'loaded': sorted(m for m in HEAVY_MODULES if m in cumulative)
+    }
+
+
+def measure_startup() -> Dict:
+    """Start a FlowAgent in a fresh interpreter and time it to monitoring started"""
+    with tempfile.TemporaryDirectory() as home:
+        result = _run(['-c', _STARTUP_SCRIPT], home)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    
+    imports = measure_imports()
+    print(f"import agent.src.agent: {imports['total_ms']:.0f} ms")
+    for name, ms in imports['heaviest']:
+        print(f"  {name:<24} {ms:8.1f} ms")
+    print(f"  heavy modules loaded: {', '.join(imports['loaded']) or 'none'}")
+    
+    runs = [measure_startup() for _ in range(args.runs)]
+    median = {key: statistics.median(run[key] for run in runs)
+              for key in ('import_ms', 'monitoring_started_ms', 'max_rss_mb')}
+    print(f"monitoring started: {median['monitoring_started_ms']:.0f} ms "
+          f"(imports {median['import_ms']:.0f} ms), peak RSS {median['max_rss_mb']:.1f} MB "
+          f"[median of {args.runs}]")
+    print(f"  heavy modules loaded: {', '.join(runs[-1]['loaded']) or 'none'}")
+    for name, phase in runs[-1]['phases'].items():
+        print(f"  {name:<24} {phase['state']:<8} +{phase['started_ms'] or 0:7.1f} ms "
+              f"took {phase['duration_ms'] or 0:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
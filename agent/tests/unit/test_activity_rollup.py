@@ -0,0 +1,73 @@
+"""
+Unit tests for per-minute activity rollups
+"""
+
+import unittest
+from agent.src.activity_rollup import ActivityRollup
+
+
+class FakeUploader:
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+    
+    def __call__(self, rows):
+        if self.fail:
+            return False
+        self.batches.append(list(rows))
+        return True
+
+
+class TestActivityRollup(unittest.TestCase):
+
+    def setUp(self):
+        self.uploader = FakeUploader()
+        self.rollup = ActivityRollup(upload=self.uploader, batch_size=2, max_pending=3)
+    
+    def tick(self, second, typing_rate=40, state='working', app='Xcode', idle=0.5):
+        self.rollup.record({'typing_rate': typing_rate, 'current_idle': idle}, state, app, 's1', 600 + second)
+    
+    def test_minute_row(self):
+        """Test a closed minute summarises its ticks"""
+        for second in range(60):
+            self.tick(second, typing_rate=30 if second < 30 else 50,
+                      state='in_flow' if second >= 15 else 'working',
+                      app='Safari' if second < 10 else 'Xcode', idle=second % 7)
+        self.rollup.add_app_switch(610)
+        self.rollup.add_app_switch(611)
+        self.assertEqual(self.rollup.pending(), 0)
+        
+        self.tick(60)
+        self.assertTrue(self.rollup.flush())
+        row = self.uploader.batches[0][0]
+        self.assertEqual(row['minute'], '1970-01-01T00:10:00+00:00')
+        self.assertEqual(row['typing_rate'], 40)
+        self.assertEqual(row['app_switches'], 2)
+        self.assertEqual(row['max_idle_gap'], 6)
+        self.assertEqual(row['flow_state'], 'in_flow')
+        self.assertEqual(row['flow_seconds'], 45)
+        self.assertEqual(row['top_app'], 'Xcode')
+        self.assertEqual(row['session_id'], 's1')
+        self.assertEqual(row['samples'], 60)
+    
+    def test_batches_retry_and_cap(self):
+        """Test failed uploads stay queued, oldest dropped past the cap"""
+        for minute in range(5):
+            self.tick(minute * 60)
+        self.uploader.fail = True
+        self.assertFalse(self.rollup.flush())
+        self.assertEqual(self.rollup.pending(), 3)
+        self.assertEqual(self.rollup.dropped, 1)
+        
+        self.tick(5 * 60)
+        self.uploader.fail = False
+        self.assertTrue(self.rollup.close())
+        self.assertEqual(self.rollup.dropped, 3)
+        self.assertEqual([len(batch) for batch in self.uploader.batches], [2, 1])
+        minutes = [row['minute'][11:16] for batch in self.uploader.batches for row in batch]
+        self.assertEqual(minutes, ['00:13', '00:14', '00:15'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+"""
+Unit tests for auth service token refresh and profile cache
+"""
+
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from agent.src.auth_service import AuthService
+
+
+class FakeResult:
+
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeRPC:
+
+    def __init__(self, client):
+        self.client = client
+    
+    def execute(self):
+        if self.client.during_fetch:
+            self.client.during_fetch()
+        self.client.profile_calls += 1
+        self.client.profile_fetched.set()
+        return FakeResult([{'id': 'u1', 'name': f"v{self.client.profile_calls}"}])
+
+
+class FakeGoTrue:
+
+    def __init__(self):
+        self.refreshes = 0
+    
+    def refresh_session(self, refresh_token):
+        self.refreshes += 1
+        return SimpleNamespace(session=make_session(f"access{self.refreshes}", 3600),
+                               user=SimpleNamespace(id='u1', email='a@b.c'))
+
+
+class FakeClient:
+
+    def __init__(self):
+        self.auth = FakeGoTrue()
+        self.profile_calls = 0
+        self.profile_fetched = threading.Event()
+        self.during_fetch = None
+    
+    def rpc(self, name):
+        return FakeRPC(self)
+
+
+class FakeScheduler:
+
+    def __init__(self):
+        self.jobs = {}
+    
+    def add_job(self, name, fn, interval, **options):
+        self.jobs[name] = fn
+    
+    def remove_job(self, name):
+        self.jobs.pop(name, None)
+
+
+class FakeKeyring:
+
+    def __init__(self):
+        self.store = {}
+        self.reads = 0
+        self.writes = 0
+    
+    def get_password(self, service, key):
+        self.reads += 1
+        return self.store.get(key)
+    
+    def set_password(self, service, key, value):
+        self.writes += 1
+        self.store[key] = value
+    
+    def delete_password(self, service, key):
+        self.store.pop(key, None)
+
+
+def make_session(access_token, expires_in):
+    return SimpleNamespace(access_token=access_token, refresh_token='refresh',
+                           expires_at=int(time.time() + expires_in))
+
+
+class TestAuthService(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        self.keyring = FakeKeyring()
+        self.scheduler = FakeScheduler()
+        patches = [
+            patch('agent.src.auth_service.supabase', SimpleNamespace(create_client=lambda *args, **kwargs: self.client)),
+            patch('agent.src.auth_service.keyring', self.keyring)
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        
+        self.auth = AuthService({'supabase': {'url': 'http://localhost', 'anon_key': 'anon'}},
+                                scheduler=self.scheduler)
+        self.assertTrue(self.auth.wait_until_restored(0))
+    
+    def sign_in(self, expires_in=3600):
+        self.auth._set_session(make_session('access0', expires_in),
+                               SimpleNamespace(id='u1', email='a@b.c'))
+        self.assertTrue(self.client.profile_fetched.wait(2))
+    
+    def wait_for_profile(self, name):
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            if (self.auth._profile or {}).get('name') == name:
+                return
+            time.sleep(0.01)
+        self.fail(f"profile never became {name}")
+    
+    def test_refresh_job_only_refreshes_near_expiry(self):
+        """Test the scheduled check leaves fresh tokens alone and renews expiring ones"""
+        self.sign_in(expires_in=3600)
+        job = self.scheduler.jobs['token_refresh']
+        
+        job()
+        self.assertEqual(self.client.auth.refreshes, 0)
+        
+        self.auth.session.expires_at = int(time.time() + 60)
+        job()
+        self.assertEqual(self.client.auth.refreshes, 1)
+        self.assertEqual(self.keyring.store['access_token'], 'access1')
+    
+    def test_keychain_read_once_and_unchanged_tokens_not_rewritten(self):
+        """Test credentials are mirrored in memory"""
+        reads = self.keyring.reads
+        self.auth._load_credentials()
+        self.auth._load_credentials()
+        self.assertEqual(self.keyring.reads, reads)
+        
+        self.sign_in()
+        writes = self.keyring.writes
+        self.auth._store_credentials('access0', 'refresh')
+        self.assertEqual(self.keyring.writes, writes)
+    
+    def test_profile_cached_and_served_stale(self):
+        """Test the profile is fetched once and refreshed in the background after expiry"""
+        self.sign_in()
+        self.assertEqual(self.auth.get_user_profile()['name'], 'v1')
+        self.assertEqual(self.auth.get_user_profile()['name'], 'v1')
+        self.assertEqual(self.client.profile_calls, 1)
+        
+        self.auth._profile_expires_at = 0
+        self.client.profile_fetched.clear()
+        self.assertEqual(self.auth.get_user_profile()['name'], 'v1')
+        self.assertTrue(self.client.profile_fetched.wait(2))
+        
+        self.wait_for_profile('v2')
+        
+        # Invalidation keeps serving the cached copy while it refetches
+        self.auth.invalidate_profile()
+        self.assertEqual(self.auth.get_user_profile()['name'], 'v2')
+        self.wait_for_profile('v3')
+    
+    def test_update_is_served_at_once_and_refetched(self):
+        """Test an update is merged into the cached profile without an inline fetch"""
+        self.sign_in()
+        self.wait_for_profile('v1')
+        self.client.auth.update_user = lambda attributes: None
+        self.client.table = MagicMock()
+        gate = threading.Event()
+        self.client.during_fetch = lambda: gate.wait(2)
+        
+        success, _ = self.auth.update_user_profile({'full_name': 'Ada'})
+        self.assertTrue(success)
+        profile = self.auth.get_user_profile()
+        self.assertEqual((profile['name'], profile['full_name']), ('v1', 'Ada'))
+        self.assertEqual(self.client.profile_calls, 1)
+        
+        gate.set()
+        self.wait_for_profile('v2')
+    
+    def test_fetch_started_before_invalidation_is_dropped(self):
+        """Test a fetch still in flight at sign-out does not refill the cache"""
+        self.sign_in()
+        self.wait_for_profile('v1')
+        self.client.during_fetch = self.auth.clear_profile
+        
+        self.assertIsNone(self.auth._fetch_profile())
+        self.assertIsNone(self.auth._profile)
+    
+    def test_sign_out_stops_refresh(self):
+        """Test signing out removes the refresh job and cached profile"""
+        self.sign_in()
+        self.client.auth.sign_out = lambda: None
+        self.auth.sign_out()
+        
+        self.assertNotIn('token_refresh', self.scheduler.jobs)
+        self.assertIsNone(self.auth._profile)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Unit tests for cloud scheduler
+"""
+
+import random
+import threading
+import unittest
+from agent.src.cloud_scheduler import CircuitBreaker, CloudScheduler, PeriodicJob, RetryAfter
+from agent.src.timer_wheel import TimerWheel
+from agent.tests.load.scheduler_load import StubServer, simulate
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_and_half_opens(self):
+        """Test the breaker opens after the threshold and allows one trial later"""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=100, clock=clock)
+        for _ in range(3):
+            self.assertTrue(breaker.allow())
+            breaker.record_failure()
+        
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.remaining(), 100)
+        
+        clock.now = 100
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        
+        # Failed trial re-opens immediately
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        
+        clock.now = 200
+        breaker.allow()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+class TestPeriodicJob(unittest.TestCase):
+
+    def setUp(self):
+        self.job = PeriodicJob('sync', None, interval=300, jitter=0.1, backoff_base=60,
+                               backoff_cap=3600, rng=random.Random(7))
+    
+    def test_success_delay_is_jittered(self):
+        """Test successful runs are spread around the interval"""
+        delays = [self.job.success_delay() for _ in range(200)]
+        self.assertTrue(all(270 <= d <= 330 for d in delays))
+        self.assertGreater(len(set(delays)), 100)
+    
+    def test_decorrelated_backoff(self):
+        """Test failure delays grow within [base, 3 * previous] and stay capped"""
+        previous = 60
+        for _ in range(20):
+            delay = self.job.failure_delay()
+            self.assertGreaterEqual(delay, 60)
+            self.assertLessEqual(delay, min(3600, previous * 3))
+            previous = delay
+        
+        self.job.success_delay()
+        self.assertLessEqual(self.job.failure_delay(), 180)
+    
+    def test_retry_after_is_a_floor(self):
+        """Test a server hint is never undercut"""
+        delay = self.job.failure_delay(retry_after=900)
+        self.assertGreaterEqual(delay, 900)
+        self.assertLessEqual(delay, 990)
+
+
+class TestCloudScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.wheel = TimerWheel(tick_seconds=0.005)
+        self.wheel.start()
+        self.scheduler = CloudScheduler(self.wheel)
+    
+    def tearDown(self):
+        self.scheduler.stop()
+        self.wheel.stop()
+    
+    def test_backs_off_then_recovers(self):
+        """Test a failing job is retried with backoff and resumes its interval"""
+        outcomes = [RetryAfter(0.05), False, True]
+        calls = []
+        done = threading.Event()
+        
+        def job():
+            calls.append(len(calls))
+            outcome = outcomes.pop(0) if outcomes else True
+            if len(calls) == 3:
+                done.set()
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        
+        job_state = self.scheduler.add_job('test', job, interval=10, run_immediately=True,
+                                           backoff_base=0.01, backoff_cap=0.05)
+        
+        self.assertTrue(done.wait(2))
+        self.assertEqual(job_state.consecutive_failures, 0)
+        self.assertEqual(job_state.breaker.state, CircuitBreaker.CLOSED)
+        self.assertGreater(job_state.timer.remaining(), 8)
+    
+    def test_remove_job_stops_it(self):
+        """Test removed jobs never run"""
+        calls = []
+        self.scheduler.add_job('test', lambda: calls.append(1), interval=0.02, initial_splay=0)
+        self.scheduler.remove_job('test')
+        
+        threading.Event().wait(0.1)
+        self.assertEqual(calls, [])
+        self.assertEqual(self.scheduler.status(), {})
+
+
+class TestFleetLoad(unittest.TestCase):
+
+    def test_fleet_spreads_load_after_outage(self):
+        """Test agents started together do not hammer the stub server in lockstep"""
+        with StubServer(capacity_per_second=10, outage_seconds=60, retry_after=30) as server:
+            fixed = simulate(server, agents=300, duration=600, policy='fixed')
+            jittered = simulate(server, agents=300, duration=600, policy='jittered')
+        
+        self.assertEqual(fixed['peak_per_second'], 300)
+        self.assertLess(jittered['peak_per_second'], 40)
+        self.assertLess(jittered['requests'], fixed['requests'] / 2)
+        self.assertGreater(jittered['ok'], fixed['ok'])
+
+
+if __name__ == '__main__':
+    unittest.main()
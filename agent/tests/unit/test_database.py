@@ -0,0 +1,161 @@
+"""
+Unit tests for database client settings cache
+"""
+
+import unittest
+from agent.src.database import DatabaseClient
+
+
+class FakeResult:
+
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.filters = {}
+    
+    def select(self, columns):
+        return self
+    
+    def in_(self, column, values):
+        self.filters[column] = list(values)
+        return self
+    
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+    
+    def execute(self):
+        self.client.queries.append(self.filters)
+        rows = [
+            {'key': row['key'], 'value': row['value']}
+            for row in self.client.rows
+            if row['key'] in self.filters.get('key', [])
+            and ('user_id' not in self.filters or row['user_id'] == self.filters['user_id'])
+        ]
+        return FakeResult(rows)
+
+
+class FakeRPC:
+
+    def __init__(self, client, params):
+        self.client = client
+        self.params = params
+    
+    def execute(self):
+        if 'p_key' not in self.params:
+            return FakeResult(len(self.params.get('p_rows', [])))
+        for row in self.client.rows:
+            if row['user_id'] == self.params['p_user_id'] and row['key'] == self.params['p_key']:
+                row['value'] = self.params['p_value']
+        return FakeResult(None)
+
+
+class FakeSupabase:
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+        self.rpcs = []
+    
+    def table(self, name):
+        return FakeQuery(self, name)
+    
+    def rpc(self, name, params):
+        self.rpcs.append((name, params))
+        return FakeRPC(self, params)
+
+
+class TestSettingsCache(unittest.TestCase):
+
+    def setUp(self):
+        self.supabase = FakeSupabase([
+            {'user_id': 'u1', 'key': 'flow_detection', 'value': {'min_typing_rate': 30}},
+            {'user_id': 'u1', 'key': 'blocklist', 'value': {'domains': ['a.com']}},
+            {'user_id': 'u2', 'key': 'blocklist', 'value': {'domains': ['other.com']}}
+        ])
+        self.db = DatabaseClient({})
+        self.db.client = self.supabase
+        self.db.connected = True
+    
+    def test_many_keys_in_one_query_for_user(self):
+        """Test several keys are fetched together and filtered by user"""
+        settings = self.db.get_settings_many(['flow_detection', 'blocklist'], 'u1')
+        
+        self.assertEqual(settings, {
+            'flow_detection': {'min_typing_rate': 30},
+            'blocklist': {'domains': ['a.com']}
+        })
+        self.assertEqual(len(self.supabase.queries), 1)
+        self.assertEqual(self.supabase.queries[0]['user_id'], 'u1')
+    
+    def test_no_user_reads_nothing(self):
+        """Test reads without a user never run an unfiltered query"""
+        self.assertEqual(self.db.get_settings_many(['blocklist'], None), {})
+        self.assertIsNone(self.db.get_settings('blocklist'))
+        self.assertEqual(self.supabase.queries, [])
+    
+    def test_cached_reads_skip_the_network(self):
+        """Test fresh cache entries, including missing keys, need no query"""
+        self.db.get_settings_many(['blocklist', 'missing'], 'u1')
+        self.assertEqual(self.db.get_settings('blocklist', 'u1'), {'domains': ['a.com']})
+        self.assertIsNone(self.db.get_settings('missing', 'u1'))
+        self.assertEqual(len(self.supabase.queries), 1)
+        
+        # Only the uncached key is queried
+        self.db.get_settings_many(['blocklist', 'flow_detection'], 'u1')
+        self.assertEqual(self.supabase.queries[1]['key'], ['flow_detection'])
+    
+    def test_ttl_expiry(self):
+        """Test expired entries are fetched again"""
+        self.db.settings_ttl = 0
+        self.db.get_settings('blocklist', 'u1')
+        self.db.get_settings('blocklist', 'u1')
+        self.assertEqual(len(self.supabase.queries), 2)
+    
+    def test_upsert_invalidates(self):
+        """Test writing a setting drops its cached value"""
+        self.db.get_settings('blocklist', 'u1')
+        self.db.upsert_setting('u1', 'blocklist', {'domains': ['b.com']})
+        
+        self.assertEqual(self.db.get_settings('blocklist', 'u1'), {'domains': ['b.com']})
+        self.assertEqual(len(self.supabase.queries), 2)
+    
+    def test_written_through_value_is_read_back(self):
+        """Test a value edited outside upsert_setting replaces the cached one"""
+        self.db.get_settings('blocklist', 'u1')
+        self.db.cache_setting('blocklist', {'domains': ['edited.com']}, 'u1')
+        
+        self.assertEqual(self.db.get_settings('blocklist', 'u1'), {'domains': ['edited.com']})
+        self.assertEqual(self.db.get_settings('blocklist', 'u2'), {'domains': ['other.com']})
+        self.assertEqual(len(self.supabase.queries), 2)
+
+
+
+class TestActivityUpload(unittest.TestCase):
+
+    def setUp(self):
+        self.supabase = FakeSupabase([])
+        self.db = DatabaseClient({})
+        self.db.client = self.supabase
+        self.db.connected = True
+    
+    def test_rows_are_sent_for_the_user(self):
+        """Test the batch names its user (auth.uid() is unset with the service key)"""
+        rows = [{'minute': '2025-12-01T09:00:00+00:00', 'typing_rate': 40}]
+        self.assertTrue(self.db.upload_activity_minutes(rows, 'u1'))
+        self.assertEqual(self.supabase.rpcs, [('upsert_activity_minutes', {'p_user_id': 'u1', 'p_rows': rows})])
+    
+    def test_no_user_keeps_the_batch(self):
+        """Test a batch without a user is not sent and reported as not stored"""
+        self.assertFalse(self.db.upload_activity_minutes([{'minute': 'x'}], None))
+        self.assertEqual(self.supabase.rpcs, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
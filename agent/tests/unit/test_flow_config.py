@@ -0,0 +1,211 @@
+"""
+Unit tests for compiled flow config and hot reload
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from agent.src.flow_config import (
+    CompiledFlowConfig, FlowConfigError, FlowConfigWatcher, compile_flow_config, register_detector
+)
+from agent.src.flow_engine import FlowRuleEngine, FlowState
+
+
+CONFIG = {
+    'entry': {'typing_rate_min': 10, 'app_switches_max': 2, 'max_idle_gap_seconds': 4, 'window_seconds': 0},
+    'exit': {'typing_rate_min': 5, 'app_switches_max': 5, 'max_idle_gap_seconds': 6, 'delay_seconds': 0}
+}
+
+
+def metrics(typing_rate=20, app_switch_count=0, max_idle_gap=1):
+    return {'typing_rate': typing_rate, 'app_switch_count': app_switch_count, 'max_idle_gap': max_idle_gap}
+
+
+class TestCompiledFlowConfig(unittest.TestCase):
+
+    def test_predicates_follow_thresholds(self):
+        """Test the generated predicates match the configured thresholds"""
+        config = compile_flow_config(CONFIG)
+        
+        self.assertTrue(config.entry_met(metrics(typing_rate=10)))
+        self.assertFalse(config.entry_met(metrics(typing_rate=9.9)))
+        self.assertFalse(config.entry_met(metrics(app_switch_count=3)))
+        
+        self.assertIsNone(config.exit_reason(metrics()))
+        self.assertEqual(config.exit_reason(metrics(typing_rate=1, max_idle_gap=10)), 'low_typing_rate')
+        self.assertEqual(config.exit_reason(metrics(app_switch_count=6)), 'excessive_app_switches')
+        self.assertEqual(config.exit_reason(metrics(max_idle_gap=7)), 'idle')
+    
+    def test_defaults_filled_and_frozen(self):
+        """Test missing thresholds get defaults and the object cannot be changed"""
+        config = compile_flow_config({})
+        self.assertEqual(config.window_seconds, 300)
+        self.assertEqual(config.as_dict()['exit']['delay_seconds'], 30)
+        
+        with self.assertRaises(AttributeError):
+            config.window_seconds = 1
+        config.as_dict()['entry']['typing_rate_min'] = 0
+        self.assertEqual(config.entry['typing_rate_min'], 40)
+    
+    def test_invalid_configs_rejected(self):
+        """Test bad types and out-of-range values are rejected"""
+        bad = [
+            [],
+            {'entry': 'fast'},
+            {'entry': {'typing_rate_min': 'forty'}},
+            {'entry': {'typing_rate_min': True}},
+            {'exit': {'delay_seconds': -1}},
+            {'entry': {'max_idle_gap_seconds': float('nan')}}
+        ]
+        for raw in bad:
+            with self.assertRaises(FlowConfigError, msg=raw):
+                CompiledFlowConfig(raw)
+    
+    def test_entry_only_edit_compiles(self):
+        """Test an entry edit is accepted against the default exit thresholds"""
+        config = compile_flow_config({'entry': {'app_switches_max': 4, 'typing_rate_min': 20}})
+        self.assertEqual(config.entry['app_switches_max'], 4)
+        self.assertEqual(config.exit['app_switches_max'], 2)
+        self.assertEqual(config.exit['typing_rate_min'], 30)
+
+
+class TestDetectorProfiles(unittest.TestCase):
+
+    def test_weighted_detectors(self):
+        """Test extra detectors add weighted score and the minimum decides entry"""
+        config = compile_flow_config({
+            **CONFIG,
+            'detectors': [
+                {'name': 'steady', 'metric': 'typing_rate_10s', 'op': '>=', 'value': 30, 'weight': 2},
+                {'name': 'mouse_storm', 'metric': 'clicks', 'op': '>', 'value': 50, 'phase': 'exit', 'weight': 0.5}
+            ],
+            'entry_score_min': 4,
+            'exit_score_min': 1
+        })
+        profile = config.active
+        
+        self.assertEqual(profile.score(metrics()), (3.0, 0.0, None))
+        self.assertTrue(config.entry_met({**metrics(typing_rate=5), 'typing_rate_10s': 40}))
+        self.assertFalse(config.entry_met(metrics()))
+        
+        # Half-weight exit signal alone is not enough; missing metrics never match
+        self.assertIsNone(config.exit_reason({**metrics(), 'clicks': 60}))
+        self.assertEqual(config.exit_reason({**metrics(max_idle_gap=9), 'clicks': 60}), 'idle')
+    
+    def test_profiles_and_app_overrides(self):
+        """Test the active profile and per-app overrides are merged over the base"""
+        config = compile_flow_config({
+            **CONFIG,
+            'profiles': {'deep': {'entry': {'typing_rate_min': 60}}},
+            'profile': 'deep',
+            'app_overrides': {'Figma': {'entry': {'typing_rate_min': 0}, 'exit': {'typing_rate_min': 0}}, 'Terminal': 'default'}
+        })
+        
+        self.assertEqual(config.entry['typing_rate_min'], 60)
+        self.assertEqual(config.for_app('Figma').entry['typing_rate_min'], 0)
+        self.assertEqual(config.for_app('Figma').exit['delay_seconds'], 0)
+        self.assertTrue(config.for_app('Figma').entry_met(metrics(typing_rate=0)))
+        self.assertEqual(config.for_app('Terminal').entry['typing_rate_min'], 10)
+        self.assertIs(config.for_app('Safari'), config.active)
+        
+        with self.assertRaises(FlowConfigError):
+            compile_flow_config({'profile': 'missing'})
+        with self.assertRaises(FlowConfigError):
+            compile_flow_config({'app_overrides': {'Figma': 'missing'}})
+    
+    def test_app_override_lowers_entry_only(self):
+        """Test an override lowering one entry threshold keeps the inherited exit values"""
+        config = compile_flow_config({'app_overrides': {'Figma': {'entry': {'typing_rate_min': 10}}}})
+        figma = config.for_app('Figma')
+        
+        self.assertEqual(figma.entry['typing_rate_min'], 10)
+        self.assertEqual(figma.exit['typing_rate_min'], 30)
+        self.assertTrue(figma.entry_met(metrics(typing_rate=15)))
+        self.assertFalse(config.entry_met(metrics(typing_rate=15)))
+    
+    def test_registered_detector(self):
+        """Test Python detectors plug in by name and scale their weight"""
+        register_detector('half', lambda m: 0.5)
+        config = compile_flow_config({'detectors': [{'detector': 'half', 'weight': 2}]})
+        self.assertEqual(config.active.score(metrics(typing_rate=100))[0], 4.0)
+        
+        with self.assertRaises(FlowConfigError):
+            compile_flow_config({'detectors': [{'detector': 'nope'}]})
+        with self.assertRaises(FlowConfigError):
+            compile_flow_config({'detectors': [{'metric': 'x', 'op': '==', 'value': 1}]})
+
+
+class TestEngineConfigSwap(unittest.TestCase):
+
+    def test_engine_uses_compiled_config(self):
+        """Test flow is entered and left with reasons from the compiled config"""
+        changes = []
+        engine = FlowRuleEngine(CONFIG, on_flow_change=lambda old, new, reason: changes.append((new, reason)))
+        
+        engine.evaluate(metrics())
+        self.assertEqual(engine.evaluate(metrics()), FlowState.IN_FLOW)
+        engine.evaluate(metrics(app_switch_count=9))
+        self.assertEqual(engine.evaluate(metrics(app_switch_count=9)), FlowState.WORKING)
+        self.assertEqual(changes[-1], (FlowState.WORKING, 'excessive_app_switches'))
+    
+    def test_engine_uses_foreground_app_profile(self):
+        """Test the foreground app's override decides entry"""
+        engine = FlowRuleEngine({**CONFIG, 'app_overrides': {'Figma': {'entry': {'typing_rate_min': 0}, 'exit': {'typing_rate_min': 0}}}})
+        
+        self.assertEqual(engine.evaluate(metrics(typing_rate=0), app='Xcode'), FlowState.IDLE)
+        engine.evaluate(metrics(typing_rate=0), app='Figma')
+        self.assertEqual(engine.evaluate(metrics(typing_rate=0), app='Figma'), FlowState.IN_FLOW)
+        self.assertEqual(engine.last_scores[0], 'default:Figma')
+    
+    def test_bad_config_keeps_current(self):
+        """Test a rejected config never replaces the running one"""
+        engine = FlowRuleEngine(CONFIG)
+        current = engine.compiled_config
+        
+        with self.assertRaises(FlowConfigError):
+            engine.config = {'entry': {'typing_rate_min': -5}}
+        self.assertIs(engine.compiled_config, current)
+        
+        engine.config = {'entry': {'typing_rate_min': 50}}
+        self.assertEqual(engine.config['entry']['typing_rate_min'], 50)
+
+
+class TestFlowConfigWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'flow_config.json'
+        self.applied = []
+        self.watcher = FlowConfigWatcher(self.path, on_change=self.applied.append)
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def write(self, content, mtime):
+        self.path.write_text(content)
+        os.utime(self.path, (mtime, mtime))
+    
+    def test_reloads_only_valid_changes(self):
+        """Test the file is compiled on change and an invalid edit is ignored"""
+        self.assertFalse(self.watcher.check())
+        
+        self.write(json.dumps(CONFIG), 1000)
+        self.assertTrue(self.watcher.check())
+        self.assertFalse(self.watcher.check())
+        self.assertEqual(self.applied[-1].window_seconds, 0)
+        
+        self.write('{"entry": ', 2000)
+        self.assertFalse(self.watcher.check())
+        self.write(json.dumps({'exit': {'delay_seconds': 'soon'}}), 3000)
+        self.assertFalse(self.watcher.check())
+        self.assertEqual(len(self.applied), 1)
+        
+        self.write(json.dumps({'entry': {'window_seconds': 60}}), 4000)
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(self.applied[-1].window_seconds, 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
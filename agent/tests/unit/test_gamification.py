@@ -2,10 +2,14 @@
 Unit tests for gamification system
 """
 
+import json
 import unittest
 import tempfile
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from agent.src.gamification import GamificationSystem, UserStats
+from agent.src.session_history import SessionHistoryStore
+from agent.src.stats_store import StatsStore
 
 
 class TestGamificationSystem(unittest.TestCase):
@@ -19,8 +23,13 @@ class TestGamificationSystem(unittest.TestCase):
         self.system = GamificationSystem(stats_file=self.temp_path)
     
     def tearDown(self):
-        if self.temp_path.exists():
-            self.temp_path.unlink()
+        self.system.flush()
+        self.system.history.close()
+        history_path = self.system.history.db_path
+        for path in (self.temp_path, self.system.store.journal_path, history_path,
+                     Path(str(history_path) + '-wal'), Path(str(history_path) + '-shm')):
+            if path.exists():
+                path.unlink()
     
     def test_initial_stats(self):
         """Test initial stats are correct"""
@@ -67,10 +76,36 @@ class TestGamificationSystem(unittest.TestCase):
         # Should be 5% more than 25 = 26.25 = 26
         self.assertEqual(goal, 26)
     
+    def test_progressive_goal_uses_last_ten_sessions(self):
+        """Test the goal follows recent sessions, not the lifetime average"""
+        for _ in range(10):
+            self.system.add_flow_session(10)
+        for _ in range(10):
+            self.system.add_flow_session(40)
+        
+        # Overall average is 25, last 10 average is 40
+        self.assertEqual(self.system.get_current_goal(), 42)
+    
+    def test_streak_from_session_history(self):
+        """Test sessions on consecutive days build the streak"""
+        today = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        for days_ago in (2, 1, 0):
+            start = (today - timedelta(days=days_ago)).timestamp()
+            self.system.add_flow_session(30, start_time=start, end_time=start + 1800)
+        
+        self.assertEqual(self.system.stats.consistency, 3)
+        self.assertEqual(self.system.stats.best_streak, 3)
+        self.assertEqual(len(self.system.get_heatmap(7)), 3)
+        
+        # The daily check must not count today again
+        self.system.update_streak()
+        self.assertEqual(self.system.stats.consistency, 3)
+    
     def test_stats_persistence(self):
         """Test stats are saved and loaded"""
         self.system.add_flow_session(30)
         self.system.add_resilience(5)
+        self.system.flush()
         
         # Create new system with same file
         new_system = GamificationSystem(stats_file=self.temp_path)
@@ -92,5 +127,158 @@ class TestGamificationSystem(unittest.TestCase):
         self.assertEqual(summary['resilience']['rank'], 'Gold')
 
 
+class TestSessionHistoryStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = SessionHistoryStore(Path(self.temp_dir.name) / 'sessions.db')
+        self.today = date(2026, 3, 10)
+    
+    def tearDown(self):
+        self.store.close()
+        self.temp_dir.cleanup()
+    
+    def _add(self, day: date, minutes: float, hour: int = 9):
+        start = datetime(day.year, day.month, day.day, hour).timestamp()
+        self.store.add_session(start, start + minutes * 60, minutes)
+    
+    def test_daily_rollups(self):
+        """Test sessions on the same day fold into one rollup row"""
+        self._add(self.today, 20, hour=9)
+        self._add(self.today, 45, hour=14)
+        
+        rollups = self.store.daily_rollups(self.today, self.today)
+        self.assertEqual(rollups, [
+            {'day': '2026-03-10', 'sessions': 2, 'total_minutes': 65, 'best_minutes': 45}
+        ])
+        self.assertEqual(self.store.personal_best(), 45)
+    
+    def test_streaks(self):
+        """Test streak lengths across a missed day"""
+        for days_ago in (6, 5, 4, 2, 1):
+            self._add(self.today - timedelta(days=days_ago), 30)
+        
+        self.assertEqual(self.store.best_streak(), 3)
+        # Yesterday's streak stays alive until today ends
+        self.assertEqual(self.store.current_streak(self.today), 2)
+        self.assertEqual(self.store.current_streak(self.today + timedelta(days=1)), 0)
+    
+    def test_backfilled_day_extends_later_streaks(self):
+        """Test a session recorded late for a missed day joins the runs around it"""
+        for days_ago in (6, 5, 4, 2, 1):
+            self._add(self.today - timedelta(days=days_ago), 30)
+        self._add(self.today - timedelta(days=3), 30)
+        
+        self.assertEqual(self.store.current_streak(self.today), 6)
+        self.assertEqual(self.store.best_streak(), 6)
+    
+    def test_stored_streaks_repaired_on_open(self):
+        """Test streaks left stale by earlier versions are renumbered when opened"""
+        for days_ago in (3, 2, 1):
+            self._add(self.today - timedelta(days=days_ago), 30)
+        with self.store._conn:
+            self.store._conn.execute('UPDATE daily_rollups SET streak = 1')
+        self.store.close()
+        
+        self.store = SessionHistoryStore(Path(self.temp_dir.name) / 'sessions.db')
+        self.assertEqual(self.store.current_streak(self.today), 3)
+    
+    def test_duplicate_session_ignored(self):
+        """Test re-recording the same session does not double count"""
+        self._add(self.today, 30)
+        self._add(self.today, 30)
+        
+        self.assertEqual(self.store.count(), 1)
+        self.assertEqual(self.store.daily_rollups(self.today, self.today)[0]['sessions'], 1)
+    
+    def test_average_of_last(self):
+        """Test the last-N average only looks at the newest sessions"""
+        self.assertIsNone(self.store.average_of_last(10))
+        for hour, minutes in enumerate((10, 20, 30, 40), start=8):
+            self._add(self.today, minutes, hour=hour)
+        
+        self.assertEqual(self.store.average_of_last(2), 35)
+
+
+
+class TestStatsStore(unittest.TestCase):
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / 'user_stats.json'
+        self.store = StatsStore(self.path, compact_every=3)
+        self.store.load()
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_journal_appends_only_changed_keys(self):
+        """Test each flush appends one compact delta line"""
+        self.store.record({'stamina': 10, 'level': 1})
+        self.store.flush()
+        self.store.record({'stamina': 20, 'level': 1})
+        self.store.flush()
+        
+        lines = self.store.journal_path.read_text().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[1])['d'], {'stamina': 20})
+        self.assertFalse(self.path.exists())
+    
+    def test_records_are_coalesced_until_flush(self):
+        """Test repeated records collapse into one journal entry"""
+        for stamina in range(5):
+            self.store.record({'stamina': stamina})
+        self.store.flush()
+        
+        lines = self.store.journal_path.read_text().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['d'], {'stamina': 4})
+    
+    def test_compaction_writes_snapshot_and_truncates_journal(self):
+        """Test compaction folds the journal into the snapshot"""
+        for stamina in (1, 2, 3):
+            self.store.record({'stamina': stamina})
+            self.store.flush()
+        
+        self.assertEqual(self.store.journal_path.read_text(), '')
+        self.assertEqual(json.loads(self.path.read_text())['stamina'], 3)
+        self.assertEqual(StatsStore(self.path).load(), {'stamina': 3})
+    
+    def test_replay_ignores_torn_journal_line(self):
+        """Test a crash mid-append loses only the torn entry"""
+        self.store.record({'stamina': 5})
+        self.store.flush()
+        with open(self.store.journal_path, 'a') as f:
+            f.write('{"s":2,"d":{"stam')
+        
+        self.assertEqual(StatsStore(self.path).load(), {'stamina': 5})
+    
+    def test_appends_after_torn_line_survive_reload(self):
+        """Test the torn tail is cut on load so later entries replay"""
+        self.store.record({'stamina': 5})
+        self.store.flush()
+        with open(self.store.journal_path, 'a') as f:
+            f.write('{"s":2,"d":{"stam')
+        
+        reopened = StatsStore(self.path, compact_every=100)
+        self.assertEqual(reopened.load(), {'stamina': 5})
+        reopened.record({'stamina': 6, 'level': 2})
+        reopened.flush()
+        reopened.record({'stamina': 7, 'level': 2})
+        reopened.flush()
+        
+        self.assertEqual(StatsStore(self.path).load(), {'stamina': 7, 'level': 2})
+        self.assertEqual(len(self.store.journal_path.read_text().splitlines()), 3)
+    
+    def test_replay_skips_entries_already_in_snapshot(self):
+        """Test journal entries older than the snapshot are not re-applied"""
+        self.store.record({'stamina': 5})
+        self.store.compact()
+        with open(self.store.journal_path, 'a') as f:
+            f.write('{"s":1,"d":{"stamina":1}}\n')
+        
+        self.assertEqual(StatsStore(self.path).load(), {'stamina': 5})
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,83 @@
+"""
+Unit tests for the instrumentation registry
+"""
+
+import unittest
+from agent.src.instrumentation import MetricsRegistry, get_registry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+    
+    def test_counter_per_label(self):
+        """Test counters keep one value per label set"""
+        events = self.registry.counter('events_total', 'Events', ['type'])
+        events.inc(type='keystroke')
+        events.inc(type='keystroke')
+        events.inc(3, type='app_switch')
+        
+        self.assertEqual(events.value(type='keystroke'), 2)
+        text = self.registry.render()
+        self.assertIn('# TYPE events_total counter', text)
+        self.assertIn('events_total{type="keystroke"} 2', text)
+        self.assertIn('events_total{type="app_switch"} 3', text)
+    
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram output has cumulative buckets, sum and count"""
+        latency = self.registry.histogram('call_seconds', 'Latency', ['call'], buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            latency.observe(value, call='end_session')
+        
+        lines = self.registry.render().splitlines()
+        self.assertIn('call_seconds_bucket{call="end_session",le="0.1"} 1', lines)
+        self.assertIn('call_seconds_bucket{call="end_session",le="1"} 3', lines)
+        self.assertIn('call_seconds_bucket{call="end_session",le="+Inf"} 4', lines)
+        self.assertIn('call_seconds_sum{call="end_session"} 4.25', lines)
+        self.assertIn('call_seconds_count{call="end_session"} 4', lines)
+    
+    def test_histogram_timer(self):
+        """Test time() observes even when the block raises"""
+        latency = self.registry.histogram('tick_seconds', 'Tick')
+        with latency.time():
+            pass
+        with self.assertRaises(RuntimeError):
+            with latency.time():
+                raise RuntimeError("boom")
+        self.assertEqual(latency.count(), 2)
+    
+    def test_gauge_functions(self):
+        """Test gauge callbacks are read at render time and failures are skipped"""
+        depth = self.registry.gauge('queue_depth', 'Depth', ['queue'])
+        items = [1, 2]
+        depth.set_function(lambda: len(items), queue='events')
+        depth.set_function(lambda: 1 / 0, queue='broken')
+        items.append(3)
+        
+        text = self.registry.render()
+        self.assertIn('queue_depth{queue="events"} 3', text)
+        self.assertNotIn('broken', text)
+    
+    def test_label_escaping(self):
+        """Test label values are escaped for the text format"""
+        events = self.registry.counter('events_total', 'Events', ['app'])
+        events.inc(app='My "App"\n')
+        self.assertIn('events_total{app="My \\"App\\"\\n"} 1', self.registry.render())
+    
+    def test_registration(self):
+        """Test re-registering returns the same metric and conflicts are rejected"""
+        first = self.registry.counter('errors_total', 'Errors', ['call'])
+        self.assertIs(self.registry.counter('errors_total', 'Errors', ['call']), first)
+        with self.assertRaises(ValueError):
+            self.registry.histogram('errors_total', 'Errors', ['call'])
+        with self.assertRaises(ValueError):
+            first.inc(rpc='x')
+    
+    def test_shared_registry_reports_rss(self):
+        """Test the process registry includes resident memory"""
+        self.assertIn('# TYPE process_resident_memory_bytes gauge', get_registry().render())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Unit tests for the queued, rotating log pipeline
+"""
+
+import gzip
+import io
+import logging
+import tempfile
+import unittest
+from pathlib import Path
+from agent.src.log_pipeline import CompressingRotatingFileHandler, start_logging
+
+
+class TestCompressingRotatingFileHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'agent.log'
+        self.now = 1_700_000_000.0
+        self.logger = logging.getLogger('test_log_pipeline.file')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+    
+    def tearDown(self):
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+            handler.close()
+        self.tmp.cleanup()
+    
+    def attach(self, **kwargs):
+        handler = CompressingRotatingFileHandler(self.path, clock=lambda: self.now, **kwargs)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.logger.addHandler(handler)
+        return handler
+    
+    def test_size_rotation_compresses_and_caps_backups(self):
+        """Test full files are gzipped and only backup_count are kept"""
+        self.attach(max_bytes=100, backup_count=2)
+        for i in range(40):
+            self.logger.info(f"line {i:03d} " + 'x' * 20)
+        
+        backups = sorted(p.name for p in self.path.parent.iterdir() if p.name != 'agent.log')
+        self.assertEqual(backups, ['agent.log.1.gz', 'agent.log.2.gz'])
+        with gzip.open(self.path.parent / 'agent.log.1.gz', 'rt') as f:
+            self.assertTrue(f.read().startswith('line'))
+        self.assertIn('line 039', self.path.read_text())
+    
+    def test_daily_rotation(self):
+        """Test the file rotates when the day changes"""
+        self.attach(max_bytes=0, backup_count=3)
+        self.logger.info("yesterday")
+        self.now += 86400
+        self.logger.info("today")
+        
+        with gzip.open(self.path.parent / 'agent.log.1.gz', 'rt') as f:
+            self.assertEqual(f.read(), "yesterday\n")
+        self.assertEqual(self.path.read_text(), "today\n")
+
+
+class TestStartLogging(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = logging.getLogger()
+        self.saved = (self.root.level, list(self.root.handlers))
+    
+    def tearDown(self):
+        level, handlers = self.saved
+        for handler in list(self.root.handlers):
+            if handler not in handlers:
+                self.root.removeHandler(handler)
+        self.root.setLevel(level)
+        self.tmp.cleanup()
+    
+    def test_records_reach_file_and_stream_via_queue(self):
+        """Test log calls are written by the listener and debug is filtered by level"""
+        stream = io.StringIO()
+        log_file = Path(self.tmp.name) / 'logs' / 'agent.log'
+        listener = start_logging(logging.INFO, log_file, stream=stream)
+        try:
+            logger = logging.getLogger('test_log_pipeline.queue')
+            logger.debug("Metrics: %s", {'typing_rate': 1})
+            logger.info("Agent %s", 'started')
+        finally:
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+        
+        self.assertIn('test_log_pipeline.queue - INFO - Agent started', log_file.read_text())
+        self.assertIn('Agent started', stream.getvalue())
+        self.assertNotIn('Metrics', stream.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+Unit tests for batched log shipping
+"""
+
+import json
+import logging
+import tempfile
+import unittest
+from pathlib import Path
+from agent.src.log_shipping import LogShippingHandler
+
+
+class FakeSender:
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+    
+    def __call__(self, rows):
+        if self.fail:
+            return False
+        self.batches.append(list(rows))
+        return True
+
+
+class TestLogShippingHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.sender = FakeSender()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fallback = Path(self.tmp.name) / 'fallback.jsonl'
+        self.handler = LogShippingHandler(send=self.sender, fallback_path=self.fallback,
+                                          max_pending=3, max_rows_per_hour=4, per_fingerprint=2,
+                                          fingerprint_window=600, clock=lambda: self.now)
+        self.logger = logging.getLogger('test_log_shipping.source')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.addHandler(self.handler)
+    
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.tmp.cleanup()
+    
+    def fallback_rows(self):
+        if not self.fallback.exists():
+            return []
+        return [json.loads(line) for line in self.fallback.read_text().splitlines()]
+    
+    def test_level_and_batching(self):
+        """Test only warnings and up are queued, and sent as one batch"""
+        self.logger.info("Started")
+        self.logger.warning("Disk almost full")
+        self.logger.error("Upload failed")
+        self.assertEqual(self.handler.pending(), 2)
+        
+        self.assertTrue(self.handler.ship())
+        self.assertEqual(len(self.sender.batches), 1)
+        self.assertEqual([row['level'] for row in self.sender.batches[0]], ['warning', 'error'])
+        self.assertEqual(self.handler.pending(), 0)
+        self.assertTrue(self.handler.ship())
+        self.assertEqual(len(self.sender.batches), 1)
+    
+    def test_repeats_collapse_into_count(self):
+        """Test messages differing only in numbers are one row with a count"""
+        for tick in range(50):
+            self.logger.error(f"Error in monitor loop at tick {tick}")
+        self.assertEqual(self.handler.pending(), 1)
+        
+        self.handler.ship()
+        row = self.sender.batches[0][0]
+        self.assertEqual(row['message'], "Error in monitor loop at tick 0")
+        self.assertEqual(row['meta']['count'], 50)
+        self.assertEqual(row['meta']['logger'], 'test_log_shipping.source')
+    
+    def test_fingerprint_rate_limit(self):
+        """Test a fingerprint is limited per window and suppressed repeats are reported"""
+        for _ in range(4):
+            self.logger.error("Connection reset")
+            self.handler.ship()
+        self.assertEqual(len(self.sender.batches), 2)
+        
+        self.now += 600
+        self.logger.error("Connection reset")
+        self.handler.ship()
+        self.assertEqual(self.sender.batches[-1][0]['meta']['suppressed'], 2)
+    
+    def test_queue_bound(self):
+        """Test distinct messages past the queue size are dropped"""
+        for name in ['a', 'b', 'c', 'd', 'e']:
+            self.logger.warning(f"Missing module {name}")
+        self.assertEqual(self.handler.pending(), 3)
+        self.assertEqual(self.handler.dropped, 2)
+    
+    def test_hourly_cap_spills_to_file(self):
+        """Test rows past the hourly budget go to the fallback file"""
+        for batch in range(2):
+            for name in ['a', 'b', 'c']:
+                self.logger.warning(f"Problem {name}{'x' * batch}")
+            self.handler.ship()
+        shipped = sum(len(b) for b in self.sender.batches)
+        self.assertEqual(shipped, 4)
+        spilled = self.fallback_rows()
+        self.assertEqual(len(spilled), 2)
+        self.assertEqual({row['reason'] for row in spilled}, {'hourly_cap'})
+        
+        self.now += 3600
+        self.logger.warning("Problem later")
+        self.handler.ship()
+        self.assertEqual(self.sender.batches[-1][0]['message'], "Problem later")
+    
+    def test_failed_send_spills_to_file(self):
+        """Test a failed batch is written locally and not retried"""
+        self.sender.fail = True
+        self.logger.error("Cannot reach server")
+        self.assertFalse(self.handler.ship())
+        self.assertEqual([row['reason'] for row in self.fallback_rows()], ['send_failed'])
+        
+        self.sender.fail = False
+        self.assertTrue(self.handler.ship())
+        self.assertEqual(self.sender.batches, [])
+    
+    def test_logs_while_sending_are_ignored(self):
+        """Test records logged by the send path are not shipped"""
+        def send(rows):
+            self.logger.error("Error inserting agent logs")
+            return True
+        self.handler.send = send
+        self.logger.error("Original")
+        self.handler.ship()
+        self.assertEqual(self.handler.pending(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+Unit tests for rolling metrics windows
+"""
+
+import time
+import unittest
+from agent.src.metrics_engine import KeystrokeRhythm, RollingMetrics, WindowCounter
+
+
+class TestWindowCounter(unittest.TestCase):
+
+    def setUp(self):
+        self.counter = WindowCounter(('keystroke', 'app_switch'), horizon=3600)
+    
+    def test_range_counts_match_brute_force(self):
+        """Test every window count equals a scan of the raw events"""
+        events = [1000 + t * 0.7 for t in range(0, 5000, 3)]
+        for ts in events:
+            self.counter.add('keystroke', ts)
+        now = events[-1] + 5
+        
+        for window in (1, 10, 60, 300, 900, 3600):
+            expected = sum(1 for ts in events if int(ts) > int(now) - window)
+            self.assertEqual(self.counter.count('keystroke', window, now), expected, window)
+        self.assertEqual(self.counter.count('app_switch', 3600, now), 0)
+    
+    def test_gaps_and_horizon(self):
+        """Test quiet periods longer than the horizon age everything out"""
+        self.counter.add('app_switch', 100)
+        self.counter.add('app_switch', 101)
+        self.assertEqual(self.counter.count('app_switch', 10, 105), 2)
+        self.assertEqual(self.counter.count('app_switch', 10, 115), 0)
+        self.assertEqual(self.counter.count('app_switch', 20, 115), 2)
+        
+        self.counter.add('app_switch', 100000)
+        self.assertEqual(self.counter.count('app_switch', 99999, 100000), 1)
+    
+    def test_late_events_count_in_newest_second(self):
+        """Test an event stamped in the past is not lost"""
+        self.counter.add('keystroke', 200)
+        self.counter.add('keystroke', 150)
+        self.assertEqual(self.counter.count('keystroke', 1, 200), 2)
+
+
+class TestKeystrokeRhythm(unittest.TestCase):
+
+    def type_keys(self, rhythm, intervals, start=1000.0):
+        now = start
+        rhythm.add(now)
+        for interval in intervals:
+            now += interval
+            rhythm.add(now)
+        return now
+    
+    def test_even_cadence(self):
+        """Test a steady typist gets a regular cadence and a narrow histogram"""
+        rhythm = KeystrokeRhythm()
+        self.type_keys(rhythm, [0.12] * 500)
+        metrics = rhythm.get_metrics()
+        
+        self.assertAlmostEqual(metrics['iki_mean_ms'], 120, delta=1)
+        self.assertAlmostEqual(metrics['cadence_regularity'], 1.0, places=3)
+        self.assertTrue(100 < metrics['iki_p50_ms'] <= 150)
+        shares = dict(rhythm.histogram())
+        self.assertAlmostEqual(shares[0.15], 1.0)
+        self.assertAlmostEqual(sum(shares.values()), 1.0)
+    
+    def test_bursts_and_pauses(self):
+        """Test runs of fast keys become bursts and long gaps become pauses"""
+        bursts, pauses = [], []
+        rhythm = KeystrokeRhythm(on_burst=lambda ts, keys: bursts.append(keys),
+                                 on_pause=lambda ts, gap: pauses.append(gap))
+        # Two 6-key bursts, a 3-key run, split by a 5 s pause and a 1 s gap
+        self.type_keys(rhythm, [0.1] * 5 + [5.0] + [0.1] * 5 + [1.0] + [0.1] * 2 + [1.0])
+        metrics = rhythm.get_metrics()
+        
+        self.assertEqual(bursts, [6, 6])
+        self.assertEqual(pauses, [5.0])
+        self.assertEqual(metrics['avg_burst_length'], 6)
+        self.assertAlmostEqual(metrics['burst_ratio'], 12 / 16, delta=0.05)
+        self.assertLess(metrics['cadence_regularity'], 0.5)
+    
+    def test_fixed_memory(self):
+        """Test state does not grow with the number of keystrokes"""
+        rhythm = KeystrokeRhythm(half_life=10)
+        self.type_keys(rhythm, [0.1, 0.4] * 20000)
+        self.assertEqual(len(rhythm.histogram()), len(rhythm.edges))
+        self.assertAlmostEqual(sum(share for _, share in rhythm.histogram()), 1.0)
+        
+        rhythm.reset()
+        self.assertEqual(rhythm.get_metrics()['cadence_regularity'], 0.0)
+
+
+class TestRollingMetrics(unittest.TestCase):
+
+    def test_all_windows_reported(self):
+        """Test every configured window shows up in the metrics"""
+        metrics = RollingMetrics()
+        now = time.time()
+        metrics.add_app_switch(now - 120)
+        for i in range(29, -1, -1):
+            metrics.add_keystroke(now - i)
+        
+        values = metrics.get_all_metrics()
+        self.assertAlmostEqual(values['typing_rate_10s'], 60, delta=6)
+        self.assertAlmostEqual(values['typing_rate'], 30, delta=1)
+        self.assertEqual(values['app_switches_60s'], 0)
+        self.assertEqual(values['app_switches_5m'], 1)
+        self.assertEqual(values['app_switch_count'], 1)
+        for label in ('10s', '60s', '5m', '15m', '1h'):
+            self.assertIn(f'mouse_events_{label}', values)
+        self.assertAlmostEqual(values['iki_mean_ms'], 1000)
+        self.assertEqual(values['bursts_per_min'], 0)
+    
+    def test_custom_windows(self):
+        """Test windows are configurable"""
+        metrics = RollingMetrics(windows={'30s': 30})
+        self.assertEqual(set(metrics.get_window_metrics()), {'typing_rate_30s', 'app_switches_30s', 'mouse_events_30s'})
+
+
+if __name__ == '__main__':
+    unittest.main()
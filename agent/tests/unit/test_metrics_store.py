@@ -0,0 +1,105 @@
+"""
+Unit tests for the local metrics time-series store
+"""
+
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from agent.src.metrics_store import MetricsStore, decode_blocks, encode_block
+
+
+HOUR = 3600
+
+
+class TestBlockFormat(unittest.TestCase):
+
+    def test_round_trip_and_torn_tail(self):
+        """Test blocks decode back and a torn final block is skipped"""
+        first = encode_block([1.0, 2.0], {'a': [1.5, 2.5], 'b': [0, 1]})
+        second = encode_block([3.0], {'a': [3.5], 'b': [2]}, include_names=False)
+        
+        blocks = list(decode_blocks(first + second + second[:-3]))
+        self.assertEqual(len(blocks), 2)
+        self.assertEqual(list(blocks[1][0]), [3.0])
+        self.assertEqual(list(blocks[0][1]['a']), [1.5, 2.5])
+        self.assertEqual(list(blocks[1][1]['b']), [2.0])
+
+
+class TestMetricsStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp.name)
+        self.store = MetricsStore(self.directory)
+        # Two hours of samples ending a minute ago, aligned to the hour
+        self.start = (int(time.time()) // HOUR - 2) * HOUR
+        for second in range(2 * HOUR + 60):
+            self.store.record({'typing_rate': second % 60, 'flag': True, 'name': 'x'}, self.start + second)
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_raw_rows_survive_flush(self):
+        """Test raw samples read back the same from buffer and from disk"""
+        before = self.store.query(self.start, self.start + 59, resolution='raw')
+        self.store.flush()
+        after = self.store.query(self.start, self.start + 59, resolution='raw')
+        
+        self.assertEqual(before, after)
+        self.assertEqual(after['timestamps'][:2], [self.start, self.start + 1])
+        self.assertEqual(after['columns']['typing_rate'], list(range(60)))
+        self.assertNotIn('flag', after['columns'])
+        self.assertEqual(len(list((self.directory / 'raw').glob('*.tsf'))), 3)
+    
+    def test_rollup_tiers(self):
+        """Test minute and hour rows carry mean, max and sample count"""
+        self.store.flush()
+        minutes = self.store.query(self.start, self.start + HOUR - 1, resolution='1m',
+                                   columns=['typing_rate', 'typing_rate.max', 'samples'])
+        self.assertEqual(len(minutes['timestamps']), 60)
+        self.assertEqual(minutes['columns']['typing_rate'][0], 29.5)
+        self.assertEqual(minutes['columns']['typing_rate.max'][0], 59)
+        self.assertEqual(minutes['columns']['samples'][0], 60)
+        
+        hours = self.store.query(self.start, self.start + 3 * HOUR, resolution='1h')
+        self.assertEqual(hours['timestamps'], [self.start, self.start + HOUR])
+        self.assertEqual(hours['columns']['samples'], [HOUR, HOUR])
+        
+        # The minute still being aggregated is included, not yet on disk
+        latest = self.store.query(self.start + 2 * HOUR, self.start + 3 * HOUR, resolution='1m')
+        self.assertEqual(latest['columns']['samples'], [60])
+    
+    def test_auto_resolution_and_bad_resolution(self):
+        """Test the finest tier within max_points is chosen"""
+        self.assertEqual(self.store.query(self.start, self.start + 600)['resolution'], 'raw')
+        self.assertEqual(self.store.query(self.start, self.start + 2 * HOUR)['resolution'], '1m')
+        self.assertEqual(self.store.query(self.start, self.start + 2 * HOUR, max_points=10)['resolution'], '1h')
+        with self.assertRaises(ValueError):
+            self.store.query(self.start, self.start + 60, resolution='5s')
+    
+    def test_retention_deletes_whole_files(self):
+        """Test files past retention are removed on flush"""
+        self.store.retention['raw'] = HOUR
+        self.store.flush()
+        remaining = self.store.query(self.start, self.start + 3 * HOUR, resolution='raw')
+        self.assertGreaterEqual(remaining['timestamps'][0], self.start + HOUR)
+        self.assertLessEqual(len(list((self.directory / 'raw').glob('*.tsf'))), 2)
+    
+    def test_reopen_after_torn_write(self):
+        """Test appends after a crash mid-block stay readable"""
+        self.store.flush()
+        path = sorted((self.directory / 'raw').glob('*.tsf'))[-1]
+        with open(path, 'ab') as f:
+            f.write(b'TSB1garbage')
+        
+        reopened = MetricsStore(self.directory)
+        reopened.record({'typing_rate': 99}, self.start + 2 * HOUR + 60)
+        reopened.flush()
+        rows = reopened.query(self.start + 2 * HOUR, self.start + 3 * HOUR, resolution='raw')
+        self.assertEqual(rows['columns']['typing_rate'][-1], 99)
+        self.assertEqual(len(rows['timestamps']), 61)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,8 +2,13 @@
 Unit tests for micro-interventions
 """
 
+import subprocess
+import sys
+import time
 import unittest
+from agent.src.audio_fade import AudioFadeEngine, FakeVolumeBackend, OsaScriptVolumeBackend, linear
 from agent.src.micro_interventions import MicroIntervention
+from agent.src.ui_thread import UIThread
 
 
 class TestMicroIntervention(unittest.TestCase):
@@ -58,6 +63,16 @@ class TestMicroIntervention(unittest.TestCase):
         result = self.intervention.detect_cognitive_fatigue(history[-1], history)
         self.assertTrue(result)
     
+    def test_detect_fatigue_irregular_cadence(self):
+        """Test fatigue detection with keystroke cadence breaking up"""
+        history = [
+            {'typing_rate': 50, 'max_idle_gap': 3, 'cadence_regularity': regularity}
+            for regularity in (0.8, 0.8, 0.75, 0.65, 0.55)
+        ]
+        
+        result = self.intervention.detect_cognitive_fatigue(history[-1], history)
+        self.assertTrue(result)
+    
     def test_no_fatigue_stable_metrics(self):
         """Test no fatigue with stable metrics"""
         history = [
@@ -71,6 +86,101 @@ class TestMicroIntervention(unittest.TestCase):
         result = self.intervention.detect_cognitive_fatigue(history[-1], history)
         self.assertFalse(result)
 
+    def test_soft_reset_fades_and_restores_volume(self):
+        """Test soft reset fades audio out and back in without blocking"""
+        backend = FakeVolumeBackend(volume=60)
+        ui = UIThread(headless=True)
+        intervention = MicroIntervention(ui=ui, volume_backend=backend)
+        intervention.fade_seconds = 0.1
+        
+        start = time.monotonic()
+        intervention.trigger_soft_reset(duration_seconds=0.3)
+        self.assertLess(time.monotonic() - start, 0.2)
+        self.assertTrue(intervention.intervention_active)
+        
+        time.sleep(0.2)
+        self.assertEqual(backend.volume, 0)
+        
+        time.sleep(0.4)
+        self.assertFalse(intervention.intervention_active)
+        self.assertEqual(backend.volume, 60)
+        self.assertFalse(intervention.can_intervene())
+        ui.stop()
+
+
+class TestAudioFadeEngine(unittest.TestCase):
+    
+    def setUp(self):
+        self.backend = FakeVolumeBackend(volume=100)
+        self.engine = AudioFadeEngine(self.backend, step_seconds=0.01)
+    
+    def test_fade_reaches_target(self):
+        """Test a fade ends exactly on its target"""
+        fade = self.engine.fade_to(0, duration=0.1, easing=linear)
+        
+        self.assertTrue(fade.wait(1))
+        self.assertEqual(self.backend.volume, 0)
+        self.assertEqual(self.backend.history, sorted(self.backend.history, reverse=True))
+    
+    def test_custom_easing(self):
+        """Test arbitrary easing curves are applied"""
+        fade = self.engine.fade_to(0, duration=0.05, easing=lambda t: 0.0 if t < 1 else 1.0)
+        
+        self.assertTrue(fade.wait(1))
+        self.assertEqual(self.backend.history, [0])
+    
+    def test_cancel_mid_fade(self):
+        """Test cancelling stops the fade where it is"""
+        results = []
+        fade = self.engine.fade_to(0, duration=1.0, easing=linear, on_done=results.append)
+        time.sleep(0.2)
+        self.engine.cancel()
+        volume = self.backend.volume
+        time.sleep(0.1)
+        
+        self.assertTrue(fade.is_done())
+        self.assertEqual(results, [False])
+        self.assertEqual(self.backend.volume, volume)
+        self.assertGreater(volume, 0)
+        self.assertLess(volume, 100)
+
+
+
+# Stand-ins for the osascript volume server
+_ECHO_SERVER = "import sys\nfor line in sys.stdin:\n    if line.strip() == 'get':\n        print(42, flush=True)"
+_HUNG_SERVER = "import time; time.sleep(30)"
+
+
+class TestOsaScriptVolumeBackend(unittest.TestCase):
+
+    def backend_with(self, script):
+        backend = OsaScriptVolumeBackend(timeout=0.2)
+        backend._process = subprocess.Popen([sys.executable, '-c', script], stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE, text=True, bufsize=1)
+        self.addCleanup(backend._stop_process)
+        return backend
+    
+    def test_reads_reply(self):
+        """Test a prompt reply is returned"""
+        self.assertEqual(self.backend_with(_ECHO_SERVER).get_volume(), 42)
+    
+    def test_hung_process_does_not_block(self):
+        """Test a read that times out falls back to the last known volume"""
+        backend = self.backend_with(_HUNG_SERVER)
+        backend.set_volume(35)
+        process = backend._process
+        
+        started = time.monotonic()
+        self.assertEqual(backend.get_volume(), 35)
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertIsNot(backend._process, process)
+        self.assertIsNotNone(process.poll())
+    
+    def test_hung_process_without_known_volume_raises(self):
+        """Test a timed-out first read raises instead of hanging"""
+        with self.assertRaises(TimeoutError):
+            self.backend_with(_HUNG_SERVER).get_volume()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,16 +2,22 @@
 Unit tests for overlay manager
 """
 
+import time
 import unittest
 from unittest.mock import Mock, patch
 from agent.src.overlay_manager import OverlayManager
+from agent.src.ui_thread import UIThread
 
 
 class TestOverlayManager(unittest.TestCase):
     
     def setUp(self):
         self.on_flow_broken = Mock()
-        self.manager = OverlayManager(on_flow_broken=self.on_flow_broken)
+        self.ui = UIThread(headless=True)
+        self.manager = OverlayManager(on_flow_broken=self.on_flow_broken, ui=self.ui)
+    
+    def tearDown(self):
+        self.ui.stop()
     
     def test_set_blocked_apps(self):
         """Test setting blocked apps"""
@@ -46,6 +52,51 @@ class TestOverlayManager(unittest.TestCase):
         self.manager.close_overlay()
         self.assertIsNone(self.manager.active_overlay)
 
+    def test_show_overlay_reuses_prebuilt_window(self):
+        """Test overlay is built once and shown on the UI thread"""
+        overlay = self.manager.prepare()
+        self.manager.show_overlay_for_app('Steam')
+        self.ui.call(lambda: None)
+        
+        self.assertTrue(overlay.built)
+        self.assertTrue(overlay.visible)
+        self.assertEqual(overlay.app_name, 'Steam')
+        
+        self.manager.close_overlay()
+        self.ui.call(lambda: None)
+        self.assertFalse(overlay.visible)
+        
+        self.manager.show_overlay_for_app('Netflix')
+        self.ui.call(lambda: None)
+        self.assertIs(self.manager.active_overlay, overlay)
+        self.assertEqual(overlay.app_name, 'Netflix')
+    
+    def test_stay_in_flow(self):
+        """Test staying in flow hides the overlay without breaking flow"""
+        self.manager.show_overlay_for_app('Steam')
+        overlay = self.manager.active_overlay
+        self.ui.call(overlay._stay_in_flow)
+        
+        self.assertFalse(overlay.visible)
+        self.assertIsNone(self.manager.active_overlay)
+        self.on_flow_broken.assert_not_called()
+    
+    def test_unlock_after_countdown(self):
+        """Test unlock is only possible after the countdown"""
+        overlay = self.manager.prepare()
+        overlay.countdown_seconds = 1
+        self.manager.show_overlay_for_app('Steam')
+        self.ui.call(overlay._unlock)
+        self.assertTrue(overlay.visible)
+        
+        time.sleep(1.2)
+        self.assertTrue(self.ui.call(lambda: overlay.unlock_enabled))
+        self.ui.call(overlay._unlock)
+        time.sleep(0.2)
+        
+        self.assertFalse(overlay.visible)
+        self.on_flow_broken.assert_called_once_with('Steam')
+
 
 if __name__ == '__main__':
     unittest.main()
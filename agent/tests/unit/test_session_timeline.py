@@ -0,0 +1,59 @@
+"""
+Unit tests for the packed session timeline
+"""
+
+import unittest
+from agent.src.session_timeline import SessionTimeline, app_durations, decode_timeline
+
+
+class TestSessionTimeline(unittest.TestCase):
+
+    def test_round_trip(self):
+        """Test a timeline decodes to the recorded switches"""
+        start = 1_760_000_000.25
+        timeline = SessionTimeline(start, 'Xcode')
+        timeline.add_switch('Safari', start + 30)
+        timeline.add_switch('Xcode', start + 45.5)
+        timeline.add_switch(None, start + 50)
+        timeline.end('Xcode', start + 600)
+        
+        decoded = decode_timeline(timeline.encode())
+        self.assertEqual(decoded['start'], start)
+        self.assertFalse(decoded['truncated'])
+        self.assertEqual(decoded['apps'], ['Xcode', 'Safari', None])
+        self.assertEqual(
+            [(entry['t'], entry['kind'], entry['app']) for entry in decoded['entries']],
+            [(0, 'start', 'Xcode'), (30, 'app_switch', 'Safari'), (45.5, 'app_switch', 'Xcode'),
+             (50, 'app_switch', None), (600, 'end', 'Xcode')]
+        )
+        self.assertEqual(app_durations(decoded), {'Xcode': 34.5, 'Safari': 15.5, None: 550})
+    
+    def test_compact_and_bytea_hex(self):
+        """Test switches cost a few bytes and the REST hex form decodes"""
+        timeline = SessionTimeline(1000, 'Xcode')
+        for second in range(1, 1001):
+            timeline.add_switch('Safari' if second % 2 else 'Xcode', 1000 + second * 2)
+        blob = timeline.encode()
+        self.assertLess(len(blob), 1002 * 4)
+        
+        decoded = decode_timeline('\\x' + blob.hex())
+        self.assertEqual(len(decoded['entries']), 1001)
+        self.assertEqual(decoded['entries'][-1]['t'], 2000)
+    
+    def test_truncation_and_clock_steps(self):
+        """Test the entry cap and a clock step backwards"""
+        timeline = SessionTimeline(1000, 'A', max_entries=3)
+        timeline.add_switch('B', 1010)
+        timeline.add_switch('C', 1005)
+        timeline.add_switch('D', 1020)
+        timeline.end('C', 1030)
+        
+        decoded = decode_timeline(timeline.encode())
+        self.assertTrue(decoded['truncated'])
+        self.assertEqual([entry['t'] for entry in decoded['entries']], [0, 10, 10, 30])
+        with self.assertRaises(ValueError):
+            decode_timeline(b'\x09\x00')
+
+
+if __name__ == '__main__':
+    unittest.main()
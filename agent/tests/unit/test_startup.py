@@ -0,0 +1,122 @@
+"""
+Unit tests for agent start-up: lazy imports, start-up graph and budgets
+"""
+
+import threading
+import unittest
+from agent.src.lazy_import import lazy_import
+from agent.src.startup import StartupGraph, StartupPhase
+from agent.tests.perf.startup_benchmark import measure_imports, measure_startup
+
+# Generous against the ~90 ms / ~100 ms measured locally, tight against the
+# ~570 ms the eager supabase/Flask/keyring/tkinter imports used to cost
+IMPORT_BUDGET_MS = 300
+MONITORING_BUDGET_MS = 1500
+
+
+class TestLazyImport(unittest.TestCase):
+
+    def test_imports_on_first_use(self):
+        """Test the module loads on first attribute access and runs on_load once"""
+        loads = []
+        module = lazy_import('colorsys', on_load=loads.append)
+        self.assertFalse(module.loaded)
+        
+        self.assertEqual(module.rgb_to_hsv(0, 0, 0), (0, 0, 0))
+        module.hsv_to_rgb(0, 0, 0)
+        self.assertTrue(module.loaded)
+        self.assertEqual(len(loads), 1)
+
+
+class TestStartupGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = StartupGraph()
+        self.order = []
+        self.network = threading.Event()
+    
+    def step(self, name):
+        return lambda: self.order.append(name)
+    
+    def test_local_phases_do_not_wait_for_network(self):
+        """Test independent phases finish while a slow one is still running"""
+        self.graph.add('network', self.network.wait)
+        self.graph.add('settings', self.step('settings'))
+        self.graph.add('monitoring', self.step('monitoring'), depends_on=['settings'])
+        self.graph.add('sync', self.step('sync'), depends_on=['network', 'settings'])
+        self.graph.run()
+        
+        self.assertTrue(self.graph.wait(['monitoring'], timeout=2))
+        self.assertEqual(self.order, ['settings', 'monitoring'])
+        self.assertEqual(self.graph.phases['sync'].state, StartupPhase.PENDING)
+        self.assertFalse(self.graph.is_ready())
+        
+        self.network.set()
+        self.assertTrue(self.graph.wait(timeout=2))
+        self.assertEqual(self.order[-1], 'sync')
+        self.assertTrue(self.graph.is_ready())
+        self.assertEqual(set(self.graph.timings()), {'network', 'settings', 'monitoring', 'sync'})
+    
+    def test_failure_skips_dependents(self):
+        """Test a failed phase skips what depends on it and is reported"""
+        def fail():
+            raise ConnectionError("offline")
+        
+        self.graph.add('database', fail)
+        self.graph.add('cloud_settings', self.step('cloud_settings'), depends_on=['database'])
+        self.graph.add('refresh', self.step('refresh'), depends_on=['cloud_settings'])
+        self.graph.add('input', self.step('input'), critical=True)
+        self.graph.run()
+        
+        self.assertTrue(self.graph.wait(timeout=2))
+        status = self.graph.status()
+        self.assertEqual(status['database']['error'], 'offline')
+        self.assertEqual(status['cloud_settings']['state'], StartupPhase.SKIPPED)
+        self.assertEqual(status['refresh']['state'], StartupPhase.SKIPPED)
+        self.assertEqual(self.order, ['input'])
+    
+    def test_critical_failure_raises(self):
+        """Test waiting on a failed critical phase raises"""
+        self.graph.add('input', lambda: 1 / 0, critical=True)
+        self.graph.run()
+        with self.assertRaises(RuntimeError):
+            self.graph.wait(['input'], timeout=2)
+    
+    def test_critical_phase_skipped_by_failed_dependency_raises(self):
+        """Test a critical phase skipped because a dependency failed is raised, not reported ready"""
+        def fail():
+            raise PermissionError("no accessibility access")
+        
+        self.graph.add('input_capture', fail)
+        self.graph.add('monitoring', self.step('monitoring'), depends_on=['input_capture'], critical=True)
+        self.graph.run()
+        
+        with self.assertRaises(RuntimeError) as raised:
+            self.graph.wait(['monitoring'], timeout=2)
+        self.assertIn("dependency 'input_capture'", str(raised.exception))
+        self.assertEqual(self.graph.phases['monitoring'].state, StartupPhase.SKIPPED)
+        self.assertIsNone(self.graph.phases['monitoring'].finished_at)
+        self.assertEqual(self.order, [])
+    
+    def test_unknown_dependency_rejected(self):
+        with self.assertRaises(ValueError):
+            self.graph.add('sync', self.step('sync'), depends_on=['auth'])
+
+
+class TestStartupBudget(unittest.TestCase):
+
+    def test_import_stays_light(self):
+        """Test importing the agent loads no optional subsystem and stays in budget"""
+        result = measure_imports()
+        self.assertEqual(result['loaded'], [])
+        self.assertLess(result['total_ms'], IMPORT_BUDGET_MS)
+    
+    def test_time_to_monitoring(self):
+        """Test monitoring starts in budget and the API never loads Flask unasked"""
+        result = measure_startup()
+        self.assertLess(result['monitoring_started_ms'], MONITORING_BUDGET_MS)
+        self.assertNotIn('flask', result['loaded'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Unit tests for timer wheel
+"""
+
+import threading
+import time
+import unittest
+from agent.src.timer_wheel import TimerWheel, get_timer_wheel
+
+
+class TestTimerWheel(unittest.TestCase):
+
+    def setUp(self):
+        # Small wheel so tests exercise cascading between levels
+        self.wheel = TimerWheel(tick_seconds=0.005, slot_bits=2, levels=3)
+        self.wheel.start()
+
+    def tearDown(self):
+        self.wheel.stop()
+
+    def test_call_later_fires_once(self):
+        """Test a one-shot timer fires after its delay"""
+        fired = threading.Event()
+        start = time.monotonic()
+        self.wheel.call_later(0.05, fired.set)
+
+        self.assertTrue(fired.wait(1))
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+        self.assertEqual(self.wheel.pending(), 0)
+
+    def test_cancel(self):
+        """Test a cancelled timer never fires"""
+        fired = []
+        handle = self.wheel.call_later(0.05, fired.append, 1)
+        handle.cancel()
+
+        time.sleep(0.15)
+        self.assertEqual(fired, [])
+        self.assertEqual(self.wheel.pending(), 0)
+
+    def test_fires_in_deadline_order_across_levels(self):
+        """Test timers beyond the first level cascade and fire in order"""
+        fired = []
+        done = threading.Event()
+        for delay in (0.3, 0.02, 0.15, 0.08):
+            self.wheel.call_later(delay, fired.append, delay)
+        self.wheel.call_later(0.4, done.set)
+
+        self.assertTrue(done.wait(2))
+        self.assertEqual(fired, [0.02, 0.08, 0.15, 0.3])
+
+    def test_beyond_wheel_range(self):
+        """Test a delay longer than the whole wheel still fires on time"""
+        # 4 slots ** 3 levels * 5ms = 0.32s of range
+        fired = threading.Event()
+        start = time.monotonic()
+        self.wheel.call_later(0.5, fired.set)
+
+        self.assertTrue(fired.wait(2))
+        self.assertGreaterEqual(time.monotonic() - start, 0.5)
+
+    def test_call_repeating(self):
+        """Test repeating timers re-arm until cancelled"""
+        count = []
+        handle = self.wheel.call_repeating(0.02, count.append, 1)
+        time.sleep(0.15)
+        handle.cancel()
+        fired = len(count)
+        time.sleep(0.05)
+
+        self.assertGreaterEqual(fired, 4)
+        self.assertEqual(len(count), fired)
+
+    def test_background_callback(self):
+        """Test background callbacks run off the wheel thread"""
+        threads = []
+        done = threading.Event()
+
+        def callback():
+            threads.append(threading.current_thread().name)
+            done.set()
+
+        self.wheel.call_later(0.01, callback, background=True)
+
+        self.assertTrue(done.wait(1))
+        self.assertNotEqual(threads[0], 'timer-wheel')
+
+
+class TestSharedTimerWheel(unittest.TestCase):
+
+    def test_stopped_shared_wheel_is_replaced(self):
+        """Test callers of get_timer_wheel() still get a running wheel after stop()"""
+        get_timer_wheel().stop()
+        wheel = get_timer_wheel()
+        self.assertTrue(wheel.running)
+
+        done = threading.Event()
+        wheel.call_later(0.01, done.set)
+        self.assertTrue(done.wait(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,260 @@
+"""
+Unit tests for user settings sync
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+from agent.src.user_settings import UserSettingsManager
+
+
+class FakeAuth:
+
+    def __init__(self):
+        self.authenticated = True
+    
+    def is_authenticated(self):
+        return self.authenticated
+    
+
+class FakeResult:
+
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeRPC:
+
+    def __init__(self, client, fail, data=None):
+        self.client = client
+        self.fail = fail
+        self.data = data
+    
+    def execute(self):
+        if self.fail:
+            raise ConnectionError("offline")
+        return FakeResult(self.data)
+
+
+class FakeClient:
+
+    def __init__(self):
+        self.calls = []
+        self.fail = False
+        self.rows = []
+    
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        if name == 'get_settings_since':
+            since = params['p_since'] or ''
+            rows = [row for row in self.rows if row['updated_at'] > since]
+            return FakeRPC(self, self.fail, rows)
+        return FakeRPC(self, self.fail)
+
+
+class TestUserSettingsManager(unittest.TestCase):
+
+    def setUp(self):
+        self.auth = FakeAuth()
+        self.client = FakeClient()
+        self.changes = []
+        self.manager = UserSettingsManager(
+            self.auth, self.client,
+            on_change=lambda section, value: self.changes.append((section, value))
+        )
+    
+    def test_repeated_edits_coalesce(self):
+        """Test only the latest value of each key is pending"""
+        for volume in range(10):
+            self.manager.set_preference('volume', volume, sync=False)
+        self.manager.set_preference('theme', 'dark', sync=False)
+        
+        self.assertEqual(self.manager.pending_changes, {
+            'preferences': {'volume': 9, 'theme': 'dark'}
+        })
+        self.assertEqual(self.manager.get_sync_status()['pending_changes'], 2)
+    
+    def test_single_batched_rpc_with_changed_sections_only(self):
+        """Test one call carries just the changed keys of changed sections"""
+        self.manager.set_preference('theme', 'dark', sync=False)
+        self.manager.update_blocklist({'domains': ['example.com']}, sync=False)
+        
+        success, error = self.manager.sync_to_cloud()
+        
+        self.assertTrue(success)
+        self.assertEqual(self.client.calls, [('patch_user_settings', {'p_changes': {
+            'preferences': {'set': {'theme': 'dark'}, 'unset': []},
+            'blocklist': {'set': {'domains': ['example.com']}, 'unset': []}
+        }})])
+        self.assertFalse(self.manager.has_pending_changes())
+        
+        # Nothing changed since, so nothing is sent
+        self.manager.sync_to_cloud()
+        self.assertEqual(len(self.client.calls), 1)
+    
+    def test_removed_and_unchanged_keys(self):
+        """Test removed keys are unset and untouched keys are not resent"""
+        self.manager.update_flow_config({'min_typing_rate': 30, 'max_idle_gap': 5}, sync=False)
+        self.manager.sync_to_cloud()
+        
+        self.manager.update_flow_config({'min_typing_rate': 40}, sync=False)
+        self.manager.sync_to_cloud()
+        
+        self.assertEqual(self.client.calls[-1][1]['p_changes'], {
+            'flow_detection': {'set': {'min_typing_rate': 40}, 'unset': ['max_idle_gap']}
+        })
+    
+    def test_in_place_edit_is_detected(self):
+        """Test mutating the returned blocklist and saving it is still tracked"""
+        self.manager.update_blocklist({'domains': ['a.com']}, sync=False)
+        self.manager.sync_to_cloud()
+        
+        blocklist = self.manager.get_blocklist()
+        blocklist['domains'].append('b.com')
+        self.manager.update_blocklist(blocklist, sync=False)
+        
+        self.assertEqual(self.manager.pending_changes, {
+            'blocklist': {'domains': ['a.com', 'b.com']}
+        })
+    
+    def test_failed_sync_keeps_newer_edits(self):
+        """Test a failed push is retried without clobbering later edits"""
+        self.manager.set_preference('volume', 1, sync=False)
+        self.client.fail = True
+        success, _ = self.manager.sync_to_cloud()
+        self.assertFalse(success)
+        
+        self.manager.set_preference('volume', 2, sync=False)
+        self.assertEqual(self.manager.pending_changes, {'preferences': {'volume': 2}})
+    
+    def test_sync_from_cloud_keeps_unsent_edits(self):
+        """Test pulled settings do not overwrite local pending edits"""
+        self.manager.set_preference('theme', 'dark', sync=False)
+        self.client.rows = [{
+            'key': 'preferences',
+            'value': {'theme': 'light', 'volume': 3},
+            'updated_at': '2025-12-01T10:00:00+00:00'
+        }]
+        
+        self.manager.sync_from_cloud()
+        
+        self.assertEqual(self.manager.get_all_preferences(), {'theme': 'dark', 'volume': 3})
+        self.assertEqual(self.manager.pending_changes, {'preferences': {'theme': 'dark'}})
+
+
+    def test_conditional_pull_applies_only_changed_sections(self):
+        """Test pulls send the last version and apply just the new rows"""
+        self.client.rows = [
+            {'key': 'blocklist', 'value': {'domains': ['a.com']}, 'updated_at': '2025-12-01T10:00:00+00:00'},
+            {'key': 'flow_detection', 'value': {'min_typing_rate': 30}, 'updated_at': '2025-12-01T09:00:00+00:00'}
+        ]
+        self.manager.sync_from_cloud()
+        
+        self.assertEqual(self.manager.settings_version, '2025-12-01T10:00:00+00:00')
+        self.assertEqual(sorted(section for section, _ in self.changes), ['blocklist', 'flow_config'])
+        
+        # Nothing newer on the server: empty response, no notifications
+        self.changes.clear()
+        success, _ = self.manager.sync_from_cloud()
+        self.assertTrue(success)
+        self.assertEqual(self.client.calls[-1][1]['p_since'], '2025-12-01T10:00:00+00:00')
+        self.assertEqual(self.changes, [])
+        
+        self.client.rows.append(
+            {'key': 'blocklist', 'value': {'domains': ['a.com', 'b.com']}, 'updated_at': '2025-12-01T11:00:00+00:00'}
+        )
+        self.manager.sync_from_cloud()
+        
+        self.assertEqual(self.changes, [('blocklist', {'domains': ['a.com', 'b.com']})])
+        self.assertEqual(self.manager.get_flow_config(), {'min_typing_rate': 30})
+        self.assertFalse(self.manager.has_pending_changes())
+
+    def test_flow_config_uses_flow_detection_key(self):
+        """Test a dashboard edit of flow_detection reaches the flow_config section"""
+        self.manager.sync_from_cloud()
+        self.assertIn('flow_detection', self.client.calls[-1][1]['p_keys'])
+        self.assertNotIn('flow_config', self.client.calls[-1][1]['p_keys'])
+        
+        self.client.rows = [{
+            'key': 'flow_detection',
+            'value': {'min_typing_rate': 45, 'max_idle_gap': 4},
+            'updated_at': '2025-12-02T09:00:00+00:00'
+        }]
+        self.manager.sync_from_cloud()
+        
+        self.assertEqual(self.manager.get_flow_config(), {'min_typing_rate': 45, 'max_idle_gap': 4})
+        self.assertEqual(self.changes, [('flow_config', {'min_typing_rate': 45, 'max_idle_gap': 4})])
+        self.assertFalse(self.manager.has_pending_changes())
+    
+    def test_pushed_sections_are_reported(self):
+        """Test a successful push reports each section's full value by settings key"""
+        pushed = []
+        self.manager.on_push = lambda key, value: pushed.append((key, value))
+        self.manager.update_flow_config({'min_typing_rate': 30, 'max_idle_gap': 5}, sync=False)
+        
+        self.client.fail = True
+        self.manager.sync_to_cloud()
+        self.assertEqual(pushed, [])
+        
+        self.client.fail = False
+        self.manager.update_flow_config({'min_typing_rate': 40, 'max_idle_gap': 5}, sync=False)
+        self.manager.sync_to_cloud()
+        self.assertEqual(pushed, [('flow_detection', {'min_typing_rate': 40, 'max_idle_gap': 5})])
+
+
+class TestLocalSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / 'settings_cache.json'
+        self.changes = []
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def _manager(self, auth=None, client=None):
+        return UserSettingsManager(
+            auth, client, local_storage_path=self.path,
+            on_change=lambda section, value: self.changes.append((section, value))
+        )
+    
+    def test_offline_cold_start(self):
+        """Test a snapshot restores settings, versions and unsent edits without auth"""
+        client = FakeClient()
+        client.rows = [
+            {'key': 'blocklist', 'value': {'domains': ['a.com']}, 'updated_at': '2025-12-01T10:00:00+00:00'}
+        ]
+        online = self._manager(FakeAuth(), client)
+        online.sync_from_cloud()
+        online.set_preference('theme', 'dark', sync=False)
+        
+        offline = self._manager()
+        self.assertTrue(offline.load_local())
+        
+        self.assertEqual(offline.get_blocklist(), {'domains': ['a.com']})
+        self.assertEqual(offline.settings_version, '2025-12-01T10:00:00+00:00')
+        self.assertEqual(offline.pending_changes, {'preferences': {'theme': 'dark'}})
+        self.assertFalse(offline.get_sync_status()['is_authenticated'])
+    
+    def test_missing_or_corrupt_snapshot(self):
+        """Test startup falls back to defaults without a usable snapshot"""
+        self.assertFalse(self._manager().load_local())
+        self.path.write_text('{"cache": {"block')
+        self.assertFalse(self._manager().load_local())
+    
+    def test_background_refresh_applies_delta(self):
+        """Test a refreshed section only notifies when it differs from the snapshot"""
+        manager = self._manager()
+        manager.apply_remote('blocklist', {'domains': ['a.com']})
+        self.changes.clear()
+        
+        restarted = self._manager()
+        restarted.load_local()
+        restarted.apply_remote('blocklist', {'domains': ['a.com']})
+        restarted.apply_remote('flow_config', {'min_typing_rate': 30})
+        
+        self.assertEqual(self.changes, [('flow_config', {'min_typing_rate': 30})])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+// Decoder for the packed session timeline stored in sessions.timeline
+// Format: agent/src/session_timeline.py
+
+const FORMAT_VERSION = 1
+const FLAG_TRUNCATED = 0x01
+const KINDS = ['start', 'app_switch', 'end']
+
+function toBytes(blob) {
+    // bytea comes back from the REST API as hex text ('\x...')
+    if (typeof blob === 'string') {
+        const hex = blob.startsWith('\\x') ? blob.slice(2) : blob
+        const bytes = new Uint8Array(hex.length / 2)
+        for (let i = 0; i < bytes.length; i++) {
+            bytes[i] = parseInt(hex.substr(i * 2, 2), 16)
+        }
+        return bytes
+    }
+    return new Uint8Array(blob)
+}
+
+function readVarint(bytes, state) {
+    let value = 0
+    let scale = 1
+    while (true) {
+        if (state.offset >= bytes.length) {
+            throw new Error('Truncated timeline varint')
+        }
+        const byte = bytes[state.offset++]
+        // Multiply instead of shifting: session starts in ms exceed 32 bits
+        value += (byte & 0x7f) * scale
+        if (byte < 0x80) {
+            return value
+        }
+        scale *= 128
+    }
+}
+
+export function decodeTimeline(blob) {
+    const bytes = toBytes(blob)
+    if (bytes.length < 2 || bytes[0] !== FORMAT_VERSION) {
+        throw new Error(`Unsupported timeline version ${bytes[0]}`)
+    }
+
+    const state = { offset: 2 }
+    const start = readVarint(bytes, state) / 1000
+    const decoder = new TextDecoder()
+    const apps = []
+    const appCount = readVarint(bytes, state)
+    for (let i = 0; i < appCount; i++) {
+        const length = readVarint(bytes, state)
+        apps.push(decoder.decode(bytes.subarray(state.offset, state.offset + length)) || null)
+        state.offset += length
+    }
+
+    const entries = []
+    let elapsedMs = 0
+    while (state.offset < bytes.length) {
+        elapsedMs += readVarint(bytes, state)
+        const code = readVarint(bytes, state)
+        entries.push({
+            t: elapsedMs / 1000,
+            kind: KINDS[code & 0x03],
+            app: apps[Math.floor(code / 4)]
+        })
+    }
+
+    return { start, truncated: Boolean(bytes[1] & FLAG_TRUNCATED), apps, entries }
+}
+
+// Seconds spent in each app, from a decoded timeline
+export function appDurations(timeline) {
+    const durations = {}
+    const { entries } = timeline
+    for (let i = 0; i + 1 < entries.length; i++) {
+        const app = entries[i].app
+        durations[app] = (durations[app] || 0) + entries[i + 1].t - entries[i].t
+    }
+    return durations
+}
@@ -0,0 +1,29 @@
+-- Batched, key-level settings patch used by the agent's settings sync
+
+-- Function to apply changed keys across several settings sections at once
+-- p_changes: {"<section>": {"set": {...}, "unset": ["key", ...]}, ...}
+CREATE OR REPLACE FUNCTION public.patch_user_settings(
+    p_changes JSONB
+)
+RETURNS VOID AS $$
+DECLARE
+    section TEXT;
+    patch JSONB;
+BEGIN
+    FOR section, patch IN SELECT * FROM jsonb_each(p_changes)
+    LOOP
+        INSERT INTO public.settings (user_id, key, value, updated_at)
+        VALUES (
+            auth.uid(),
+            section,
+            COALESCE(patch->'set', '{}'::jsonb),
+            TIMEZONE('utc'::text, NOW())
+        )
+        ON CONFLICT (user_id, key)
+        DO UPDATE SET
+            value = (COALESCE(public.settings.value, '{}'::jsonb) || COALESCE(patch->'set', '{}'::jsonb))
+                - COALESCE(ARRAY(SELECT jsonb_array_elements_text(patch->'unset')), ARRAY[]::TEXT[]),
+            updated_at = TIMEZONE('utc'::text, NOW());
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
@@ -0,0 +1,31 @@
+-- Conditional settings pull used by the agent's settings sync
+
+-- Function to fetch only the settings rows (and profile) changed since a version
+-- Returns no rows when nothing changed; the profile is returned under key 'profile'
+CREATE OR REPLACE FUNCTION public.get_settings_since(
+    p_keys TEXT[],
+    p_since TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_profile_since TIMESTAMP WITH TIME ZONE DEFAULT NULL
+)
+RETURNS TABLE (
+    key TEXT,
+    value JSONB,
+    updated_at TIMESTAMP WITH TIME ZONE
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT s.key, s.value, s.updated_at
+    FROM public.settings s
+    WHERE s.user_id = auth.uid()
+        AND s.key = ANY(p_keys)
+        AND s.updated_at > COALESCE(p_since, '-infinity'::timestamptz)
+    UNION ALL
+    SELECT 'profile'::TEXT, to_jsonb(au), au.updated_at
+    FROM public.all_users au
+    WHERE au.id = auth.uid()
+        AND au.updated_at > COALESCE(p_profile_since, '-infinity'::timestamptz);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Keyed lookup of a user's recently changed settings
+CREATE INDEX IF NOT EXISTS idx_settings_user_updated_at ON public.settings(user_id, updated_at);
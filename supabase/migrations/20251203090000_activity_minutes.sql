@@ -0,0 +1,68 @@
+-- Per-minute activity rollups uploaded in batches by the agent
+-- Replaces one events row per app switch / flow marker; raw events are now opt-in
+
+CREATE TABLE IF NOT EXISTS public.activity_minutes (
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    minute TIMESTAMP WITH TIME ZONE NOT NULL,
+    session_id UUID,
+    typing_rate REAL NOT NULL DEFAULT 0,
+    app_switches SMALLINT NOT NULL DEFAULT 0,
+    max_idle_gap REAL NOT NULL DEFAULT 0,
+    flow_state TEXT NOT NULL,
+    flow_seconds SMALLINT NOT NULL DEFAULT 0,
+    top_app TEXT,
+    samples SMALLINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, minute)
+);
+
+ALTER TABLE public.activity_minutes ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own activity" ON public.activity_minutes
+    FOR SELECT USING (auth.uid() = user_id);
+
+-- Function to store a batch of minutes in one statement
+-- p_rows: [{"minute": ..., "typing_rate": ..., ...}, ...]; re-sent minutes overwrite
+CREATE OR REPLACE FUNCTION public.upsert_activity_minutes(
+    p_rows JSONB
+)
+RETURNS INTEGER AS $$
+DECLARE
+    stored INTEGER;
+BEGIN
+    INSERT INTO public.activity_minutes (
+        user_id, minute, session_id, typing_rate, app_switches, max_idle_gap,
+        flow_state, flow_seconds, top_app, samples
+    )
+    SELECT
+        auth.uid(), r.minute, r.session_id, r.typing_rate, r.app_switches, r.max_idle_gap,
+        r.flow_state, r.flow_seconds, r.top_app, r.samples
+    FROM jsonb_to_recordset(p_rows) AS r(
+        minute TIMESTAMP WITH TIME ZONE,
+        session_id UUID,
+        typing_rate REAL,
+        app_switches SMALLINT,
+        max_idle_gap REAL,
+        flow_state TEXT,
+        flow_seconds SMALLINT,
+        top_app TEXT,
+        samples SMALLINT
+    )
+    ON CONFLICT (user_id, minute)
+    DO UPDATE SET
+        session_id = EXCLUDED.session_id,
+        typing_rate = EXCLUDED.typing_rate,
+        app_switches = EXCLUDED.app_switches,
+        max_idle_gap = EXCLUDED.max_idle_gap,
+        flow_state = EXCLUDED.flow_state,
+        flow_seconds = EXCLUDED.flow_seconds,
+        top_app = EXCLUDED.top_app,
+        samples = EXCLUDED.samples;
+
+    GET DIAGNOSTICS stored = ROW_COUNT;
+    RETURN stored;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Session drill-down; per-user time ranges use the primary key
+CREATE INDEX IF NOT EXISTS idx_activity_minutes_session_id ON public.activity_minutes(session_id)
+    WHERE session_id IS NOT NULL;
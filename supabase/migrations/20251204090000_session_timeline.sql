@@ -0,0 +1,30 @@
+-- Packed per-session app timeline, written once when the session ends
+-- Format: agent/src/session_timeline.py (decoders there and in dashboard/ui/src/lib/timeline.js)
+
+ALTER TABLE public.sessions ADD COLUMN IF NOT EXISTS timeline BYTEA;
+
+-- end_session gains the timeline; drop the old signature so calls don't become ambiguous
+DROP FUNCTION IF EXISTS public.end_session(UUID, TIMESTAMP WITH TIME ZONE, TEXT, FLOAT, FLOAT, TEXT);
+
+CREATE OR REPLACE FUNCTION public.end_session(
+    p_session_id UUID,
+    p_end_ts TIMESTAMP WITH TIME ZONE,
+    p_end_app TEXT,
+    p_avg_typing_rate FLOAT,
+    p_max_idle_gap FLOAT,
+    p_trigger_reason TEXT,
+    p_timeline BYTEA DEFAULT NULL
+)
+RETURNS VOID AS $$
+BEGIN
+    UPDATE public.sessions
+    SET
+        end_ts = p_end_ts,
+        end_app = p_end_app,
+        avg_typing_rate = p_avg_typing_rate,
+        max_idle_gap = p_max_idle_gap,
+        trigger_reason = p_trigger_reason,
+        timeline = COALESCE(p_timeline, timeline)
+    WHERE id = p_session_id AND user_id = auth.uid();
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
@@ -0,0 +1,134 @@
+-- Composite per-user indexes and trigger-maintained daily aggregates
+-- Check against a local database with supabase/tests/daily_user_stats_test.sql
+
+-- "My sessions / events / logs in a time range" in one index range scan.
+-- The single-column user_id indexes are prefixes of these and can go.
+CREATE INDEX IF NOT EXISTS idx_sessions_user_start_ts ON public.sessions(user_id, start_ts)
+    INCLUDE (end_ts);
+CREATE INDEX IF NOT EXISTS idx_events_user_ts ON public.events(user_id, ts);
+CREATE INDEX IF NOT EXISTS idx_agent_logs_user_created_at ON public.agent_logs(user_id, created_at);
+
+DROP INDEX IF EXISTS public.idx_sessions_user_id;
+DROP INDEX IF EXISTS public.idx_events_user_id;
+DROP INDEX IF EXISTS public.idx_agent_logs_user_id;
+
+-- One row per user per (UTC) day with finished sessions
+CREATE TABLE IF NOT EXISTS public.daily_user_stats (
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    session_count INTEGER NOT NULL DEFAULT 0,
+    total_seconds BIGINT NOT NULL DEFAULT 0,
+    longest_seconds INTEGER NOT NULL DEFAULT 0,
+    -- Duration-weighted, so avg typing rate = typing_rate_seconds / total_seconds
+    typing_rate_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    PRIMARY KEY (user_id, day)
+);
+
+ALTER TABLE public.daily_user_stats ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own daily stats" ON public.daily_user_stats
+    FOR SELECT USING (auth.uid() = user_id);
+
+-- Add (sign 1) or remove (sign -1) one finished session's contribution
+CREATE OR REPLACE FUNCTION public.apply_session_to_daily_stats(
+    p_user_id UUID,
+    p_start_ts TIMESTAMP WITH TIME ZONE,
+    p_end_ts TIMESTAMP WITH TIME ZONE,
+    p_avg_typing_rate FLOAT,
+    p_sign INTEGER
+)
+RETURNS VOID AS $$
+DECLARE
+    v_day DATE := (p_start_ts AT TIME ZONE 'utc')::date;
+    v_seconds INTEGER := GREATEST(0, EXTRACT(EPOCH FROM (p_end_ts - p_start_ts)))::integer;
+BEGIN
+    IF p_user_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    IF p_sign > 0 THEN
+        INSERT INTO public.daily_user_stats AS d (
+            user_id, day, session_count, total_seconds, longest_seconds, typing_rate_seconds
+        ) VALUES (
+            p_user_id, v_day, 1, v_seconds, v_seconds, COALESCE(p_avg_typing_rate, 0) * v_seconds
+        )
+        ON CONFLICT (user_id, day)
+        DO UPDATE SET
+            session_count = d.session_count + 1,
+            total_seconds = d.total_seconds + EXCLUDED.total_seconds,
+            longest_seconds = GREATEST(d.longest_seconds, EXCLUDED.longest_seconds),
+            typing_rate_seconds = d.typing_rate_seconds + EXCLUDED.typing_rate_seconds,
+            updated_at = TIMEZONE('utc'::text, NOW());
+    ELSE
+        UPDATE public.daily_user_stats
+        SET
+            session_count = session_count - 1,
+            total_seconds = total_seconds - v_seconds,
+            typing_rate_seconds = typing_rate_seconds - COALESCE(p_avg_typing_rate, 0) * v_seconds,
+            updated_at = TIMEZONE('utc'::text, NOW())
+        WHERE user_id = p_user_id AND day = v_day;
+
+        -- A maximum can't be decremented: if the removed session may have been the
+        -- longest, recompute from that day's sessions (the trigger runs after the
+        -- change, so the table already reflects it)
+        UPDATE public.daily_user_stats d
+        SET longest_seconds = COALESCE((
+            SELECT MAX(GREATEST(0, EXTRACT(EPOCH FROM (s.end_ts - s.start_ts)))::integer)
+            FROM public.sessions s
+            WHERE s.user_id = p_user_id
+                AND s.end_ts IS NOT NULL
+                AND s.start_ts >= v_day::timestamp AT TIME ZONE 'utc'
+                AND s.start_ts < (v_day + 1)::timestamp AT TIME ZONE 'utc'
+        ), 0)
+        WHERE d.user_id = p_user_id AND d.day = v_day AND d.longest_seconds <= v_seconds;
+
+        DELETE FROM public.daily_user_stats
+        WHERE user_id = p_user_id AND day = v_day AND session_count <= 0;
+    END IF;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION public.sessions_maintain_daily_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.end_ts IS NOT NULL THEN
+        PERFORM public.apply_session_to_daily_stats(
+            OLD.user_id, OLD.start_ts, OLD.end_ts, OLD.avg_typing_rate, -1
+        );
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.end_ts IS NOT NULL THEN
+        PERFORM public.apply_session_to_daily_stats(
+            NEW.user_id, NEW.start_ts, NEW.end_ts, NEW.avg_typing_rate, 1
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- end_session sets end_ts, which is what brings a session into the stats
+DROP TRIGGER IF EXISTS sessions_daily_stats ON public.sessions;
+CREATE TRIGGER sessions_daily_stats
+    AFTER INSERT OR DELETE OR UPDATE OF user_id, start_ts, end_ts, avg_typing_rate ON public.sessions
+    FOR EACH ROW EXECUTE FUNCTION public.sessions_maintain_daily_stats();
+
+-- Backfill from sessions already finished
+INSERT INTO public.daily_user_stats (
+    user_id, day, session_count, total_seconds, longest_seconds, typing_rate_seconds
+)
+SELECT
+    user_id,
+    (start_ts AT TIME ZONE 'utc')::date,
+    COUNT(*),
+    SUM(seconds),
+    MAX(seconds),
+    SUM(COALESCE(avg_typing_rate, 0) * seconds)
+FROM (
+    SELECT
+        user_id, start_ts, avg_typing_rate,
+        GREATEST(0, EXTRACT(EPOCH FROM (end_ts - start_ts)))::integer AS seconds
+    FROM public.sessions
+    WHERE end_ts IS NOT NULL AND user_id IS NOT NULL
+) finished
+GROUP BY user_id, (start_ts AT TIME ZONE 'utc')::date
+ON CONFLICT (user_id, day) DO NOTHING;
@@ -0,0 +1,178 @@
+-- Monthly range partitions for events (on ts) and agent_logs (on created_at)
+-- Future months are created ahead of time and old months are dropped whole by
+-- public.maintain_time_partitions, run daily by pg_cron when available.
+-- Check against a local database with supabase/tests/partitions_test.sql
+
+-- Create the partition of p_parent holding p_month, named <parent>_pYYYY_MM
+CREATE OR REPLACE FUNCTION public.create_monthly_partition(
+    p_parent TEXT,
+    p_month DATE
+)
+RETURNS BOOLEAN AS $$
+DECLARE
+    v_start DATE := date_trunc('month', p_month)::date;
+    v_name TEXT := format('%s_p%s', p_parent, to_char(v_start, 'YYYY_MM'));
+BEGIN
+    IF to_regclass(format('public.%I', v_name)) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE public.%I PARTITION OF public.%I FOR VALUES FROM (%L) TO (%L)',
+        v_name, p_parent,
+        v_start::timestamp AT TIME ZONE 'utc',
+        (v_start + INTERVAL '1 month')::timestamp AT TIME ZONE 'utc'
+    );
+    -- Partitions are reachable through the REST API too; only the parent's
+    -- policies should grant access
+    EXECUTE format('ALTER TABLE public.%I ENABLE ROW LEVEL SECURITY', v_name);
+    EXECUTE format('REVOKE ALL ON public.%I FROM anon, authenticated', v_name);
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Create partitions through p_months_ahead and drop ones older than p_retention_months
+-- (NULL keeps everything). Returns the number of partitions dropped.
+CREATE OR REPLACE FUNCTION public.maintain_time_partitions(
+    p_parent TEXT,
+    p_months_ahead INTEGER DEFAULT 3,
+    p_retention_months INTEGER DEFAULT NULL,
+    p_from DATE DEFAULT NULL
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_this_month DATE := date_trunc('month', TIMEZONE('utc'::text, NOW()))::date;
+    v_month DATE := LEAST(date_trunc('month', COALESCE(p_from, v_this_month))::date, v_this_month);
+    v_cutoff DATE;
+    v_partition RECORD;
+    v_dropped INTEGER := 0;
+BEGIN
+    WHILE v_month <= v_this_month + make_interval(months => p_months_ahead) LOOP
+        BEGIN
+            PERFORM public.create_monthly_partition(p_parent, v_month);
+        EXCEPTION WHEN check_violation OR invalid_object_definition THEN
+            -- Rows for that month already sit in the default partition
+            RAISE WARNING 'Could not create % partition for %: %', p_parent, v_month, SQLERRM;
+        END;
+        v_month := (v_month + INTERVAL '1 month')::date;
+    END LOOP;
+
+    IF p_retention_months IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    v_cutoff := (v_this_month - make_interval(months => p_retention_months))::date;
+    FOR v_partition IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = format('public.%I', p_parent)::regclass
+            AND c.relname ~ ('^' || p_parent || '_p[0-9]{4}_[0-9]{2}$')
+            AND to_date(right(c.relname, 7), 'YYYY_MM') < v_cutoff
+    LOOP
+        EXECUTE format('DROP TABLE public.%I', v_partition.relname);
+        v_dropped := v_dropped + 1;
+    END LOOP;
+    RETURN v_dropped;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE EXECUTE ON FUNCTION public.create_monthly_partition(TEXT, DATE) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.maintain_time_partitions(TEXT, INTEGER, INTEGER, DATE) FROM PUBLIC, anon, authenticated;
+
+-- events: swap in a partitioned table and copy existing rows across
+ALTER TABLE public.events RENAME TO events_unpartitioned;
+ALTER TABLE public.events_unpartitioned RENAME CONSTRAINT events_pkey TO events_unpartitioned_pkey;
+DROP INDEX IF EXISTS public.idx_events_session_id;
+DROP INDEX IF EXISTS public.idx_events_ts;
+DROP INDEX IF EXISTS public.idx_events_user_ts;
+
+CREATE TABLE public.events (
+    id UUID DEFAULT uuid_generate_v4() NOT NULL,
+    session_id UUID,
+    user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
+    ts TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    type TEXT NOT NULL,
+    payload JSONB DEFAULT '{}'::jsonb,
+    PRIMARY KEY (id, ts)
+) PARTITION BY RANGE (ts);
+
+-- Catches rows far outside the maintained range so inserts never fail
+CREATE TABLE public.events_default PARTITION OF public.events DEFAULT;
+ALTER TABLE public.events_default ENABLE ROW LEVEL SECURITY;
+REVOKE ALL ON public.events_default FROM anon, authenticated;
+
+SELECT public.maintain_time_partitions('events', 3, NULL, (SELECT MIN(ts)::date FROM public.events_unpartitioned));
+INSERT INTO public.events (id, session_id, user_id, ts, type, payload)
+SELECT id, session_id, user_id, ts, type, payload FROM public.events_unpartitioned;
+DROP TABLE public.events_unpartitioned;
+
+CREATE INDEX idx_events_user_ts ON public.events(user_id, ts);
+CREATE INDEX idx_events_session_id ON public.events(session_id);
+
+ALTER TABLE public.events ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own events" ON public.events
+    FOR SELECT USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can insert their own events" ON public.events
+    FOR INSERT WITH CHECK (auth.uid() = user_id);
+
+-- agent_logs: same, partitioned on created_at
+ALTER TABLE public.agent_logs RENAME TO agent_logs_unpartitioned;
+ALTER TABLE public.agent_logs_unpartitioned RENAME CONSTRAINT agent_logs_pkey TO agent_logs_unpartitioned_pkey;
+DROP INDEX IF EXISTS public.idx_agent_logs_user_created_at;
+
+CREATE TABLE public.agent_logs (
+    id UUID DEFAULT uuid_generate_v4() NOT NULL,
+    user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
+    level TEXT NOT NULL,
+    message TEXT NOT NULL,
+    meta JSONB DEFAULT '{}'::jsonb,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE public.agent_logs_default PARTITION OF public.agent_logs DEFAULT;
+ALTER TABLE public.agent_logs_default ENABLE ROW LEVEL SECURITY;
+REVOKE ALL ON public.agent_logs_default FROM anon, authenticated;
+
+SELECT public.maintain_time_partitions('agent_logs', 3, NULL,
+                                       (SELECT MIN(created_at)::date FROM public.agent_logs_unpartitioned));
+INSERT INTO public.agent_logs (id, user_id, level, message, meta, created_at)
+SELECT id, user_id, level, message, meta, created_at FROM public.agent_logs_unpartitioned;
+DROP TABLE public.agent_logs_unpartitioned;
+
+CREATE INDEX idx_agent_logs_user_created_at ON public.agent_logs(user_id, created_at);
+
+ALTER TABLE public.agent_logs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own logs" ON public.agent_logs
+    FOR SELECT USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can insert their own logs" ON public.agent_logs
+    FOR INSERT WITH CHECK (auth.uid() = user_id);
+
+-- Daily maintenance: keep three months of partitions ready, 13 months of
+-- events and 3 months of logs
+CREATE OR REPLACE FUNCTION public.run_partition_maintenance()
+RETURNS VOID AS $$
+BEGIN
+    PERFORM public.maintain_time_partitions('events', 3, 13);
+    PERFORM public.maintain_time_partitions('agent_logs', 3, 3);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE EXECUTE ON FUNCTION public.run_partition_maintenance() FROM PUBLIC, anon, authenticated;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_cron') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_cron;
+        PERFORM cron.schedule('partition-maintenance', '15 3 * * *',
+                              'SELECT public.run_partition_maintenance()');
+    ELSE
+        RAISE NOTICE 'pg_cron not available; schedule public.run_partition_maintenance() externally';
+    END IF;
+END;
+$$;
@@ -0,0 +1,59 @@
+-- upsert_activity_minutes takes the user explicitly
+-- The agent uploads with the service key, where auth.uid() is NULL, so the
+-- user has to be passed in (as upsert_setting does). Signed-in clients may
+-- only write their own rows.
+
+DROP FUNCTION IF EXISTS public.upsert_activity_minutes(JSONB);
+
+-- p_rows: [{"minute": ..., "typing_rate": ..., ...}, ...]; re-sent minutes overwrite
+CREATE OR REPLACE FUNCTION public.upsert_activity_minutes(
+    p_user_id UUID,
+    p_rows JSONB
+)
+RETURNS INTEGER AS $$
+DECLARE
+    stored INTEGER;
+BEGIN
+    IF p_user_id IS NULL THEN
+        RAISE EXCEPTION 'p_user_id is required' USING ERRCODE = 'null_value_not_allowed';
+    END IF;
+    IF auth.uid() IS NOT NULL AND auth.uid() <> p_user_id THEN
+        RAISE EXCEPTION 'cannot store activity for another user' USING ERRCODE = 'insufficient_privilege';
+    END IF;
+
+    INSERT INTO public.activity_minutes (
+        user_id, minute, session_id, typing_rate, app_switches, max_idle_gap,
+        flow_state, flow_seconds, top_app, samples
+    )
+    SELECT
+        p_user_id, r.minute, r.session_id, r.typing_rate, r.app_switches, r.max_idle_gap,
+        r.flow_state, r.flow_seconds, r.top_app, r.samples
+    FROM jsonb_to_recordset(p_rows) AS r(
+        minute TIMESTAMP WITH TIME ZONE,
+        session_id UUID,
+        typing_rate REAL,
+        app_switches SMALLINT,
+        max_idle_gap REAL,
+        flow_state TEXT,
+        flow_seconds SMALLINT,
+        top_app TEXT,
+        samples SMALLINT
+    )
+    ON CONFLICT (user_id, minute)
+    DO UPDATE SET
+        session_id = EXCLUDED.session_id,
+        typing_rate = EXCLUDED.typing_rate,
+        app_switches = EXCLUDED.app_switches,
+        max_idle_gap = EXCLUDED.max_idle_gap,
+        flow_state = EXCLUDED.flow_state,
+        flow_seconds = EXCLUDED.flow_seconds,
+        top_app = EXCLUDED.top_app,
+        samples = EXCLUDED.samples;
+
+    GET DIAGNOSTICS stored = ROW_COUNT;
+    RETURN stored;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE EXECUTE ON FUNCTION public.upsert_activity_minutes(UUID, JSONB) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION public.upsert_activity_minutes(UUID, JSONB) TO authenticated, service_role;